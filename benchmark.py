@@ -0,0 +1,439 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import main  # 被测的处理函数
+
+# ------------------------------
+# 合成语料生成
+# ------------------------------
+# 普通文本和各类可命中规则的文本片段
+PLAIN_TEXTS = [
+    "已知函数的定义域为全体实数，求其单调区间并说明理由",
+    "下列说法中正确的是哪一项，请写出判断依据",
+    "阅读下面的材料，完成后面的题目",
+    "如图所示，在三角形中，点D是边BC的中点",
+]
+MATCH_TEXTS = ["(01中文说明)", "（12知识点）", "[21考查目标]", "(05易错题)"]
+HEADING_TEXTS = ["题型一 选择题", "考点3 函数概念", "第二十一章 几何", "A夯实基础", "第3单元 阅读"]
+
+DEFAULT_CORPUS = {
+    'files': 20,  # 文件数
+    'paragraphs': 200,  # 每个文件的段落数
+    'runs': 4,  # 每段的run数
+    'table_density': 0.05,  # 每个段落后插入表格的概率
+    'sections': 2,  # 每个文件的节数
+    'match_density': 0.2,  # 含括号模式的段落比例
+    'heading_density': 0.05,  # 标题段落比例
+    'seed': 42,
+}
+
+
+def split_into_runs(text, run_count, rng):
+    """将文本随机切分为若干run（模拟Word中被格式切碎的段落）"""
+    if run_count <= 1 or len(text) <= 1:
+        return [text]
+    cuts = sorted(rng.sample(range(1, len(text)), min(run_count - 1, len(text) - 1)))
+    return [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+
+
+def generate_document(path, params, rng):
+    """生成单个合成docx文件，返回段落总数（含表格单元格段落）"""
+    from docx import Document
+
+    doc = Document()
+    paragraph_count = 0
+    per_section = max(1, params['paragraphs'] // max(1, params['sections']))
+    for i in range(params['paragraphs']):
+        if i and i % per_section == 0 and len(doc.sections) < params['sections']:
+            doc.add_section()
+        roll = rng.random()
+        if roll < params['heading_density']:
+            text = rng.choice(HEADING_TEXTS)
+        else:
+            text = rng.choice(PLAIN_TEXTS)
+            if roll < params['heading_density'] + params['match_density']:
+                pos = rng.randint(0, len(text))
+                text = text[:pos] + rng.choice(MATCH_TEXTS) + text[pos:]
+        para = doc.add_paragraph()
+        for piece in split_into_runs(text, params['runs'], rng):
+            para.add_run(piece)
+        paragraph_count += 1
+
+        if rng.random() < params['table_density']:
+            table = doc.add_table(rows=3, cols=3)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.paragraphs[0].add_run(rng.choice(PLAIN_TEXTS[:2]) + rng.choice(MATCH_TEXTS))
+                    paragraph_count += 1
+    doc.save(path)
+    return paragraph_count
+
+
+def generate_corpus(corpus_dir, params):
+    """
+    生成可复现的合成语料（相同参数和随机种子生成相同内容）
+    :return: 语料信息字典（参数、文件数、段落总数、字节数）
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    rng = random.Random(params['seed'])
+    paragraphs = 0
+    for i in range(params['files']):
+        paragraphs += generate_document(os.path.join(corpus_dir, f"bench_{i:05d}.docx"), params, rng)
+    info = {
+        'params': params,
+        'files': params['files'],
+        'paragraphs': paragraphs,
+        'bytes': sum(os.path.getsize(os.path.join(corpus_dir, name)) for name in os.listdir(corpus_dir)),
+    }
+    with open(os.path.join(corpus_dir, 'corpus.json'), 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    return info
+
+
+# ------------------------------
+# 指标采集
+# ------------------------------
+RSS_SAMPLE_INTERVAL = 0.05  # 总内存采样间隔（秒）
+
+
+def child_pids():
+    """当前进程的全部子孙进程（进程池的工作进程等）"""
+    try:
+        import psutil
+        return [child.pid for child in psutil.Process().children(recursive=True)]
+    except ImportError:
+        pass
+    # 没有psutil时读取/proc（仅Linux）：stat第4个字段为父进程号
+    parents = {}
+    try:
+        names = os.listdir('/proc')
+    except OSError:
+        return []
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            parents[int(name)] = int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    found, frontier = [], [os.getpid()]
+    while frontier:
+        parent = frontier.pop()
+        children = [pid for pid, ppid in parents.items() if ppid == parent]
+        found.extend(children)
+        frontier.extend(children)
+    return found
+
+
+class TotalRssSampler:
+    """
+    后台线程定期采样主进程与全部子进程常驻内存之和，记录峰值
+    （各进程单独的峰值无法相加得到同时占用的内存，多进程模式下要看同一时刻的总和）
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        values = [main.process_rss_bytes(pid) for pid in [None] + child_pids()]
+        values = [value for value in values if value is not None]
+        if values:
+            self.peak = max(self.peak or 0, sum(values))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def peak_mb(self):
+        """峰值总内存（MB），无法获取时返回None"""
+        return round(self.peak / 1024 / 1024, 1) if self.peak else None
+
+
+def time_stages(sample_path, opts, repeat):
+    """
+    用内置阶段计时在样本文件副本上多次处理，返回各阶段平均墙钟耗时（毫秒）
+    """
+    work_path = sample_path + '.stage.docx'
+    totals = {}
+    try:
+        for _ in range(repeat):
+            shutil.copy2(sample_path, work_path)
+            timings = {}
+            main.process_word_file(work_path, False, opts, {}, timings)
+            for stage, entry in timings.items():
+                totals[stage] = totals.get(stage, 0.0) + entry['wall']
+    finally:
+        if os.path.exists(work_path):
+            os.remove(work_path)
+    return {stage: round(total / repeat * 1000, 2) for stage, total in totals.items()}
+
+
+# ------------------------------
+# 场景执行（每个场景在独立子进程中运行，保证峰值内存互不干扰）
+# ------------------------------
+def run_scenario(corpus_dir, mode, workers, opts):
+    """在语料副本上执行一次完整批处理，返回指标字典"""
+    with open(os.path.join(corpus_dir, 'corpus.json'), 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    work_dir = tempfile.mkdtemp(prefix='wp_bench_')
+    try:
+        for name in os.listdir(corpus_dir):
+            if name.endswith('.docx'):
+                shutil.copy2(os.path.join(corpus_dir, name), work_dir)
+        files = main.get_all_files_by_ext(work_dir, ['.docx'])
+        run_opts = dict(opts, use_cache=False, use_process_pool=(mode == 'process'), process_workers=workers)
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        with TotalRssSampler() as rss:
+            summary = main.run_process_batch(work_dir, files, run_opts)
+        elapsed = time.perf_counter() - start
+        return {
+            'mode': mode,
+            'workers': workers,
+            'files': len(files),
+            'failed': summary['failed'],
+            'elapsed': round(elapsed, 3),
+            'parent_cpu': round(time.process_time() - cpu_start, 3),
+            'files_per_sec': round(len(files) / elapsed, 2),
+            'paragraphs_per_sec': round(info['paragraphs'] / elapsed, 1),
+            'peak_total_rss_mb': rss.peak_mb(),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_scenario_subprocess(corpus_dir, mode, workers, opts):
+    """在子进程中执行场景并解析其JSON输出"""
+    cmd = [sys.executable, os.path.abspath(__file__), '_scenario', corpus_dir, mode, str(workers),
+           json.dumps(opts, ensure_ascii=False)]
+    output = subprocess.run(cmd, check=True, capture_output=True, text=True, encoding='utf-8').stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def scenario_key(result):
+    return f"{result['mode']}-{result['workers']}"
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    与保存的基线对比吞吐量，下降超过阈值的场景视为性能回退
+    :return: 回退说明列表
+    """
+    base_by_key = {scenario_key(r): r for r in baseline.get('scenarios', [])}
+    regressions = []
+    for result in results:
+        base = base_by_key.get(scenario_key(result))
+        if not base:
+            continue
+        change = result['files_per_sec'] / base['files_per_sec'] - 1
+        result['vs_baseline'] = round(change * 100, 1)
+        if change < -threshold:
+            regressions.append(
+                f"{scenario_key(result)}: {base['files_per_sec']} → {result['files_per_sec']} 文件/秒"
+                f"（{change * 100:.1f}%）")
+    return regressions
+
+
+def print_report(report):
+    """打印文本格式的测试报告"""
+    corpus = report['corpus']
+    print(f"语料：{corpus['files']} 个文件，{corpus['paragraphs']} 个段落，{corpus['bytes'] / 1024 / 1024:.1f} MB")
+    print("单文件各阶段平均耗时（毫秒）：")
+    for name, value in report['stages'].items():
+        print(f"  {name:<26}{value:>10.2f}")
+    print(f"{'场景':<14}{'文件/秒':>10}{'段落/秒':>12}{'耗时(秒)':>10}{'峰值总内存(MB)':>14}{'对比基线':>10}")
+    for r in report['scenarios']:
+        vs = f"{r['vs_baseline']:+.1f}%" if 'vs_baseline' in r else '-'
+        print(f"{scenario_key(r):<14}{r['files_per_sec']:>10}{r['paragraphs_per_sec']:>12}"
+              f"{r['elapsed']:>10}{str(r.get('peak_total_rss_mb')):>14}{vs:>10}")
+
+
+# ------------------------------
+# 启动耗时（每次都在全新子进程中启动，测量冷启动到窗口显示、到首个文件处理完成的耗时）
+# ------------------------------
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def program_command(exe):
+    """被测程序的启动命令：指定打包后的可执行文件时直接运行，否则用当前解释器运行main.py"""
+    if exe:
+        return [os.path.abspath(exe)]
+    return [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')]
+
+
+def time_import():
+    """导入main模块的耗时（秒，仅源码方式）"""
+    code = "import time; s = time.perf_counter(); import main; print(time.perf_counter() - s)"
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_first_window(command, work_dir):
+    """
+    从启动进程到主窗口首次显示的耗时（秒），由程序在界面空闲时写出时间戳后自行退出
+    :return: 耗时，无图形环境或启动失败时返回None
+    """
+    probe_path = os.path.join(work_dir, 'first_window.txt')
+    if os.path.exists(probe_path):
+        os.remove(probe_path)
+    env = dict(os.environ, **{main.STARTUP_PROBE_ENV: probe_path})
+    start = time.time()
+    completed = subprocess.run(command, env=env, capture_output=True, timeout=120)
+    if completed.returncode != 0 or not os.path.exists(probe_path):
+        return None
+    with open(probe_path, 'r', encoding='utf-8') as f:
+        return float(f.read()) - start
+
+
+def time_first_file(command, sample_path, work_dir):
+    """从启动进程到处理完一个文件（命令行模式，进程退出）的耗时（秒），失败时返回None"""
+    folder = os.path.join(work_dir, 'first_file')
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    shutil.copy2(sample_path, folder)
+    start = time.perf_counter()
+    completed = subprocess.run(command + ['process', folder, '--mode', 'thread', '--workers', '1', '--no-cache'],
+                               capture_output=True, timeout=120)
+    elapsed = time.perf_counter() - start
+    return elapsed if completed.returncode == 0 else None
+
+
+def measure_startup(exe, repeat):
+    """
+    多次冷启动取中位数（毫秒），任一次无法测量的指标记为None
+    :param exe: 打包后的可执行文件路径，为None时测量源码方式启动
+    """
+    command = program_command(exe)
+    work_dir = tempfile.mkdtemp(prefix='wp_startup_')
+    try:
+        sample_path = os.path.join(work_dir, 'sample.docx')
+        generate_document(sample_path, dict(DEFAULT_CORPUS, paragraphs=50), random.Random(DEFAULT_CORPUS['seed']))
+        samples = {'import': [], 'first_window': [], 'first_file': []}
+        for _ in range(repeat):
+            if not exe:
+                samples['import'].append(time_import())
+            samples['first_window'].append(time_first_window(command, work_dir))
+            samples['first_file'].append(time_first_file(command, sample_path, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    result = {'command': command, 'repeat': repeat}
+    for name, values in samples.items():
+        ok = values and None not in values
+        result[f"{name}_ms"] = round(median(values) * 1000, 1) if ok else None
+    return result
+
+
+def print_startup_report(report):
+    """打印启动耗时报告"""
+    print(f"启动命令：{' '.join(report['command'])}（{report['repeat']} 次取中位数）")
+    for key, label in (('import_ms', '导入main模块'), ('first_window_ms', '首次显示窗口'),
+                       ('first_file_ms', '处理完首个文件')):
+        value = report[key]
+        print(f"  {label:<12}{'-' if value is None else f'{value:.1f} 毫秒':>14}")
+
+
+def parse_int_list(text):
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description='Word处理性能基准测试（合成语料）')
+    parser.add_argument('--corpus-dir', help='语料目录（默认在临时目录生成，测试结束后删除）')
+    for key, value in DEFAULT_CORPUS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value,
+                            help=f"语料参数（默认{value}）")
+    parser.add_argument('--modes', default='thread,process', help='并行方式，逗号分隔（thread/process）')
+    parser.add_argument('--workers-list', type=parse_int_list, default=[1, 2, 4], help='工作线程/进程数，逗号分隔')
+    parser.add_argument('--stage-repeat', type=int, default=3, help='阶段计时的重复次数')
+    parser.add_argument('--save-baseline', metavar='FILE', help='将结果保存为基线')
+    parser.add_argument('--compare', metavar='FILE', help='与基线对比')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定回退的吞吐量下降比例（默认0.1）')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出报告')
+    parser.add_argument('--startup', action='store_true', help='只测量启动耗时（首次显示窗口、处理完首个文件）')
+    parser.add_argument('--startup-exe', metavar='EXE', help='测量打包后的可执行文件（默认测量源码方式启动）')
+    parser.add_argument('--startup-repeat', type=int, default=5, help='启动耗时的测量次数（默认5）')
+    return parser
+
+
+def bench_main(argv):
+    args = build_arg_parser().parse_args(argv)
+    if args.startup:
+        report = measure_startup(args.startup_exe, args.startup_repeat)
+        if args.save_baseline:
+            with open(args.save_baseline, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        if args.json:
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            print_startup_report(report)
+        return 0
+    params = {key: getattr(args, key) for key in DEFAULT_CORPUS}
+    opts = {key: main.DEFAULT_OPTIONS[key] for key in main.PROCESS_OPTION_KEYS}
+
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix='wp_corpus_')
+    try:
+        corpus = generate_corpus(corpus_dir, params)
+        sample = os.path.join(corpus_dir, 'bench_00000.docx')
+        report = {
+            'corpus': corpus,
+            'stages': time_stages(sample, opts, args.stage_repeat),
+            'scenarios': [
+                run_scenario_subprocess(corpus_dir, mode, workers, opts)
+                for mode in args.modes.split(',') for workers in args.workers_list
+            ],
+        }
+    finally:
+        if not args.corpus_dir:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(report['scenarios'], json.load(f), args.threshold)
+        report['regressions'] = regressions
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+        for line in regressions:
+            print(f"性能回退：{line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '_scenario':
+        _, _, corpus_arg, mode_arg, workers_arg, opts_arg = sys.argv
+        print(json.dumps(run_scenario(corpus_arg, mode_arg, int(workers_arg), json.loads(opts_arg))))
+    else:
+        sys.exit(bench_main(sys.argv[1:]))
@@ -1,7 +1,16 @@
+import argparse
 import os
 import shutil
 from PyInstaller.__main__ import run
 
+# 程序用不到的标准库和第三方模块，排除后可减小体积、缩短启动时的解包和导入时间
+EXCLUDE_MODULES = [
+    "unittest", "test", "doctest", "pydoc", "pdb", "lib2to3", "xmlrpc", "pydoc_data",
+    "numpy", "PIL", "matplotlib", "IPython",
+    "lxml.html", "lxml.isoschematron", "lxml.objectify",
+]
+
+
 def clean_old_builds():
     """清理旧的build和dist目录"""
     for dir_name in ["build", "dist"]:
@@ -9,21 +18,36 @@ def clean_old_builds():
             shutil.rmtree(dir_name)
             print(f"已清理目录: {dir_name}")
 
-def build_exe():
-    """调用PyInstaller API打包程序"""
+
+def build_exe(onefile=False, upx=False):
+    """
+    调用PyInstaller API打包程序
+    :param onefile: 是否打包为单个可执行文件（每次启动都要先解包到临时目录，冷启动明显更慢）
+    :param upx: 是否用UPX压缩（体积更小，但每次启动都要解压，默认关闭）
+    """
     # 打包参数配置
     params = [
         "main.py",  # 程序入口文件
         "--name=WordProcessor",  # 生成的可执行文件名称
         "--icon=gh.ico",  # 程序图标（使用项目根目录的gh.ico）
-        "--onefile",  # 打包为单个可执行文件
+        "--onefile" if onefile else "--onedir",  # 默认打包为目录，启动时无需解包
         "--windowed",  # 无控制台窗口（GUI程序推荐）
-        # 如需排除不必要的库，可加--exclude-module参数，例如：
-        # "--exclude-module=some_unused_module",
+        "--noconfirm",
     ]
+    params += [f"--exclude-module={name}" for name in EXCLUDE_MODULES]
+    if not upx:
+        params.append("--noupx")
     run(params)
-    print("打包完成！可执行文件位于dist目录")
+    if onefile:
+        print("打包完成！可执行文件位于dist目录")
+    else:
+        print("打包完成！程序位于dist/WordProcessor目录（分发时复制整个目录）")
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='打包WordProcessor')
+    parser.add_argument('--onefile', action='store_true', help='打包为单个可执行文件（默认打包为目录，冷启动更快）')
+    parser.add_argument('--upx', action='store_true', help='使用UPX压缩（会增加启动时间）')
+    args = parser.parse_args()
     clean_old_builds()
-    build_exe()
\ No newline at end of file
+    build_exe(args.onefile, args.upx)
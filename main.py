@@ -1,16 +1,62 @@
+import contextlib
+import copy  # 用于深拷贝页眉页脚模板
+import fnmatch  # 用于文件包含/排除通配符匹配
 import os
 import re
 import shutil
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-import win32com.client  # 用于格式转换
-from docx import Document  # 用于docx文档基本操作
-from docx.enum.text import WD_ALIGN_PARAGRAPH  # 用于段落对齐设置
-from docx.oxml import OxmlElement  # 用于操作XML元素
-from docx.oxml.ns import qn  # 用于设置XML命名空间
-from docx.shared import Pt, Cm  # 用于设置字体大小和厘米单位
-import concurrent.futures  # 用于线程池并行处理
+import struct  # 用于读取zip本地文件头（原样复制压缩数据）
+import tempfile
+import zipfile  # 用于流式读写docx压缩包
+import zlib  # 用于比较部件内容的CRC
+import hashlib  # 用于增量缓存的内容哈希
+import heapq  # 用于分片时按大小均衡分配文件
+import json  # 用于读写增量缓存清单和大纲规则配置
+import queue  # 用于进度事件队列
+import sys
+try:
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+except ImportError:  # 无图形环境（如精简版Python/服务器）时只能使用命令行模式
+    tk = filedialog = messagebox = ttk = None
+import concurrent.futures  # 用于线程池/进程池并行处理
 import threading  # 用于线程锁和线程管理
+import multiprocessing  # 用于打包后进程池的freeze_support
+import time  # 用于单文件耗时统计
+
+# ------------------------------
+# 按需导入（python-docx/lxml导入较慢，首次处理文档时才加载，窗口可以先显示出来）
+# ------------------------------
+Document = WD_ALIGN_PARAGRAPH = CT = RT = serialize_part_xml = CT_Types = None
+CONTENT_TYPES_URI = PACKAGE_URI = default_content_types = OxmlElement = qn = element_class_lookup = parse_xml = None
+Pt = Cm = Paragraph = etree = None
+_docx_lock = threading.Lock()
+_docx_loaded = False
+
+
+def load_docx():
+    """加载python-docx/lxml并填充模块级名称（线程安全，只加载一次），所有文档处理入口都应先调用"""
+    global Document, WD_ALIGN_PARAGRAPH, CT, RT, serialize_part_xml, CT_Types
+    global CONTENT_TYPES_URI, PACKAGE_URI, default_content_types, OxmlElement, qn, element_class_lookup, parse_xml
+    global Pt, Cm, Paragraph, etree, _docx_loaded
+    if _docx_loaded:
+        return
+    with _docx_lock:
+        if _docx_loaded:
+            return
+        from docx import Document  # 用于docx文档基本操作
+        from docx.enum.text import WD_ALIGN_PARAGRAPH  # 用于段落对齐设置
+        from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT  # 部件内容类型和关系类型
+        from docx.opc.oxml import CT_Types, serialize_part_xml  # 用于写出[Content_Types].xml和修改过的部件
+        from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI  # 内容类型和包关系的成员名
+        from docx.opc.spec import default_content_types  # 按扩展名使用Default内容类型的部件
+        from docx.oxml import OxmlElement  # 用于操作XML元素
+        from docx.oxml.ns import qn  # 用于设置XML命名空间
+        from docx.oxml.parser import element_class_lookup, parse_xml  # 用于流式解析时生成python-docx元素类
+        from docx.shared import Pt, Cm  # 用于设置字体大小和厘米单位
+        from docx.text.paragraph import Paragraph  # 用于在独立的段落元素上构建页眉页脚模板
+        from lxml import etree  # 用于流式解析document.xml
+        _docx_loaded = True
+
 
 # ------------------------------
 # 全局变量（并行处理+正则缓存）
@@ -20,436 +66,4148 @@ english_pattern = re.compile(r'\(([012]\d)[^()]*?[\u4e00-\u9fa5][^()]{0,10}\)')
 chinese_pattern = re.compile(r'（([012]\d)[^（）]*?[\u4e00-\u9fa5][^（）]{0,10}）')  # 中文小括号
 k_pattern = re.compile(r'\[([012]\d)[^\]]*?[\u4e00-\u9fa5][^\]]{0,10}\]')  # 英文中括号
 
-# 并行处理进度统计（线程安全）
-progress_lock = threading.Lock()
-processed_count = 0  # 已处理文件数
-success_count = 0  # 成功文件数
-error_list = []  # 错误列表
-options = {}  # 全局配置选项
+# 中文数字（用于大纲规则中的{num}占位符和数字解析）
+CHINESE_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4,
+                  '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+CHINESE_UNITS = {'十': 10, '百': 100, '千': 1000}  # 节内单位
+CHINESE_SECTION_UNITS = {'万': 10 ** 4, '亿': 10 ** 8}  # 节单位
+NUMBER_PATTERN = r'\d+|[' + ''.join(CHINESE_DIGITS) + ''.join(CHINESE_UNITS) + ''.join(CHINESE_SECTION_UNITS) + r']+'
+
+# 大纲级别规则：pattern中的{num}表示阿拉伯数字或任意中文数字，level为大纲级别（1~9）
+# triggers为命中规则必须出现的字符（任一），用于预筛；未提供时该规则不参与预筛
+DEFAULT_OUTLINE_RULES = [
+    {'name': '题型考点', 'pattern': r'(?:题型|考点|考法){num}.*', 'level': 1, 'triggers': ['题', '考']},
+    {'name': '分层标题', 'pattern': r'^\s*(?:A夯实基础|B能力提升|C综合素养)\s*$', 'level': 1,
+     'triggers': ['夯', '能', '综']},
+    {'name': '章节', 'pattern': r'第{num}(?:章|单元).*', 'level': 1, 'triggers': ['第']},
+]
+OUTLINE_RULES_FILE = 'outline_rules.json'  # 额外大纲规则配置文件名（放在程序所在目录）
+
+# 自定义页眉文字
+HEADER_TEXT = "泉尚优学：学为人师，行为世范！"
+
+# 页眉页脚模板（可在程序目录下的section_templates.json中覆盖任意字段）
+DEFAULT_SECTION_TEMPLATES = {
+    'header': {
+        'text': HEADER_TEXT,
+        'font': "华文行楷",
+        'size': 12,  # 字号（磅）
+        'distance_cm': 0.7,  # 页眉距离顶端
+        'indent_cm': 1.5,  # 页眉文字距纸张左边缘（左缩进 = 该值 - 页面左边距）
+    },
+    'footer': {
+        'format': "第{PAGE}页/共{NUMPAGES}页",  # {PAGE}、{NUMPAGES}等为Word域，其余为普通文字
+        'font': "宋体",
+        'size': 12,
+        'distance_cm': 1.0,  # 页脚距离底端
+    },
+}
+SECTION_TEMPLATES_FILE = 'section_templates.json'
+FIELD_PATTERN = re.compile(r'\{([A-Z]+)\}')
+
+# 处理规则版本号：修改替换/大纲/页眉页脚规则的实现后需递增，使增量缓存全部失效
+RULES_VERSION = 1
+MANIFEST_NAME = '.wordprocess_manifest.json'  # 增量缓存清单文件名（保存在所选文件夹根目录）
+HASH_CHUNK_SIZE = 1024 * 1024  # 计算文件哈希时每次读取的字节数
+
+# 预筛触发字符：段落/文档中一个都不含时，对应规则不可能命中，可直接跳过
+REPLACE_TRIGGER_CHARS = ('(', '（', '[')  # 括号替换规则的起始字符（大纲规则的触发字符见规则定义）
+REPLACE_TRIGGER_BYTES = tuple(c.encode('utf-8') for c in REPLACE_TRIGGER_CHARS)
+
+options = {}  # 全局配置选项（界面tk变量）
 root = None  # 主窗口对象
 process_btn = None  # 处理按钮对象
 status_var = None  # 状态显示变量
 folder_var = None  # 文件夹路径变量
 convert_doc_btn = None  # DOC转DOCX按钮
 convert_pdf_btn = None  # DOCX转PDF按钮
-total_files = 0  # 并行处理总文件数
+pipeline_btn = None  # 流水线按钮
+watch_btn = None  # 监视文件夹按钮
+watch_stop_event = None  # 监视运行中时用于停止的事件
+
+# 默认处理选项（普通值，界面和命令行共用；界面据此创建tk变量）
+DEFAULT_OPTIONS = {
+    # 主功能选项
+    'remove_header_footer': True,
+    'add_custom_header': True,
+    'add_page_number': True,
+    'replace_patterns': True,
+    'set_question_outline': True,
+    'keep_backup': False,
+    'use_cache': True,
+    'streaming_engine': False,
+    'use_process_pool': False,
+    'process_workers': os.cpu_count() or 1,
+    'instrument': False,
+    'compress_level': 6,  # 保存时的zip压缩级别（0为不压缩，9为最高压缩）
+    'reuse_unmodified_parts': True,  # 内容未变的部件直接复制原压缩数据，不重新压缩
+    'memory_budget_mb': 0,  # 同时处理的文件总内存预算（MB），0为按物理内存自动确定
+    'resume_batch': False,  # 从上次中断的批次继续（跳过批处理日志中已成功的文件）
+    'dedupe': False,  # 内容完全相同的文件只处理/转换一次，结果复制到其余副本
+    # 辅助功能选项
+    'keep_source_doc': False,
+    'docx2pdf_separate_folder': False,
+    'force_convert': False,
+    'watch_export_pdf': False,  # 监视文件夹时处理完同时导出PDF
+}
+
+# 主功能处理选项名（与界面复选框一一对应）
+PROCESS_OPTION_KEYS = [
+    'remove_header_footer',
+    'add_custom_header',
+    'add_page_number',
+    'replace_patterns',
+    'set_question_outline',
+]
+
+
+# ------------------------------
+# 通用工具函数
+# ------------------------------
+def select_folder():
+    """选择文件夹并返回路径，若取消选择则返回None"""
+    folder_path = filedialog.askdirectory(title="选择文件夹")
+    return folder_path if folder_path else None
+
+
+def match_globs(path, folder_path, patterns):
+    """通配符匹配（同时匹配相对路径和文件名，相对路径统一为/分隔）"""
+    rel_path = os.path.relpath(path, folder_path).replace(os.sep, '/')
+    name = os.path.basename(path)
+    return any(fnmatch.fnmatch(rel_path, p) or fnmatch.fnmatch(name, p) for p in patterns)
+
+
+def scan_files_by_ext(folder_path, exts, include=None, exclude=None, max_depth=None, follow_symlinks=False):
+    """
+    用os.scandir逐目录遍历，边遍历边产出符合条件的文件（不必等整棵目录树遍历完）
+    :param exts: 扩展名列表（如['.docx', '.doc']）
+    :param include: 包含通配符列表，为空表示全部包含
+    :param exclude: 排除通配符列表
+    :param max_depth: 最大子目录深度（0表示只查找所选文件夹本身，None表示不限）
+    :param follow_symlinks: 是否进入符号链接/联接指向的目录（指向文件的链接总会被包含）
+    :return: 生成器，产出 (文件路径, 文件大小) ；无法读取的目录直接跳过
+    """
+    for path, st in scan_file_stats(folder_path, exts, include, exclude, max_depth, follow_symlinks):
+        yield path, st.st_size
+
+
+def scan_file_stats(folder_path, exts, include=None, exclude=None, max_depth=None, follow_symlinks=False):
+    """
+    同scan_files_by_ext，产出 (文件路径, stat结果)（供监视模式比较大小和修改时间）
+    """
+    exts = tuple(ext.lower() for ext in exts)  # 统一转为小写便于匹配
+    visited = set()  # 跟随链接时记录已进入的目录，避免循环链接导致死循环
+    stack = [(folder_path, 0)]
+    while stack:
+        dir_path, depth = stack.pop()
+        if follow_symlinks:
+            try:
+                st = os.stat(dir_path)
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) in visited:
+                continue
+            visited.add((st.st_dev, st.st_ino))
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=follow_symlinks):
+                            subdirs.append(entry.path)
+                            continue
+                        # 过滤Word临时文件（以~$开头的文件），检查文件是否符合任一扩展名
+                        if entry.name.startswith('~$') or not entry.name.lower().endswith(exts):
+                            continue
+                        if not entry.is_file():
+                            continue
+                        if include and not match_globs(entry.path, folder_path, include):
+                            continue
+                        if exclude and match_globs(entry.path, folder_path, exclude):
+                            continue
+                        st = entry.stat()  # Windows上由目录枚举结果直接给出，不额外访问文件
+                    except OSError:
+                        continue
+                    yield entry.path, st
+        except OSError:
+            continue
+        if max_depth is None or depth < max_depth:
+            # 倒序入栈，保持与os.walk一致的先后顺序
+            stack.extend((path, depth + 1) for path in reversed(subdirs))
+
+
+class FileListing:
+    """
+    单次运行内的文件清单：第一次迭代时边遍历目录边产出并记录，之后再次迭代直接重放记录，不重复遍历
+    参数同scan_files_by_ext；sizes记录遍历时得到的文件大小（供转换按大小排序，免去再次stat）
+    """
+
+    def __init__(self, folder_path, exts, include=None, exclude=None, max_depth=None, follow_symlinks=False):
+        self.folder_path = folder_path
+        self.scan_args = (exts, include, exclude, max_depth, follow_symlinks)
+        self.paths = []
+        self.sizes = {}
+        self.complete = False
+
+    def __iter__(self):
+        if self.complete:
+            yield from self.paths
+            return
+        del self.paths[:]
+        for path, size in scan_files_by_ext(self.folder_path, *self.scan_args):
+            self.paths.append(path)
+            self.sizes[path] = size
+            yield path
+        self.complete = True
+
+    def files(self):
+        """完整文件列表（未遍历过时先遍历完）"""
+        if not self.complete:
+            for _ in self:
+                pass
+        return self.paths
+
+    def __len__(self):
+        return len(self.files())
+
+
+def get_all_files_by_ext(folder_path, exts):
+    """
+    获取指定文件夹下所有符合扩展名的文件路径（排除Word临时文件）
+    :param folder_path: 文件夹路径
+    :param exts: 扩展名列表（如['.docx', '.doc']）
+    :return: 符合条件的文件路径列表
+    """
+    return [path for path, _ in scan_files_by_ext(folder_path, exts)]
+
+
+# ------------------------------
+# 主功能区：Word处理功能
+# ------------------------------
+def clear_paragraphs(header_footer):
+    """清空页眉/页脚中的所有段落"""
+    hdr_ftr = header_footer._element
+    for p_element in hdr_ftr.p_lst:
+        hdr_ftr.remove(p_element)
+
+
+def add_template_run(paragraph, text, template):
+    """按模板的字体和字号添加一个文本run"""
+    run = paragraph.add_run(text)
+    run.font.name = template['font']
+    run._element.rPr.rFonts.set(qn('w:eastAsia'), template['font'])
+    run.font.size = Pt(template['size'])
+
+
+def add_field_run(paragraph, instr):
+    """添加一个Word域（如PAGE/NUMPAGES）：begin → 域代码 → separate → end"""
+    run = paragraph.add_run()
+    fld_char_begin = OxmlElement('w:fldChar')
+    fld_char_begin.set(qn('w:fldCharType'), 'begin')
+    run._r.append(fld_char_begin)
+
+    instr_text = OxmlElement('w:instrText')
+    instr_text.text = instr
+    run._r.append(instr_text)
+
+    fld_char_sep = OxmlElement('w:fldChar')
+    fld_char_sep.set(qn('w:fldCharType'), 'separate')
+    run._r.append(fld_char_sep)
+
+    fld_char_end = OxmlElement('w:fldChar')
+    fld_char_end.set(qn('w:fldCharType'), 'end')
+    run._r.append(fld_char_end)
+
+
+def build_header_template(template):
+    """构建页眉段落模板（左对齐；左缩进与各节页边距有关，深拷贝后按节设置）"""
+    paragraph = Paragraph(OxmlElement('w:p'), None)
+    paragraph.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    add_template_run(paragraph, template['text'], template)
+    return paragraph._p
+
+
+def build_footer_template(template):
+    """构建页脚段落模板（居中；格式中的{PAGE}、{NUMPAGES}等生成为Word域，其余为普通文字）"""
+    paragraph = Paragraph(OxmlElement('w:p'), None)
+    paragraph.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    text_format = template['format']
+    pos = 0
+    for match in FIELD_PATTERN.finditer(text_format):
+        if match.start() > pos:
+            add_template_run(paragraph, text_format[pos:match.start()], template)
+        add_field_run(paragraph, match.group(1))
+        pos = match.end()
+    if pos < len(text_format):
+        add_template_run(paragraph, text_format[pos:], template)
+    return paragraph._p
+
+
+def default_section_templates_path():
+    """页眉页脚模板配置文件的默认位置（程序或打包后exe所在目录）"""
+    return os.path.join(os.path.dirname(default_outline_rules_path()), SECTION_TEMPLATES_FILE)
+
+
+def load_section_templates(config_path):
+    """
+    读取页眉页脚模板配置文件（JSON），格式 {"header": {...}, "footer": {...}}，只需写出要修改的字段
+    :return: 与DEFAULT_SECTION_TEMPLATES合并后的模板
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    templates = {}
+    for kind, defaults in DEFAULT_SECTION_TEMPLATES.items():
+        overrides = data.get(kind, {})
+        if not isinstance(overrides, dict):
+            raise ValueError(f"{kind} 应为对象")
+        template = dict(defaults, **overrides)
+        for key, default in defaults.items():
+            if not isinstance(template[key], type(default)) and not (
+                    isinstance(default, float) and isinstance(template[key], int)):
+                raise ValueError(f"{kind}.{key} 类型错误")
+        templates[kind] = template
+    return templates
+
+
+def compile_section_templates(templates):
+    """预构建页眉/页脚段落，并计算模板签名（计入增量缓存的规则签名）"""
+    load_docx()
+    return {
+        'header': templates['header'],
+        'footer': templates['footer'],
+        'header_p': build_header_template(templates['header']),
+        'footer_p': build_footer_template(templates['footer']),
+        'signature': json.dumps(templates, sort_keys=True, ensure_ascii=False),
+    }
+
+
+_section_templates_cache = {}  # 配置文件路径（None为内置模板）→ 预构建的模板
+_section_templates_lock = threading.Lock()
+
+
+def get_section_templates(config_path=None):
+    """
+    获取当前生效的页眉页脚模板（线程安全，每个配置只构建一次，供整个批次深拷贝使用）
+    :param config_path: 配置文件路径，为None时使用默认位置（文件不存在则使用内置模板）
+    """
+    if config_path is None:
+        config_path = default_section_templates_path()
+        if not os.path.exists(config_path):
+            config_path = None
+    with _section_templates_lock:
+        templates = _section_templates_cache.get(config_path)
+        if templates is None:
+            try:
+                raw = load_section_templates(config_path) if config_path else DEFAULT_SECTION_TEMPLATES
+            except (OSError, ValueError, AttributeError) as e:
+                raise ValueError(f"页眉页脚模板配置错误（{config_path}）：{str(e)}")
+            templates = compile_section_templates(raw)
+            _section_templates_cache[config_path] = templates
+    return templates
+
+
+def section_parts_xml(doc):
+    """所有节属性和页眉页脚部件的序列化内容（用于比较节改写前后是否有变化）"""
+    data = [etree.tostring(sectPr) for sectPr in doc.element.sectPr_lst]
+    for rel in doc.part.rels.values():
+        if rel.reltype in (RT.HEADER, RT.FOOTER):
+            data.append(rel.rId.encode('ascii') + etree.tostring(rel.target_part.element))
+    return data
+
+
+def rewrite_sections(doc, opts, templates):
+    """
+    单次遍历所有节，按所选选项依次完成：断开链接并清空页眉页脚 → 添加页码页脚 → 添加自定义页眉
+    页眉页脚段落从预构建模板深拷贝，不再为每个节重新构建
+    :param opts: 处理选项（remove_header_footer/add_page_number/add_custom_header）
+    :param templates: get_section_templates的返回值
+    :return: 节属性或页眉页脚内容是否有变化（与已处理过的文档相同时为False）
+    """
+    before = section_parts_xml(doc)
+    remove = opts.get('remove_header_footer')
+    add_number = opts.get('add_page_number')
+    add_header = opts.get('add_custom_header')
+    header_template = templates['header']
+    footer_template = templates['footer']
+    for section in doc.sections:
+        if remove:
+            # 关键：断开当前节与前一节的页眉页脚链接（已有独立定义的保持不变）
+            section.header.is_linked_to_previous = False
+            section.footer.is_linked_to_previous = False
+            clear_paragraphs(section.header)
+            clear_paragraphs(section.footer)
+
+        if add_number:
+            section.footer_distance = Cm(footer_template['distance_cm'])
+            footer = section.footer
+            if not remove:  # 强制清空当前节页脚（去重逻辑）；已在上面清空过时不再重复
+                clear_paragraphs(footer)
+            footer._element.append(copy.deepcopy(templates['footer_p']))
+
+        if add_header:
+            section.header_distance = Cm(header_template['distance_cm'])
+            header = section.header
+            if not remove:
+                clear_paragraphs(header)
+            p_element = copy.deepcopy(templates['header_p'])
+            Paragraph(p_element, None).paragraph_format.left_indent = (
+                Cm(header_template['indent_cm']) - section.left_margin)
+            header._element.append(p_element)
+    return section_parts_xml(doc) != before
+
+
+def replace_patterns_in_paragraph(paragraph):
+    """
+    替换段落中符合特定模式的文本（复用全局编译的正则，提升速度）
+    :param paragraph: 需要处理的段落对象
+    :return: 被修改的run数量
+    """
+    return replace_patterns_in_runs(paragraph.runs)
+
+
+def collect_replace_spans(text):
+    """
+    收集文本中所有需要删除的区间，并合并为有序、互不重叠的区间列表
+    （三个正则各自独立匹配，结果取并集，与逐个re.sub标记的效果一致）
+    :param text: 段落完整文本
+    :return: [(start, end), ...]
+    """
+    spans = []
+    for pattern in (chinese_pattern, english_pattern, k_pattern):
+        spans.extend(match.span() for match in pattern.finditer(text))
+    if len(spans) < 2:
+        return spans
+
+    spans.sort()
+    merged = [spans[0]]
+    for start, end in spans[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end:
+            merged[-1] = (last_start, max(last_end, end))  # 重叠或相邻，合并
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def replace_patterns_in_runs(runs, text_of=None):
+    """
+    替换一组文本片段中符合特定模式的文本（python-docx的Run对象或CT_R元素均可）
+    按区间切片处理，只改写与删除区间相交的run，其余run保持原样
+    :param runs: 段落中按顺序排列的文本片段，需支持读写text属性
+    :param text_of: 读取run文本的函数（可选），默认读取text属性
+    :return: 被修改的run数量
+    """
+    text_runs = []  # 存储段落中所有非空文本片段（run对象及其文本）
+    for run in runs:
+        text = text_of(run) if text_of else run.text
+        if text:
+            text_runs.append((run, text))
+    if not text_runs:
+        return 0  # 无文本则直接返回
+
+    # 合并所有文本用于匹配
+    all_text = ''.join([text for _, text in text_runs])
+    spans = collect_replace_spans(all_text)
+    if not spans:
+        return 0
+
+    modified = 0
+    span_idx = 0  # 区间指针：区间和run都按位置有序，整体只需线性扫描一遍
+    run_start = 0
+    for run, text in text_runs:
+        run_end = run_start + len(text)
+        # 跳过已完全位于当前run之前的区间
+        while span_idx < len(spans) and spans[span_idx][1] <= run_start:
+            span_idx += 1
+        if span_idx == len(spans):
+            break  # 后续run都不再与任何区间相交
+        if spans[span_idx][0] >= run_end:
+            run_start = run_end
+            continue  # 当前run与区间不相交，保持原样
+
+        # 按区间切片，拼接保留部分
+        pieces = []
+        pos = run_start
+        idx = span_idx
+        while idx < len(spans) and spans[idx][0] < run_end:
+            start, end = spans[idx]
+            if start > pos:
+                pieces.append(text[pos - run_start:start - run_start])
+            pos = max(pos, end)
+            if end > run_end:
+                break  # 区间跨到下一个run，留给下一个run继续处理
+            idx += 1
+        if pos < run_end:
+            pieces.append(text[pos - run_start:])
+        run.text = ''.join(pieces)  # 更新run的文本
+        modified += 1
+        run_start = run_end
+    return modified
+
+
+# ------------------------------
+# 大纲级别规则引擎
+# ------------------------------
+def parse_chinese_number(text):
+    """
+    解析阿拉伯数字或中文数字（如"二十一"、"一百零五"、"两千"、"二〇二四"）
+    :param text: 数字文本
+    :return: 整数值，格式不合法时返回None
+    """
+    if not text:
+        return None
+    if text.isdigit():
+        return int(text)
+    # 纯数字字符逐位读法（如"二〇二四"）
+    if len(text) > 1 and all(ch in CHINESE_DIGITS for ch in text):
+        return int(''.join(str(CHINESE_DIGITS[ch]) for ch in text))
+
+    total = 0  # 已完成的万/亿节
+    section = 0  # 当前节（万以下）的累计值
+    number = None  # 尚未乘以单位的数字
+    last_unit = None  # 当前节内上一个单位，单位必须从大到小出现
+    last_section_unit = None
+    for ch in text:
+        if ch in CHINESE_DIGITS:
+            if number:  # 连续两个非零数字（如"二三十"）不合法；"零"后可接数字
+                return None
+            number = CHINESE_DIGITS[ch]
+        elif ch in CHINESE_UNITS:
+            unit = CHINESE_UNITS[ch]
+            if last_unit is not None and unit >= last_unit:
+                return None
+            if number is None:
+                # 省略"一"的写法只允许出现在开头的"十"（如"十五"）
+                if unit != 10 or total or section:
+                    return None
+                number = 1
+            section += number * unit
+            number = None
+            last_unit = unit
+        elif ch in CHINESE_SECTION_UNITS:
+            unit = CHINESE_SECTION_UNITS[ch]
+            if last_section_unit is not None and unit >= last_section_unit:
+                return None
+            section += number or 0
+            if not section:
+                return None
+            total += section * unit
+            section, number, last_unit, last_section_unit = 0, None, None, unit
+        else:
+            return None
+    return total + section + (number or 0)
+
+
+def compile_outline_rules(rules):
+    """
+    将大纲规则编译为一个组合正则，每段文字只需一次扫描
+    :param rules: 规则字典列表，见DEFAULT_OUTLINE_RULES
+    :return: 规则集字典 {'regex', 'rules', 'triggers', 'signature'}
+    """
+    alternatives = []
+    triggers = set()
+    for idx, rule in enumerate(rules):
+        level = int(rule.get('level', 1))
+        if not 1 <= level <= 9:
+            raise ValueError(f"大纲规则“{rule.get('name', idx)}”的级别必须为1~9")
+        pattern = rule['pattern'].replace('{num}', f'(?P<n{idx}>{NUMBER_PATTERN})')
+        alternatives.append(f'(?P<r{idx}>{pattern})')
+        if triggers is not None and rule.get('triggers'):
+            triggers.update(rule['triggers'])
+        else:
+            triggers = None  # 任一规则没有触发字符，预筛无法安全跳过
+    signature_data = json.dumps(
+        [[rule['pattern'], int(rule.get('level', 1))] for rule in rules], ensure_ascii=False)
+    return {
+        'regex': re.compile('|'.join(alternatives)) if alternatives else None,
+        'rules': list(rules),
+        'triggers': tuple(sorted(triggers)) if triggers is not None else None,
+        'signature': hashlib.sha256(signature_data.encode('utf-8')).hexdigest(),
+    }
+
+
+def default_outline_rules_path():
+    """额外大纲规则配置文件的默认位置（程序或打包后exe所在目录）"""
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, OUTLINE_RULES_FILE)
+
+
+def load_outline_rules(config_path):
+    """
+    读取大纲规则配置文件（JSON）
+    格式：规则列表，或 {"replace_defaults": false, "rules": [...]}；replace_defaults为true时不再使用内置规则
+    :return: 合并后的规则列表
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {'rules': data}
+    extra_rules = data.get('rules', [])
+    for rule in extra_rules:
+        if not isinstance(rule, dict) or not rule.get('pattern'):
+            raise ValueError(f"大纲规则配置格式错误：{config_path}")
+    base_rules = [] if data.get('replace_defaults') else DEFAULT_OUTLINE_RULES
+    return base_rules + extra_rules
+
+
+# 内置规则在模块加载时预编译；带配置文件的规则集按路径缓存
+DEFAULT_OUTLINE_RULESET = compile_outline_rules(DEFAULT_OUTLINE_RULES)
+_outline_ruleset_cache = {}
+_outline_ruleset_lock = threading.Lock()
+
+
+def get_outline_ruleset(config_path=None):
+    """
+    获取当前生效的大纲规则集（线程安全，每个配置文件只读取和编译一次）
+    :param config_path: 配置文件路径，为None时使用默认位置（文件不存在则只用内置规则）
+    """
+    if config_path is None:
+        config_path = default_outline_rules_path()
+        if not os.path.exists(config_path):
+            return DEFAULT_OUTLINE_RULESET
+    with _outline_ruleset_lock:
+        ruleset = _outline_ruleset_cache.get(config_path)
+        if ruleset is None:
+            try:
+                ruleset = compile_outline_rules(load_outline_rules(config_path))
+            except (OSError, ValueError, KeyError, re.error) as e:
+                raise ValueError(f"大纲规则配置错误（{config_path}）：{str(e)}")
+            _outline_ruleset_cache[config_path] = ruleset
+    return ruleset
+
+
+def _match_shorter_number(text, rule, match, idx):
+    """
+    编号部分贪婪匹配后不合法时（如"十十"），从长到短尝试其合法前缀，前缀之后的文本仍须符合规则其余部分
+    （与旧版按候选数字逐个回溯的正则效果一致，如"题型十十"按"题型十"命中）
+    """
+    start, end = match.span(f'n{idx}')
+    for cut in range(end - 1, start, -1):
+        number = text[start:cut]
+        if parse_chinese_number(number) is None:
+            continue
+        if re.match(rule['pattern'].replace('{num}', re.escape(number)), text[match.start():]):
+            return True
+    return False
+
+
+def match_outline_rule(text, ruleset):
+    """
+    在文本中查找第一个命中的大纲规则（所有规则在同一个组合正则中扫描）
+    :return: 命中的规则字典，未命中返回None
+    """
+    regex = ruleset['regex']
+    if regex is None:
+        return None
+    pos = 0
+    while True:
+        match = regex.search(text, pos)
+        if match is None:
+            return None
+        idx = int(match.lastgroup[1:])
+        rule = ruleset['rules'][idx]
+        number = match.group(f'n{idx}') if f'n{idx}' in regex.groupindex else None
+        # 数字部分必须能正确解析，否则退而尝试更短的编号
+        if number is None or parse_chinese_number(number) is not None:
+            return rule
+        if _match_shorter_number(text, rule, match, idx):
+            return rule
+        pos = match.start() + 1
+
+
+def set_paragraph_outline_level(p_element, text, ruleset=None):
+    """
+    若段落文本命中大纲规则，按规则设置段落的大纲级别
+    :param p_element: 段落的w:p元素
+    :param text: 段落文本
+    :param ruleset: 大纲规则集，为None时使用内置规则
+    :return: 是否修改了段落（已是目标大纲级别时不改动）
+    """
+    rule = match_outline_rule(text.strip(), ruleset or DEFAULT_OUTLINE_RULESET)
+    if rule is None:
+        return False
+    level = str(int(rule.get('level', 1)) - 1)
+    p_pr = p_element.pPr
+    if p_pr is not None:
+        existing = p_pr.findall(qn('w:outlineLvl'))
+        if len(existing) == 1 and existing[0].get(qn('w:val')) == level and p_pr[-1] is existing[0]:
+            return False
+    # 获取或创建段落属性元素
+    p_pr = p_element.get_or_add_pPr()
+    # 移除已有的大纲级别设置（避免重复）
+    for elem in p_pr.findall(qn('w:outlineLvl')):
+        p_pr.remove(elem)
+    # 创建大纲级别元素（Word中0对应1级）
+    outline_level = OxmlElement('w:outlineLvl')
+    outline_level.set(qn('w:val'), level)
+    p_pr.append(outline_level)
+    return True
+
+
+def set_outline_level(doc, ruleset=None):
+    """
+    将文档中符合大纲规则的段落设置为对应的大纲级别（内置规则均为1级）
+    """
+    ruleset = ruleset or get_outline_ruleset()
+    rewrite_story_paragraphs(doc.element.body, False, ruleset)
+
+
+# ------------------------------
+# 预筛：廉价的字符检查，跳过不可能命中规则的文档和段落
+# ------------------------------
+def add_stat(stats, key, count=1):
+    """累加统计项（stats为None时不统计）"""
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + count
+
+
+# ------------------------------
+# 阶段计时：记录每个文件各处理阶段的墙钟/CPU耗时（未启用时为空操作）
+# ------------------------------
+OUTLIER_FACTOR = 3  # 单文件耗时超过中位数的倍数即视为异常文件
+TIMINGS_REPORT_NAME = 'wordprocess_timings'  # 界面模式导出阶段耗时的文件名（不含扩展名）
+_NO_TIMING = contextlib.nullcontext()  # 未启用计时时复用的空上下文，避免额外开销
+
+
+def add_timing(timings, stage, wall, cpu):
+    """累加某阶段的墙钟时间和CPU时间（秒）"""
+    entry = timings.get(stage)
+    if entry is None:
+        timings[stage] = {'wall': wall, 'cpu': cpu}
+    else:
+        entry['wall'] += wall
+        entry['cpu'] += cpu
+
+
+@contextlib.contextmanager
+def _timed_stage(timings, stage):
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()  # 线程CPU时间，线程池中各文件互不干扰
+    try:
+        yield
+    finally:
+        add_timing(timings, stage, time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+
+
+def stage_timer(timings, stage):
+    """
+    阶段计时上下文：with stage_timer(timings, 'load'): ...
+    :param timings: 计时字典，为None时不计时
+    """
+    if timings is None:
+        return _NO_TIMING
+    return _timed_stage(timings, stage)
+
+
+def percentile(sorted_values, q):
+    """最近秩法百分位数（sorted_values需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize_timings(results):
+    """
+    汇总一批文件的阶段耗时：各阶段墙钟/CPU时间的分位数，以及耗时异常的文件
+    :param results: 结果字典列表（含timings字段）
+    :return: {'stages': {阶段: 统计}, 'outliers': [...]}
+    """
+    per_stage = {}
+    for result in results:
+        for stage, entry in (result.get('timings') or {}).items():
+            walls, cpus = per_stage.setdefault(stage, ([], []))
+            walls.append(entry['wall'])
+            cpus.append(entry['cpu'])
+
+    stages = {}
+    for stage, (walls, cpus) in per_stage.items():
+        walls.sort()
+        stages[stage] = {
+            'files': len(walls),
+            'total_wall': round(sum(walls), 4),
+            'total_cpu': round(sum(cpus), 4),
+            'p50': round(percentile(walls, 50), 4),
+            'p90': round(percentile(walls, 90), 4),
+            'p99': round(percentile(walls, 99), 4),
+            'max': round(walls[-1], 4),
+        }
+
+    timed = [r for r in results if r.get('timings')]
+    elapsed = sorted(r['elapsed'] for r in timed)
+    median = percentile(elapsed, 50)
+    outliers = []
+    for result in timed:
+        if median and result['elapsed'] > OUTLIER_FACTOR * median:
+            slowest = max(result['timings'].items(), key=lambda item: item[1]['wall'])[0]
+            outliers.append({'path': result['path'], 'elapsed': round(result['elapsed'], 4),
+                             'slowest_stage': slowest})
+    outliers.sort(key=lambda item: item['elapsed'], reverse=True)
+    return {'stages': stages, 'outliers': outliers}
+
+
+def export_timings_json(path, results):
+    """导出每个文件的阶段耗时和批次汇总（JSON）"""
+    data = {
+        'summary': summarize_timings(results),
+        'files': [{'path': r['path'], 'elapsed': r['elapsed'], 'stats': r['stats'], 'timings': r.get('timings')}
+                  for r in results if r.get('timings')],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def export_timings_csv(path, results):
+    """导出每个文件的阶段耗时（CSV，每行一个文件，每阶段墙钟/CPU两列）"""
+    import csv  # 用于导出阶段耗时（按需导入）
+
+    timed = [r for r in results if r.get('timings')]
+    stage_names = []
+    for result in timed:
+        for stage in result['timings']:
+            if stage not in stage_names:
+                stage_names.append(stage)
+    # utf-8-sig便于Excel直接打开中文路径
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path', 'elapsed', 'paragraphs', 'runs_modified']
+                        + [f"{stage}_{kind}" for stage in stage_names for kind in ('wall', 'cpu')])
+        for result in timed:
+            row = [result['path'], round(result['elapsed'], 6),
+                   result['stats'].get('paragraphs', 0), result['stats'].get('runs_modified', 0)]
+            for stage in stage_names:
+                entry = result['timings'].get(stage, {'wall': 0.0, 'cpu': 0.0})
+                row += [round(entry['wall'], 6), round(entry['cpu'], 6)]
+            writer.writerow(row)
+
+
+def profile_dump_path(profile_dir, file_path):
+    """单文件性能剖析结果的保存路径（文件名+路径哈希，避免同名文件互相覆盖）"""
+    digest = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(profile_dir, f"{os.path.basename(file_path)}.{digest}.prof")
+
+
+def text_may_need_replace(text):
+    """文本中是否可能存在需删除的括号内容（不含任何左括号则一定不存在）"""
+    return any(c in text for c in REPLACE_TRIGGER_CHARS)
+
+
+def text_may_need_outline(text, ruleset):
+    """文本中是否可能符合大纲级别规则（不含任何规则的触发字符则一定不符合）"""
+    triggers = ruleset['triggers']
+    return triggers is None or any(c in text for c in triggers)
+
+
+def _prescreen_member(zf, name, outline_bytes):
+    """
+    按字节预筛压缩包中的一个XML成员
+    :return: (可能需要括号替换, 可能需要设置大纲级别)
+    """
+    may_replace = may_outline = False
+    carry = b''  # 跨数据块保留的尾部字节，避免多字节字符被切断后漏判
+    with zf.open(name) as src:
+        for chunk in iter(lambda: src.read(STREAM_CHUNK_SIZE), b''):
+            data = carry + chunk
+            # 出现字符引用时无法按字节判断，保守处理为可能命中
+            if b'&#' in data:
+                return True, True
+            may_replace = may_replace or any(t in data for t in REPLACE_TRIGGER_BYTES)
+            may_outline = may_outline or any(t in data for t in outline_bytes)
+            if may_replace and (may_outline or not outline_bytes):
+                break
+            carry = data[-2:]
+    return may_replace, may_outline
+
+
+def prescreen_docx(file_path, ruleset=None):
+    """
+    在原始XML字节层面预筛文档，不解析XML
+    括号替换检查正文及页眉页脚、脚注、尾注、批注；大纲级别只检查正文
+    :param file_path: docx文件路径
+    :param ruleset: 大纲规则集，为None时使用内置规则
+    :return: (可能需要括号替换, 可能需要设置大纲级别)
+    """
+    triggers = (ruleset or DEFAULT_OUTLINE_RULESET)['triggers']
+    if triggers is None:
+        return True, True
+    outline_bytes = tuple(c.encode('utf-8') for c in triggers)
+    with zipfile.ZipFile(file_path) as zf:
+        may_replace, may_outline = _prescreen_member(zf, DOCUMENT_XML, outline_bytes)
+        if not may_replace:
+            for name in zf.namelist():
+                if name != DOCUMENT_XML and STORY_MEMBER_PATTERN.match(name) and _prescreen_member(zf, name, ())[0]:
+                    may_replace = True
+                    break
+    return may_replace, may_outline
+
+
+def process_paragraph_element(p_element, do_replace, outline_ruleset=None, stats=None, timings=None):
+    """
+    对单个w:p元素应用括号替换和大纲级别规则（先替换后判断大纲，与整篇依次处理的结果一致）
+    先用段落全部文本节点做字符预筛，未命中则不拆分run
+    :param p_element: 段落的w:p元素
+    :param do_replace: 是否执行括号替换
+    :param outline_ruleset: 大纲规则集，为None时不设置大纲级别
+    :param stats: 统计字典（可选）
+    :param timings: 计时字典（可选），分别累计replace_patterns和set_outline_level阶段
+    :return: 是否修改了段落
+    """
+    # 段落内所有文本节点（run文本的超集）；由lxml在C层拼接，itertext在python-docx元素类上会逐个调用text属性
+    raw_text = etree.tostring(p_element, method='text', encoding=str, with_tail=False)
+    need_replace = do_replace and text_may_need_replace(raw_text)
+    need_outline = outline_ruleset is not None and text_may_need_outline(raw_text, outline_ruleset)
+    add_stat(stats, 'paragraphs')
+    if not (need_replace or need_outline):
+        add_stat(stats, 'paragraphs_skipped')
+        return False
+    modified = False
+    if need_replace:
+        with stage_timer(timings, 'replace_patterns'):
+            runs = p_element.r_lst
+            runs_modified = replace_patterns_in_runs(runs, run_element_text)
+            add_stat(stats, 'runs_scanned', len(runs))
+            add_stat(stats, 'runs_modified', runs_modified)
+            modified = runs_modified > 0
+    if need_outline:
+        with stage_timer(timings, 'set_outline_level'):
+            modified = set_paragraph_outline_level(
+                p_element, paragraph_element_text(p_element), outline_ruleset) or modified
+    return modified
+
+
+# ------------------------------
+# 全文遍历：正文（含嵌套表格、文本框、内容控件）及页眉页脚、脚注、尾注、批注中的所有段落
+# ------------------------------
+# 标签名直接写成Clark形式（与qn()结果相同），模块导入时不依赖python-docx
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_P = W_NS + 'p'
+W_BODY = W_NS + 'body'
+NESTED_CONTAINER_TAGS = frozenset((W_NS + 'tc', W_NS + 'txbxContent'))  # 其中的段落不设置大纲级别
+# 正文以外含段落的部件：页眉、页脚、脚注、尾注、批注（与RT.HEADER等相同）
+RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+STORY_PART_RELTYPES = tuple(RELATIONSHIP_NS + name for name in ('header', 'footer', 'footnotes', 'endnotes', 'comments'))
+STORY_MEMBER_PATTERN = re.compile(r'word/(header\d*|footer\d*|footnotes|endnotes|comments)\.xml$')
+
+
+W_R = W_NS + 'r'
+W_HYPERLINK = W_NS + 'hyperlink'
+# run中计入文本的子元素（与python-docx的CT_R.text相同）
+RUN_TEXT_TAGS = frozenset(W_NS + tag for tag in ('br', 'cr', 'noBreakHyphen', 'ptab', 't', 'tab'))
+
+
+def run_element_text(r_element):
+    """run的文本，结果与CT_R.text相同，但直接遍历子元素，不为每个run执行XPath查询"""
+    return ''.join([str(child) for child in r_element if child.tag in RUN_TEXT_TAGS])
+
+
+def paragraph_element_text(p_element):
+    """段落的文本（直接子run及超链接中的run），结果与CT_P.text相同"""
+    parts = []
+    for child in p_element:
+        if child.tag == W_R:
+            parts.append(run_element_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(run_element_text(r) for r in child.iterchildren(W_R))
+    return ''.join(parts)
+
+
+def is_body_level_paragraph(p_element):
+    """段落是否位于正文层级（不在表格单元格或文本框中；内容控件中的段落仍属于正文层级）"""
+    parent = p_element.getparent()
+    while parent is not None:
+        if parent.tag in NESTED_CONTAINER_TAGS:
+            return False
+        if parent.tag == W_BODY:
+            return True
+        parent = parent.getparent()
+    return False
+
+
+def rewrite_story_paragraphs(root, do_replace, outline_ruleset=None, stats=None, timings=None):
+    """
+    一次遍历root下的全部w:p元素（含任意层嵌套表格、文本框、内容控件中的段落）
+    直接遍历XML元素，合并单元格只对应一个w:tc，不会像row.cells那样重复处理
+    括号替换作用于所有段落；大纲级别只设置正文层级的段落
+    :param root: 部件根元素或其子元素（如w:body）
+    :param do_replace: 是否执行括号替换
+    :param outline_ruleset: 大纲规则集，为None时不设置大纲级别
+    :return: 是否有段落被修改
+    """
+    modified = False
+    for p in root.iter(W_P):
+        ruleset = outline_ruleset
+        if ruleset is not None and not is_body_level_paragraph(p):
+            if not do_replace:
+                continue
+            ruleset = None
+        modified = process_paragraph_element(p, do_replace, ruleset, stats, timings) or modified
+    return modified
+
+
+def iter_story_parts(doc):
+    """文档中除正文外含段落的部件（页眉、页脚、脚注、尾注、批注），每个部件只产出一次"""
+    seen = set()
+    for rel in doc.part.rels.values():
+        if rel.is_external or rel.reltype not in STORY_PART_RELTYPES:
+            continue
+        part = rel.target_part
+        if id(part) not in seen:
+            seen.add(id(part))
+            yield part
+
+
+def rewrite_story_parts(doc, stats=None, timings=None):
+    """
+    对页眉、页脚、脚注、尾注、批注中的段落执行括号替换
+    python-docx未解析的部件（脚注、尾注）按需解析，有修改时写回部件内容
+    :return: 是否有部件被修改
+    """
+    modified = False
+    for part in iter_story_parts(doc):
+        element = getattr(part, 'element', None)
+        if element is not None:
+            modified = rewrite_story_paragraphs(element, True, None, stats, timings) or modified
+            continue
+        blob = part.blob
+        if not any(t in blob for t in REPLACE_TRIGGER_BYTES) and b'&#' not in blob:
+            continue
+        element = parse_xml(blob)
+        if rewrite_story_paragraphs(element, True, None, stats, timings):
+            part._blob = serialize_part_xml(element)
+            modified = True
+    return modified
+
+
+# ------------------------------
+# 流式XML引擎（逐段解析document.xml，不构建python-docx对象模型；页眉页脚等小部件整体解析）
+# ------------------------------
+DOCUMENT_XML = 'word/document.xml'
+STREAM_CHUNK_SIZE = 64 * 1024  # 每次送入解析器的字节数
+STREAM_SPLIT_MARK = 'stream-split'  # 拆分起止标签用的注释标记
+
+
+def _serialize_fragment(parser, document, elem):
+    """
+    序列化document的一个子孙元素，命名空间声明统一由根元素承担（避免每段重复声明）
+    :return: 元素的XML字节串
+    """
+    wrapper = parser.makeelement(document.tag, nsmap=document.nsmap)
+    wrapper.append(elem)  # 移入临时根元素，同时从原树中摘除，释放已处理内容
+    data = etree.tostring(wrapper, encoding='UTF-8', xml_declaration=False)
+    wrapper.remove(elem)
+    return data[data.index(b'>') + 1:data.rindex(b'</')]
+
+
+def _open_close_tags(parser, document, body=None):
+    """生成根元素（或body元素）的起始标签和结束标签字节串"""
+    shell = parser.makeelement(document.tag, attrib=dict(document.attrib), nsmap=document.nsmap)
+    inner = shell
+    if body is not None:
+        inner = etree.SubElement(shell, body.tag, attrib=dict(body.attrib))
+    inner.append(etree.Comment(STREAM_SPLIT_MARK))
+    data = etree.tostring(shell, encoding='UTF-8', xml_declaration=False)
+    if body is not None:
+        data = data[data.index(b'>') + 1:data.rindex(b'</')]
+    head, tail = data.split(f'<!--{STREAM_SPLIT_MARK}-->'.encode('utf-8'))
+    return head, tail
+
+
+def stream_rewrite_document_xml(src, dst, opts, stats=None, timings=None):
+    """
+    单遍流式改写document.xml：body下每个顶层元素解析完成即处理、写出并释放
+    峰值内存只与单个段落/表格大小相关，与文档总长度无关
+    :param src: 原document.xml的可读二进制流
+    :param dst: 目标可写二进制流
+    :param opts: 普通字典形式的处理选项
+    :param stats: 统计字典（可选）
+    :param timings: 计时字典（可选）
+    :return: 是否有元素被修改
+    """
+    do_replace = bool(opts.get('replace_patterns'))
+    outline_ruleset = None
+    if opts.get('set_question_outline'):
+        outline_ruleset = get_outline_ruleset(opts.get('outline_rules_path'))
+    parser = etree.XMLPullParser(
+        events=('start', 'end'), remove_blank_text=True, resolve_entities=False, huge_tree=True
+    )
+    parser.set_element_class_lookup(element_class_lookup)
+    document = body = None
+    doc_tail = body_tail = b''
+    modified = False
+    dst.write(b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n")
+
+    for chunk in iter(lambda: src.read(STREAM_CHUNK_SIZE), b''):
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if document is None:
+                    document = elem
+                    head, doc_tail = _open_close_tags(parser, document)
+                    dst.write(head)
+                elif body is None and elem.tag == W_BODY and elem.getparent() is document:
+                    body = elem
+                    head, body_tail = _open_close_tags(parser, document, body)
+                    dst.write(head)
+                continue
+
+            parent = elem.getparent()
+            if elem is body:
+                dst.write(body_tail)
+            elif elem is document:
+                dst.write(doc_tail)
+            elif parent is body:
+                # body下的一个顶层元素（段落、表格、内容控件等）及其中的所有段落
+                modified = rewrite_story_paragraphs(elem, do_replace, outline_ruleset, stats, timings) or modified
+                dst.write(_serialize_fragment(parser, document, elem))
+            elif parent is document:
+                # body之外的顶层元素（如w:background）原样写出
+                dst.write(_serialize_fragment(parser, document, elem))
+    parser.close()
+    return modified
+
+
+# ------------------------------
+# 安全写入：写入同目录临时文件后原子替换原文件，备份用硬链接代替复制
+# ------------------------------
+# 原样复制压缩数据时按ZIP格式规范读写本地文件头（固定30字节：签名、版本、标志、压缩方式、时间、日期、CRC、
+# 压缩后大小、原始大小、文件名长度、扩展字段长度），写入目标压缩包只经由zipfile的公开接口，见ZipRawCopier
+ZIP_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+ZIP_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+ZIP_RAW_COPY_PYTHON = (3, 6)  # 依赖ZipFile.open的写模式（Python 3.6起提供）
+ZIP_RAW_COPY_MAX_SIZE = 0x7FFFFFFF  # 更大的成员需要ZIP64扩展字段，不原样复制
+
+
+def make_temp_path(file_path):
+    """在目标文件所在目录创建临时文件（同一文件系统内才能原子替换），返回其路径"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', prefix='~wp', dir=os.path.dirname(file_path) or '.')
+    os.close(fd)
+    return tmp_path
+
+
+def replace_file(tmp_path, file_path, keep_backup, timings=None):
+    """
+    用已写完的临时文件原子替换原文件，中途崩溃时原文件保持完整
+    需要备份（且尚无备份）时，将原文件硬链接为.bak，不复制文件内容；文件系统不支持硬链接时改为重命名
+    :param tmp_path: 已写好的临时文件
+    :param file_path: 原文件
+    :param keep_backup: 是否保留备份
+    :param timings: 计时字典（可选）
+    """
+    shutil.copymode(file_path, tmp_path)  # 临时文件默认仅所有者可读写，沿用原文件权限
+    backup_path = f"{file_path}.bak"
+    if not keep_backup or os.path.exists(backup_path):
+        os.replace(tmp_path, file_path)
+        return
+    with stage_timer(timings, 'backup'):
+        try:
+            os.link(file_path, backup_path)
+            renamed = False
+        except OSError:
+            os.rename(file_path, backup_path)
+            renamed = True
+    try:
+        os.replace(tmp_path, file_path)
+    except OSError:
+        if renamed:
+            os.rename(backup_path, file_path)  # 替换失败时恢复原文件
+        raise
+
+
+class ZipRawCopier:
+    """
+    将源压缩包中未修改的成员原样复制到目标压缩包（直接复制压缩后的字节，不解压也不重新压缩）
+    不改动ZipFile的内部写入状态：压缩数据以“存储”方式经ZipFile.open写入，目录和偏移由zipfile自己维护；
+    写完后把同一ZipInfo的压缩方式、CRC和原始大小改为源成员的值（中央目录按它写出），
+    目标压缩包关闭后再由finish改写这些成员的本地文件头并核对中央目录
+    :param source_path: 源压缩包路径
+    """
+
+    def __init__(self, source_path):
+        self.source = open(source_path, 'rb')
+        self.copied = []  # [(目标ZipInfo, 源ZipInfo)]
+
+    @staticmethod
+    def can_copy(info):
+        """成员能否原样复制（Python版本过低、成员加密或需要ZIP64时不能，由调用方重新压缩写入）"""
+        return (sys.version_info >= ZIP_RAW_COPY_PYTHON and not info.flag_bits & 0x01
+                and max(info.compress_size, info.file_size) <= ZIP_RAW_COPY_MAX_SIZE)
+
+    def copy(self, info, zout):
+        """
+        复制一个成员（调用前须用can_copy检查）
+        :param info: 源成员的ZipInfo
+        :param zout: 目标ZipFile（写模式，须写入可随机访问的文件）
+        """
+        self.source.seek(info.header_offset)
+        header = ZIP_LOCAL_HEADER.unpack(self.source.read(ZIP_LOCAL_HEADER.size))
+        if header[0] != ZIP_LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"压缩包成员的本地文件头不正确：{info.filename}")
+        self.source.seek(header[9] + header[10], os.SEEK_CUR)
+
+        target = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+        target.compress_type = zipfile.ZIP_STORED
+        target.external_attr = info.external_attr
+        with zout.open(target, 'w') as dst:
+            remaining = info.compress_size
+            while remaining:
+                data = self.source.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not data:
+                    raise zipfile.BadZipFile(f"压缩包成员数据不完整：{info.filename}")
+                dst.write(data)
+                remaining -= len(data)
+        target.compress_type = info.compress_type
+        target.CRC = info.CRC
+        target.file_size = info.file_size
+        self.copied.append((target, info))
+
+    def finish(self, output_path):
+        """目标压缩包关闭后调用：本地文件头改为与源成员一致，并确认中央目录记录的是源成员的压缩方式和CRC"""
+        if not self.copied:
+            return
+        with open(output_path, 'r+b') as f:
+            for target, info in self.copied:
+                f.seek(target.header_offset)
+                header = list(ZIP_LOCAL_HEADER.unpack(f.read(ZIP_LOCAL_HEADER.size)))
+                if (header[0] != ZIP_LOCAL_HEADER_SIGNATURE or header[3] != zipfile.ZIP_STORED
+                        or header[7] != info.compress_size):
+                    raise zipfile.BadZipFile(f"原样复制的成员本地文件头与预期不符：{info.filename}")
+                header[3], header[6], header[8] = info.compress_type, info.CRC, info.file_size
+                f.seek(target.header_offset)
+                f.write(ZIP_LOCAL_HEADER.pack(*header))
+        with zipfile.ZipFile(output_path) as zf:
+            for target, info in self.copied:
+                written = zf.getinfo(info.filename)
+                if (written.compress_type, written.CRC, written.file_size) != (
+                        info.compress_type, info.CRC, info.file_size):
+                    raise zipfile.BadZipFile(f"原样复制的成员目录记录与预期不符：{info.filename}")
+
+    def close(self):
+        self.source.close()
+
+
+def open_output_zip(path, compress_level):
+    """按压缩级别创建目标压缩包（级别为0时不压缩）"""
+    if compress_level == 0:
+        return zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)
+    return zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=compress_level)
+
+
+def normalize_compress_level(value):
+    """压缩级别限定在0~9，未设置时使用默认级别"""
+    if value is None:
+        return DEFAULT_OPTIONS['compress_level']
+    return max(0, min(9, int(value)))
+
+
+def content_types_xml(parts):
+    """
+    生成[Content_Types].xml（与python-docx保存时相同：常见扩展名的部件用Default，其余用Override，均按名称排序）
+    :param parts: 文档包的全部部件
+    :return: XML字节串
+    """
+    defaults = {'rels': CT.OPC_RELATIONSHIPS, 'xml': CT.XML}
+    overrides = {}
+    for part in parts:
+        ext = part.partname.ext
+        if (ext.lower(), part.content_type) in default_content_types:
+            defaults[ext.lower()] = part.content_type
+        else:
+            overrides[part.partname] = part.content_type
+    types = CT_Types.new()
+    for ext in sorted(defaults):
+        types.add_default(ext, defaults[ext])
+    for partname in sorted(overrides):
+        types.add_override(partname, overrides[partname])
+    return serialize_part_xml(types)
+
+
+class PackagePartWriter:
+    """
+    python-docx文档包的写入器，可设置压缩级别；
+    与源文件中内容完全相同的部件直接复制原压缩数据（见ZipRawCopier），只有修改过的部件重新压缩
+    :param path: 输出路径
+    :param source_path: 源文件路径，为None时所有部件都重新压缩
+    :param compress_level: zip压缩级别
+    """
+
+    def __init__(self, path, source_path=None, compress_level=None):
+        self.path = path
+        self.zout = open_output_zip(path, normalize_compress_level(compress_level))
+        self.zin = zipfile.ZipFile(source_path) if source_path else None
+        self.copier = ZipRawCopier(source_path) if source_path else None
+        self.reused = 0
+
+    def write(self, pack_uri, blob):
+        name = pack_uri.membername
+        try:
+            info = self.zin.getinfo(name) if self.zin is not None else None
+        except KeyError:
+            info = None
+        # 大小和CRC都相同时再逐字节确认（解压远比压缩便宜）
+        if (info is not None and self.copier.can_copy(info) and info.file_size == len(blob)
+                and info.CRC == zlib.crc32(blob) and self.zin.read(info) == blob):
+            self.copier.copy(info, self.zout)
+            self.reused += 1
+        else:
+            self.zout.writestr(name, blob)
+
+    def close(self):
+        """关闭目标压缩包，并补全原样复制的成员的本地文件头"""
+        try:
+            self.zout.close()
+            if self.copier is not None:
+                self.copier.finish(self.path)
+        finally:
+            if self.zin is not None:
+                self.zin.close()
+                self.copier.close()
+
+
+def save_document(doc, file_path, keep_backup, opts, stats=None, timings=None):
+    """
+    保存文档：写入同目录临时文件，再原子替换原文件（并按需硬链接备份）
+    :param doc: Document对象（从file_path打开）
+    :param file_path: 原文件路径
+    :param keep_backup: 是否保留备份
+    :param opts: 处理选项（compress_level/reuse_unmodified_parts）
+    :param stats: 统计字典（可选），parts_reused记录直接复制的部件数
+    :param timings: 计时字典（可选）
+    """
+    tmp_path = make_temp_path(file_path)
+    try:
+        with stage_timer(timings, 'save'):
+            source = file_path if opts.get('reuse_unmodified_parts', True) else None
+            writer = PackagePartWriter(tmp_path, source, opts.get('compress_level'))
+            try:
+                # 与python-docx的Document.save写出相同的成员：内容类型、包关系、各部件及其关系
+                package = doc.part.package
+                parts = package.parts
+                for part in parts:
+                    part.before_marshal()
+                writer.write(CONTENT_TYPES_URI, content_types_xml(parts))
+                writer.write(PACKAGE_URI.rels_uri, package.rels.xml)
+                for part in parts:
+                    writer.write(part.partname, part.blob)
+                    if len(part.rels):
+                        writer.write(part.partname.rels_uri, part.rels.xml)
+            finally:
+                writer.close()
+            add_stat(stats, 'parts_reused', writer.reused)
+        replace_file(tmp_path, file_path, keep_backup, timings)
+        tmp_path = None
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def process_word_file_streaming(file_path, keep_backup, opts, stats=None, timings=None):
+    """
+    使用流式XML引擎处理单个Word文件（仅支持括号替换和大纲级别两项规则）
+    document.xml逐段改写，其他压缩包成员直接复制压缩数据；没有任何段落被修改时丢弃临时文件，不改写原文件也不备份
+    :param file_path: 文件路径
+    :param keep_backup: 是否保留备份
+    :param opts: 普通字典形式的处理选项
+    :param stats: 统计字典（可选）
+    :param timings: 计时字典（可选）
+    :return: (处理结果, 消息)
+    """
+    load_docx()
+    tmp_path = None
+    modified = False
+    compress_level = normalize_compress_level(opts.get('compress_level'))
+    do_replace = bool(opts.get('replace_patterns'))
+    copier = None
+    try:
+        if opts.get('reuse_unmodified_parts', True):
+            copier = ZipRawCopier(file_path)
+        tmp_path = make_temp_path(file_path)
+        with zipfile.ZipFile(file_path) as zin, open_output_zip(tmp_path, compress_level) as zout:
+            for info in zin.infolist():
+                if do_replace and STORY_MEMBER_PATTERN.match(info.filename):
+                    # 页眉页脚、脚注等部件通常很小，整体解析；没有修改时按普通成员复制
+                    with stage_timer(timings, 'story_parts'):
+                        data = zin.read(info)
+                        element = None
+                        if any(t in data for t in REPLACE_TRIGGER_BYTES) or b'&#' in data:
+                            element = parse_xml(data)
+                        if element is not None and rewrite_story_paragraphs(element, True, None, stats, timings):
+                            target = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                            target.external_attr = info.external_attr
+                            zout.writestr(target, serialize_part_xml(element),
+                                          compress_type=zout.compression, compresslevel=compress_level)
+                            modified = True
+                            continue
+                if info.filename != DOCUMENT_XML and copier is not None and copier.can_copy(info):
+                    with stage_timer(timings, 'copy_members'):
+                        copier.copy(info, zout)
+                    add_stat(stats, 'parts_reused')
+                    continue
+                # 按成员名打开时，zipfile使用目标压缩包的压缩方式和压缩级别
+                with zin.open(info) as src, \
+                        zout.open(info.filename, 'w', force_zip64=info.file_size > ZIP_RAW_COPY_MAX_SIZE) as dst:
+                    if info.filename == DOCUMENT_XML:
+                        with stage_timer(timings, 'stream_rewrite'):
+                            modified = stream_rewrite_document_xml(src, dst, opts, stats, timings) or modified
+                    else:
+                        with stage_timer(timings, 'copy_members'):
+                            shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+        if not modified:
+            add_stat(stats, 'documents_unchanged')
+            return True, f"成功（无需修改）：{os.path.basename(file_path)}"
+        if copier is not None:
+            copier.finish(tmp_path)
+        replace_file(tmp_path, file_path, keep_backup, timings)
+        tmp_path = None
+        return True, f"成功：{os.path.basename(file_path)}"
+    except Exception as e:
+        return False, f"失败：{os.path.basename(file_path)} - {str(e)}"
+    finally:
+        if copier is not None:
+            copier.close()
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def snapshot_options():
+    """
+    将界面上的tk变量转换为普通字典（可跨线程/进程传递，不依赖tkinter）
+    :return: {选项名: 值}
+    """
+    values = {}
+    for key, var in options.items():
+        try:
+            values[key] = var.get()
+        except tk.TclError:
+            # 输入框内容非法（如进程数为空），按未设置处理
+            values[key] = None
+    return values
+
+
+def process_word_file(file_path, keep_backup, opts=None, stats=None, timings=None):
+    """
+    处理单个Word文件（根据选项执行相应操作）
+    :param file_path: 文件路径
+    :param keep_backup: 是否保留备份
+    :param opts: 普通字典形式的处理选项，为None时读取界面全局选项
+    :param stats: 统计字典（可选），记录段落/run数、预筛跳过的段落/文档数
+    :param timings: 计时字典（可选），记录各阶段的墙钟/CPU耗时
+    :return: (处理结果, 消息)；所有阶段都未修改文档时不保存、不备份，统计计入documents_unchanged
+    """
+    load_docx()
+    if opts is None:
+        opts = snapshot_options()
+    try:
+        # 文档级预筛：只读原始XML字节，判断正文规则是否可能命中
+        do_replace = bool(opts.get('replace_patterns'))
+        do_outline = bool(opts.get('set_question_outline'))
+        outline_ruleset = get_outline_ruleset(opts.get('outline_rules_path')) if do_outline else None
+        if do_replace or do_outline:
+            with stage_timer(timings, 'prescreen'):
+                may_replace, may_outline = prescreen_docx(file_path, outline_ruleset)
+            do_replace = do_replace and may_replace
+            do_outline = do_outline and may_outline
+        header_footer = any(
+            opts.get(key) for key in ('remove_header_footer', 'add_custom_header', 'add_page_number'))
+        if not (header_footer or do_replace or do_outline):
+            add_stat(stats, 'documents_skipped')
+            add_stat(stats, 'documents_unchanged')
+            return True, f"成功（无需修改）：{os.path.basename(file_path)}"
+        screened_opts = dict(opts, replace_patterns=do_replace, set_question_outline=do_outline)
+
+        # 流式引擎只覆盖正文规则，涉及页眉页脚的选项仍走python-docx对象模型
+        if opts.get('streaming_engine') and not header_footer:
+            return process_word_file_streaming(file_path, keep_backup, screened_opts, stats, timings)
+
+        # 打开文档进行处理
+        with stage_timer(timings, 'load'):
+            doc = Document(file_path)
+        add_stat(stats, 'sections', len(doc.sections))
+        changed = False
+
+        # 页眉页脚、脚注、尾注、批注中的括号替换（在改写页眉页脚之前，不处理新添加的模板内容）
+        if do_replace:
+            with stage_timer(timings, 'story_parts'):
+                changed = rewrite_story_parts(doc, stats, timings)
+
+        # 根据选项一次遍历所有节，完成页眉页脚的删除/添加
+        if header_footer:
+            with stage_timer(timings, 'sections'):
+                changed = rewrite_sections(
+                    doc, opts, get_section_templates(opts.get('section_templates_path'))) or changed
+
+        # 正文遍历：一次遍历全部段落（含嵌套表格、文本框、内容控件；预筛后实际替换和大纲设置的耗时
+        # 另计入replace_patterns/set_outline_level）
+        with stage_timer(timings, 'body_scan'):
+            if do_replace or do_outline:
+                changed = rewrite_story_paragraphs(
+                    doc.element.body, do_replace, outline_ruleset if do_outline else None, stats, timings) or changed
+
+        # 内容没有任何变化时不保存（不重新压缩、不改变修改时间），也无需备份
+        if not changed:
+            add_stat(stats, 'documents_unchanged')
+            return True, f"成功（无需修改）：{os.path.basename(file_path)}"
+
+        # 保存修改（写入临时文件后原子替换，按需硬链接备份）
+        save_document(doc, file_path, keep_backup, opts, stats, timings)
+        return True, f"成功：{os.path.basename(file_path)}"
+    except Exception as e:
+        return False, f"失败：{os.path.basename(file_path)} - {str(e)}"
+
+
+# ------------------------------
+# 增量缓存：记录已处理文件的指纹，重复运行时跳过未变化的文件
+# ------------------------------
+def rules_signature(opts):
+    """处理规则签名：规则版本号、正则表达式、大纲规则和页眉页脚模板任一变化都会改变签名"""
+    parts = [
+        str(RULES_VERSION),
+        english_pattern.pattern,
+        chinese_pattern.pattern,
+        k_pattern.pattern,
+        get_outline_ruleset(opts.get('outline_rules_path'))['signature'],
+        get_section_templates(opts.get('section_templates_path'))['signature'],
+    ]
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def options_signature(opts):
+    """
+    处理选项签名：所选处理选项组合 + 处理规则签名
+    :param opts: 普通字典形式的处理选项
+    :return: 签名字符串
+    """
+    selected = {key: bool(opts.get(key)) for key in PROCESS_OPTION_KEYS}
+    data = json.dumps(selected, sort_keys=True) + rules_signature(opts)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:32]
+
+
+def file_sha256(file_path):
+    """计算文件内容的SHA-256哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_path):
+    """
+    获取文件指纹
+    :return: {'size', 'mtime_ns', 'sha256'}
+    """
+    st = os.stat(file_path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': file_sha256(file_path)}
+
+
+def load_manifest(folder_path, signature, name=MANIFEST_NAME):
+    """
+    读取文件夹的增量缓存清单（不存在或已损坏时返回空清单）
+    :param folder_path: 所选文件夹
+    :param signature: 本次运行的处理选项签名，记录时一并写入
+    :param name: 清单文件名（处理和格式转换各用一份）
+    :return: 清单字典 {'folder', 'signature', 'name', 'files': {相对路径: 指纹+签名}}
+    """
+    manifest = {'folder': folder_path, 'signature': signature, 'name': name, 'files': {}}
+    try:
+        with open(os.path.join(folder_path, name), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data.get('files'), dict):
+            manifest['files'] = data['files']
+    except (OSError, ValueError):
+        pass
+    return manifest
+
+
+def save_manifest(manifest):
+    """原子写入增量缓存清单（先写临时文件再替换，中途退出不会留下损坏的清单）"""
+    folder_path = manifest['folder']
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', prefix='~wp', dir=folder_path)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'files': manifest['files']}, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(folder_path, manifest['name']))
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def manifest_key(manifest, file_path):
+    """清单中使用的文件键：相对所选文件夹的路径，统一为/分隔"""
+    return os.path.relpath(file_path, manifest['folder']).replace(os.sep, '/')
+
+
+def is_file_up_to_date(manifest, file_path, key=None):
+    """
+    判断文件是否已用相同选项和规则处理过且之后未被修改
+    大小和修改时间都未变时直接判定，仅修改时间变化时再比较内容哈希
+    :param key: 清单中的记录键（默认为文件的相对路径）
+    """
+    entry = manifest['files'].get(key or manifest_key(manifest, file_path))
+    if not entry or entry.get('signature') != manifest['signature']:
+        return False
+    try:
+        st = os.stat(file_path)
+        if st.st_size != entry['size']:
+            return False
+        if st.st_mtime_ns == entry['mtime_ns']:
+            return True
+        if file_sha256(file_path) == entry['sha256']:
+            entry['mtime_ns'] = st.st_mtime_ns  # 内容未变（如被复制或touch），更新时间戳以便下次快速判断
+            return True
+    except OSError:
+        pass
+    return False
+
+
+def filter_up_to_date_files(manifest, file_paths):
+    """
+    过滤掉已是最新状态的文件
+    :return: (待处理文件列表, 跳过的文件数)
+    """
+    pending = [path for path in file_paths if not is_file_up_to_date(manifest, path)]
+    return pending, len(file_paths) - len(pending)
+
+
+def update_manifest_entry(manifest, result):
+    """根据单个文件的处理结果更新清单：成功则记录处理后的指纹，失败则删除旧记录"""
+    key = manifest_key(manifest, result['path'])
+    if result['success'] and result.get('fingerprint'):
+        manifest['files'][key] = dict(result['fingerprint'], signature=manifest['signature'])
+    else:
+        manifest['files'].pop(key, None)
+
+
+# ------------------------------
+# 重复文件检测（内容完全相同的文件只处理/转换一次，结果复制到其余副本）
+# ------------------------------
+class DuplicateIndex:
+    """
+    边发现边按内容分组：大小和SHA-256都相同的文件视为同一文档，每组只有第一个出现的文件需要处理
+    大小唯一的文件不可能重复，不计算哈希；同样大小的第二个文件出现时才补算第一个文件的哈希
+    groups记录 第一个文件 → 内容相同的其余文件
+    """
+
+    def __init__(self):
+        self._first = {}  # (大小, 哈希) → 该内容第一个出现的文件
+        self._unhashed = {}  # 大小 → 该大小唯一出现过的文件（尚未计算哈希）
+        self._sizes = set()  # 出现过的文件大小
+        self.groups = {}
+
+    def _remember(self, path, size):
+        """计算path的哈希并登记，返回同内容第一个出现的文件；无法读取时返回None"""
+        try:
+            key = (size, file_sha256(path))
+        except OSError:
+            return None
+        return self._first.setdefault(key, path)
+
+    def add(self, path, size=None):
+        """
+        :return: 与path内容相同、先出现的文件；path是该内容第一个出现的文件（或无法读取）时返回None
+        """
+        try:
+            size = os.path.getsize(path) if size is None else size
+        except OSError:
+            return None
+        if size not in self._sizes:
+            self._sizes.add(size)
+            self._unhashed[size] = path
+            return None
+        earlier = self._unhashed.pop(size, None)
+        if earlier is not None:
+            # 边发现边处理时earlier可能已被改写，此时哈希不再相同，path会单独处理（结果同样正确）
+            self._remember(earlier, size)
+        first = self._remember(path, size)
+        if first is None or first == path:
+            return None
+        self.groups.setdefault(first, []).append(path)
+        return first
+
+    def duplicate_count(self):
+        return sum(len(dups) for dups in self.groups.values())
+
+
+def group_duplicates(file_paths, sizes=None):
+    """
+    对已知的文件列表去重：只有大小与其他文件相同的文件才需要计算哈希
+    :param sizes: 已知的文件大小（如FileListing.sizes）
+    :return: (每组第一个文件组成的列表, DuplicateIndex)
+    """
+    sizes = sizes or {}
+    index = DuplicateIndex()
+    unique = [path for path in file_paths if index.add(path, sizes.get(path)) is None]
+    return unique, index
+
+
+def copy_duplicate_result(first_result, dup_path, keep_backup, opts):
+    """
+    用同内容文件的处理结果生成副本的结果：处理成功且改写过时，把处理后的文件原子复制到副本位置
+    :param first_result: 该内容第一个文件的结果字典
+    :return: 副本的结果字典（字段同process_file_with_result，另含duplicate_of）
+    """
+    start = time.perf_counter()
+    name = os.path.basename(dup_path)
+    first_name = os.path.basename(first_result['path'])
+    success, changed, fingerprint = first_result['success'], first_result['changed'], None
+    if not success:
+        message = f"失败：{name} - 与 {first_name} 内容相同，{first_name} 处理失败"
+    elif not changed:
+        message = f"成功（无需修改）：{name}（与 {first_name} 内容相同）"
+    else:
+        message = f"成功：{name}（与 {first_name} 内容相同，已复制处理结果）"
+        tmp_path = None
+        try:
+            tmp_path = make_temp_path(dup_path)
+            shutil.copyfile(first_result['path'], tmp_path)
+            replace_file(tmp_path, dup_path, keep_backup)
+        except OSError as e:
+            success, changed = False, False
+            message = f"失败：{name} - 复制 {first_name} 的处理结果失败：{str(e)}"
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    if success and opts.get('use_cache'):
+        try:
+            fingerprint = file_fingerprint(dup_path)
+        except OSError:
+            pass
+    return {
+        'path': dup_path,
+        'success': success,
+        'message': message,
+        'changed': changed,
+        'elapsed': time.perf_counter() - start,
+        'worker': None,
+        'stats': {'documents_deduplicated': 1},
+        'fingerprint': fingerprint,
+        'timings': None,
+        'duplicate_of': first_result['path'],
+    }
+
+
+# ------------------------------
+# 断点续传日志（每个文件完成即追加一行，程序中途退出后可从日志继续）
+# ------------------------------
+JOURNAL_NAME = '.wordprocess_journal.jsonl'  # 批处理日志文件名（保存在所选文件夹根目录）
+JOURNAL_SYNC_INTERVAL = 1.0  # 两次将日志刷入磁盘（fsync）的最短间隔（秒）
+ERRORS_REPORT_NAME = 'wordprocess_errors.txt'  # 界面模式导出完整错误列表的文件名
+
+
+def read_journal(folder_path, signature, name=JOURNAL_NAME):
+    """
+    读取批处理日志，得到每个文件最近一次的处理结果
+    只采用与本次处理选项签名相同的批次中的记录；程序崩溃时写了一半的最后一行直接忽略
+    :return: {相对路径: 结果记录}
+    """
+    entries = {}
+    try:
+        with open(os.path.join(folder_path, name), 'r', encoding='utf-8') as f:
+            matching = False
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('type') == 'batch':
+                    matching = record.get('signature') == signature
+                elif record.get('type') == 'file' and matching:
+                    entries[record['path']] = record
+    except OSError:
+        pass
+    return entries
+
+
+def journal_key(folder_path, file_path):
+    """日志中使用的文件键：相对所选文件夹的路径，统一为/分隔"""
+    return os.path.relpath(file_path, folder_path).replace(os.sep, '/')
+
+
+def journal_entry_done(entry, file_path):
+    """日志记录表明文件已处理成功，且之后大小和修改时间都未变"""
+    if not entry or not entry['success']:
+        return False
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return False
+    return st.st_size == entry.get('size') and st.st_mtime_ns == entry.get('mtime_ns')
+
+
+class BatchJournal:
+    """
+    追加写入的批处理日志：开头一行批次记录（选项签名），之后每个文件完成时一行结果记录（含完整错误信息），
+    正常结束时一行汇总记录。续传时先读取旧日志，跳过已成功且之后未被修改的文件，新记录追加在后面
+    :param folder_path: 所选文件夹（日志保存位置，记录中的路径相对于它）
+    :param signature: 处理选项签名（选项变化后旧记录不再用于续传）
+    :param resume: 是否从已有日志继续（否则覆盖旧日志）
+    """
+
+    def __init__(self, folder_path, signature, resume=False, name=JOURNAL_NAME):
+        self.folder_path = folder_path
+        self.path = os.path.join(folder_path, name)
+        self.previous = read_journal(folder_path, signature, name) if resume else {}
+        self._last_sync = time.perf_counter()
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        self._write({'type': 'batch', 'signature': signature, 'resume': resume, 'time': time.time()}, sync=True)
+
+    def _write(self, record, sync=False):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()  # 程序崩溃时已完成的记录不丢失
+        now = time.perf_counter()
+        if sync or now - self._last_sync >= JOURNAL_SYNC_INTERVAL:
+            os.fsync(self._file.fileno())  # 断电时最多丢失最近一个间隔内的记录
+            self._last_sync = now
+
+    def is_done(self, file_path):
+        """文件在之前的批次中已处理成功且之后未被修改"""
+        return journal_entry_done(self.previous.get(journal_key(self.folder_path, file_path)), file_path)
+
+    def record(self, result):
+        """记录单个文件的处理结果（处理成功时一并记录处理后的大小和修改时间）"""
+        record = {
+            'type': 'file',
+            'path': journal_key(self.folder_path, result['path']),
+            'success': bool(result['success']),
+            'changed': bool(result['changed']),
+            'message': result['message'],
+        }
+        if result['success']:
+            try:
+                st = os.stat(result['path'])
+                record.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            except OSError:
+                pass
+        self._write(record)
+
+    def close(self, summary=None):
+        """写入汇总记录（正常结束时）并关闭日志"""
+        try:
+            if summary is not None:
+                self._write({'type': 'end', 'time': time.time(),
+                             **{key: summary[key] for key in ('processed', 'succeeded', 'failed', 'resumed')}},
+                            sync=True)
+        finally:
+            self._file.close()
+
+
+def export_errors(path, errors):
+    """导出完整错误列表（每行一条）"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(errors) + '\n')
+
+
+# ------------------------------
+# 进度汇总（工作线程只投递事件，由单个消费线程汇总并节流刷新）
+# ------------------------------
+PROGRESS_INTERVAL = 0.1  # 两次进度刷新的最短间隔（秒），即最多每秒刷新10次
+PROGRESS_LOG_INTERVAL = 2.0  # 输出重定向到文件/日志时的刷新间隔（秒）
+
+
+def format_duration(seconds):
+    """将秒数格式化为 分:秒 或 时:分:秒"""
+    seconds = int(seconds + 0.5)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def format_progress(snapshot, label):
+    """生成进度说明文字（总数未知时只显示已完成数，无法估算时不显示剩余时间）"""
+    if snapshot['total'] is None:
+        text = f"{label}中 ({snapshot['done']})"
+    else:
+        text = f"{label}中 ({snapshot['done']}/{snapshot['total']})"
+    if snapshot['current']:
+        text += f"：{snapshot['current']}"
+    if snapshot['rate']:
+        text += f" | {snapshot['rate']:.1f} 个/秒"
+        if snapshot['eta'] is not None:
+            text += f"，预计剩余 {format_duration(snapshot['eta'])}"
+    return text
+
+
+class ProgressReporter:
+    """
+    批量任务进度汇总：各工作线程只把事件放入队列（不加锁、不直接刷新界面），
+    由一个消费线程统一计数，并按最短间隔调用显示函数，避免逐文件刷新淹没界面事件队列
+    :param display: 显示函数，参数为进度快照字典（在消费线程中调用）
+    :param total: 总任务数，未知时为None（可稍后通过set_total设置）
+    :param interval: 两次刷新之间的最短间隔（秒）
+    """
+
+    def __init__(self, display, total=None, interval=PROGRESS_INTERVAL):
+        self.display = display
+        self.interval = interval
+        self.total = total
+        self.done = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.errors = []
+        self.current = ''
+        self._events = queue.SimpleQueue()
+        self._thread = None
+        self._start_time = None
+
+    # 以下方法可在任意线程调用，只投递事件
+    def set_total(self, total):
+        self._events.put(('total', total))
+
+    def file_started(self, name):
+        self._events.put(('start', name))
+
+    def file_done(self, name, status='success', message=''):
+        """
+        :param status: success / failed / skipped
+        :param message: 失败说明（计入错误列表）
+        """
+        self._events.put(('done', name, status, message))
+
+    def add_error(self, message):
+        """记录不影响文件计数的错误（如删除源文件失败）"""
+        self._events.put(('error', message))
+
+    def record_result(self, result):
+        """记录process_file_with_result返回的结果字典"""
+        self.file_done(os.path.basename(result['path']), 'success' if result['success'] else 'failed',
+                       result['message'])
+
+    def start(self):
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """等待所有事件处理完毕并做最后一次刷新，返回最终统计（含错误列表）"""
+        self._events.put(None)
+        self._thread.join()
+        return dict(self.snapshot(), errors=list(self.errors))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def snapshot(self):
+        """当前进度快照：完成数、速度（个/秒）和预计剩余秒数（无法估算时为None）"""
+        elapsed = time.perf_counter() - self._start_time
+        rate = self.done / elapsed if self.done and elapsed > 0 else 0.0
+        eta = None
+        if rate and self.total is not None:
+            eta = max(0, self.total - self.done) / rate
+        return {
+            'total': self.total,
+            'done': self.done,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'current': self.current,
+            'elapsed': elapsed,
+            'rate': rate,
+            'eta': eta,
+        }
+
+    def _apply(self, event):
+        kind = event[0]
+        if kind == 'total':
+            self.total = event[1]
+        elif kind == 'start':
+            self.current = event[1]
+        elif kind == 'done':
+            _, name, status, message = event
+            self.done += 1
+            self.current = name
+            if status == 'success':
+                self.succeeded += 1
+            elif status == 'skipped':
+                self.skipped += 1
+            else:
+                self.failed += 1
+                self.errors.append(message)
+        elif kind == 'error':
+            self.errors.append(event[1])
+
+    def _run(self):
+        last_refresh = 0.0
+        dirty = False
+        while True:
+            # 有未显示的变化时，最多等到下次允许刷新的时刻；否则一直等待新事件
+            timeout = max(0.0, last_refresh + self.interval - time.perf_counter()) if dirty else None
+            try:
+                event = self._events.get(timeout=timeout)
+            except queue.Empty:
+                event = ()
+            if event is None:
+                break
+            if event:
+                self._apply(event)
+                dirty = True
+            now = time.perf_counter()
+            if dirty and now - last_refresh >= self.interval:
+                self.display(self.snapshot())
+                last_refresh = now
+                dirty = False
+        self.display(self.snapshot())
+
+
+def gui_progress_display(label):
+    """界面显示函数：每次刷新只向主线程投递一个更新状态栏的回调"""
+    def display(snapshot):
+        root.after(0, status_var.set, format_progress(snapshot, label))
+    return display
+
+
+def console_progress_display(label, stream=None):
+    """命令行显示函数：交互终端中原地刷新同一行，重定向到文件时逐行输出"""
+    stream = stream or sys.stderr
+    interactive = stream.isatty()
+    last_width = [0]
+
+    def display(snapshot):
+        text = format_progress(snapshot, label)
+        if interactive:
+            stream.write('\r' + text + ' ' * max(0, last_width[0] - len(text)))
+            last_width[0] = len(text)
+        else:
+            stream.write(text + '\n')
+        stream.flush()
+    return display
+
+
+# ------------------------------
+# 内存感知的并发准入：按估算内存限制同时处理的文件，并根据实测内存和吞吐量调整并发数
+# ------------------------------
+MEMORY_BUDGET_FRACTION = 0.5  # 未设置内存预算时，取物理内存的比例
+DEFAULT_MEMORY_BUDGET_MB = 2048  # 无法获取物理内存时的预算
+XML_MEMORY_FACTOR = 4  # XML解析为对象树后的内存约为解压后大小的倍数
+BLOB_MEMORY_FACTOR = 2  # 图片等二进制部件：加载时一份，保存时压缩缓冲一份
+FILE_MEMORY_OVERHEAD = 8 * 1024 * 1024  # 每个文件的固定开销（字节）
+THREAD_MAX_WORKERS = 10  # 线程池模式的线程数上限
+ADAPT_INTERVAL = 1.0  # 两次调整并发数的最短间隔（秒）
+RSS_HIGH_WATERMARK = 0.9  # 实测内存超过预算的该比例时并发数减半
+RSS_LOW_WATERMARK = 0.6  # 实测内存低于预算的该比例时才允许增加并发
+THROUGHPUT_GAIN = 1.05  # 增加并发后吞吐量至少提升5%，否则撤回
+GROW_COOLDOWN = 5  # 撤回后暂停增加并发的调整周期数
+
+
+def estimate_file_memory(file_path):
+    """
+    按压缩包目录中各部件的解压后大小估算处理一个文件的内存占用（只读目录，不解压）
+    :return: 估算字节数（无法读取目录时按文件大小估算）
+    """
+    try:
+        with zipfile.ZipFile(file_path) as zf:
+            cost = FILE_MEMORY_OVERHEAD
+            for info in zf.infolist():
+                is_xml = info.filename.endswith(('.xml', '.rels'))
+                cost += info.file_size * (XML_MEMORY_FACTOR if is_xml else BLOB_MEMORY_FACTOR)
+            return cost
+    except (OSError, zipfile.BadZipFile):
+        try:
+            return FILE_MEMORY_OVERHEAD + os.path.getsize(file_path) * XML_MEMORY_FACTOR
+        except OSError:
+            return FILE_MEMORY_OVERHEAD
+
+
+def physical_memory_bytes():
+    """物理内存总量（字节），无法获取时返回None"""
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def process_rss_bytes(pid=None):
+    """进程当前常驻内存（字节），pid为None时为当前进程，无法获取时返回None"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return None  # 进程已退出等
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def memory_budget_bytes(opts):
+    """本次批处理的内存预算（字节）：优先使用选项，否则取物理内存的一半"""
+    budget_mb = opts.get('memory_budget_mb')
+    if budget_mb:
+        return int(budget_mb) * 1024 * 1024
+    total = physical_memory_bytes()
+    return int(total * MEMORY_BUDGET_FRACTION) if total else DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024
+
+
+class MemoryAdmission:
+    """
+    内存感知的并发准入控制（可在多个线程中使用）
+    每个任务开始前按估算内存申请额度：已占用额度加上新任务超过预算、或并发数已达当前上限时等待；
+    没有任务在运行时总是放行，超出预算的大文件单独处理
+    并发上限按实测常驻内存和吞吐量调整：内存接近预算时减半；内存充裕、任务排满且吞吐量随并发增加而提升时，
+    先成倍增加，首次无提升后改为逐个增加，增加后吞吐量没有提升则撤回
+    :param budget_bytes: 内存预算（字节）
+    :param max_workers: 并发数上限
+    :param rss_sampler: 返回当前常驻内存总量的函数（返回None时只按估算值控制）
+    :param initial_workers: 初始并发上限
+    """
+
+    def __init__(self, budget_bytes, max_workers, rss_sampler=process_rss_bytes, initial_workers=2):
+        self.budget = budget_bytes
+        self.max_workers = max(1, max_workers)
+        self.limit = max(1, min(initial_workers, self.max_workers))
+        self.rss_sampler = rss_sampler
+        self.baseline = rss_sampler() or 0  # 开始前的常驻内存（解释器、界面等），不计入预算
+        self.active = 0
+        self.in_use = 0
+        self.peak_active = 0
+        self.peak_rss = 0
+        self.waits = 0
+        self._cond = threading.Condition()
+        self._slow_start = True
+        self._last_change = 0
+        self._last_rate = None
+        self._cooldown = 0
+        self._window_start = time.perf_counter()
+        self._window_cost = 0
+
+    def acquire(self, cost):
+        """申请额度，必要时阻塞等待（调用方须在任务结束后以相同cost调用release）"""
+        self.try_acquire(cost)
+
+    def try_acquire(self, cost, timeout=None):
+        """
+        申请额度，最多等待timeout秒（None为一直等待）
+        :return: 是否申请成功
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            waited = False
+            while self.active and (self.active >= self.limit or self.in_use + cost > self.budget):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                waited = True
+                self._cond.wait(remaining)
+            self.waits += waited
+            self.active += 1
+            self.in_use += cost
+            self.peak_active = max(self.peak_active, self.active)
+            return True
+
+    def release(self, cost):
+        with self._cond:
+            self.active -= 1
+            self.in_use -= cost
+            self._window_cost += cost
+            self._adapt()
+            self._cond.notify_all()
+
+    def _adapt(self):
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed < ADAPT_INTERVAL:
+            return
+        rate = self._window_cost / elapsed  # 吞吐量按估算内存计（大小文件混合时比文件数更稳定）
+        rss = self.rss_sampler()
+        used = None if rss is None else max(0, rss - self.baseline)
+        if used is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+        change = 0
+        if used is not None and used > self.budget * RSS_HIGH_WATERMARK:
+            change = -(self.limit - max(1, self.limit // 2))
+            self._slow_start = False
+        elif self._last_change > 0 and self._last_rate and rate < self._last_rate * THROUGHPUT_GAIN:
+            change = -1  # 增加并发没有带来吞吐量提升（如CPU或磁盘已饱和），撤回并暂停增加
+            self._slow_start = False
+            self._cooldown = GROW_COOLDOWN
+        elif self._cooldown:
+            self._cooldown -= 1
+        elif ((used is None or used < self.budget * RSS_LOW_WATERMARK)
+              and self.active + 1 >= self.limit and self.limit < self.max_workers):
+            step = self.limit if self._slow_start else 1
+            change = min(step, self.max_workers - self.limit)
+        self.limit = max(1, self.limit + change)
+        self._last_change = change
+        self._last_rate = rate
+        self._window_start = now
+        self._window_cost = 0
+
+    def report(self):
+        """并发控制情况（用于批处理汇总）"""
+        return {
+            'budget_mb': round(self.budget / 1024 / 1024),
+            'max_workers': self.max_workers,
+            'final_limit': self.limit,
+            'peak_active': self.peak_active,
+            'peak_rss_mb': round(self.peak_rss / 1024 / 1024, 1) if self.peak_rss else None,
+            'waits': self.waits,
+        }
+
+
+def format_admission_summary(report):
+    """生成并发控制情况的说明文字"""
+    text = (f"内存预算 {report['budget_mb']} MB，最高同时处理 {report['peak_active']}/{report['max_workers']} 个，"
+            f"因内存或并发上限等待 {report['waits']} 次")
+    if report['peak_rss_mb']:
+        text += f"，峰值内存 {report['peak_rss_mb']} MB"
+    return text
+
+
+# ------------------------------
+# 多进程处理引擎（不依赖tkinter，可无界面运行）
+# ------------------------------
+def _pool_worker_init():
+    """进程池工作进程初始化：预热python-docx/lxml导入和默认模板，避免首个文件承担加载开销"""
+    load_docx()
+    Document()
+
+
+def process_file_with_result(file_path, keep_backup, opts):
+    """
+    处理单个文件并返回结构化结果（进程池执行单元）
+    :return: 结果字典 {'path', 'success', 'message', 'changed', 'elapsed', 'worker', 'stats', 'fingerprint', 'timings'}
+             changed表示文件是否被改写（内容无变化时不保存）
+             启用增量缓存时fingerprint为处理后文件的指纹，启用阶段计时时timings为各阶段耗时，否则为None
+    """
+    flags = opts or {}
+    start = time.perf_counter()
+    stats = {}
+    fingerprint = None
+    timings = {} if flags.get('instrument') else None
+    profiler = None
+    if flags.get('profile_dir'):
+        import cProfile  # 用于按需导出单文件性能剖析（按需导入）
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        res, msg = process_word_file(file_path, keep_backup, opts, stats, timings)
+        # 在工作线程/进程内计算指纹，避免主进程串行读取所有文件
+        if res and flags.get('use_cache'):
+            with stage_timer(timings, 'fingerprint'):
+                fingerprint = file_fingerprint(file_path)
+    except Exception as e:
+        res, msg = False, f"失败：{os.path.basename(file_path)} - 未知错误：{str(e)}"
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            try:
+                os.makedirs(flags['profile_dir'], exist_ok=True)
+                profiler.dump_stats(profile_dump_path(flags['profile_dir'], file_path))
+            except OSError:
+                pass  # 剖析结果写入失败不影响处理结果
+    return {
+        'path': file_path,
+        'success': res,
+        'message': msg,
+        'changed': bool(res) and not stats.get('documents_unchanged'),
+        'elapsed': time.perf_counter() - start,
+        'worker': os.getpid(),
+        'stats': stats,
+        'fingerprint': fingerprint,
+        'timings': timings,
+    }
+
+
+def _process_file_chunk(file_paths, keep_backup, opts):
+    """批量处理一组文件（减少进程间任务提交和结果回传的次数）"""
+    return [process_file_with_result(path, keep_backup, opts) for path in file_paths]
+
+
+def process_files_in_pool(file_paths, opts, keep_backup, max_workers=None, chunk_size=None, on_result=None,
+                          admission=None, executor=None):
+    """
+    使用进程池并行处理Word文件（绕开GIL，可占满所有CPU核心）
+    :param file_paths: 待处理文件路径（列表或边遍历边产出的可迭代对象，产出即提交）
+    :param opts: 普通字典形式的处理选项（见snapshot_options）
+    :param keep_backup: 是否保留备份
+    :param max_workers: 工作进程数，默认CPU核心数
+    :param chunk_size: 每个任务包含的文件数，默认按已发现的文件数和进程数自动计算
+    :param on_result: 每个文件完成后的回调（在调用方进程中执行），参数为结果字典
+    :param admission: MemoryAdmission（可选），每组任务提交前按组内最大文件的估算内存申请额度
+    :param executor: 调用方持有的进程池（可选，如监视模式跨批次复用），用完不关闭；默认按需创建并在结束时关闭
+    :return: 结果字典列表（按完成顺序）
+    """
+    max_workers = max(1, max_workers or os.cpu_count() or 1)
+    results = []
+    future_to_chunk = {}
+    own_executor = executor is None
+
+    def collect(futures):
+        for future in futures:
+            chunk = future_to_chunk.pop(future)
+            try:
+                chunk_results = future.result()
+            except Exception as e:
+                # 工作进程异常退出时，整组文件记为失败，不影响其他任务
+                chunk_results = [{
+                    'path': path,
+                    'success': False,
+                    'message': f"失败：{os.path.basename(path)} - 工作进程异常：{str(e)}",
+                    'changed': False,
+                    'elapsed': 0.0,
+                    'worker': None,
+                    'stats': {},
+                    'fingerprint': None,
+                    'timings': None,
+                } for path in chunk]
+            for result in chunk_results:
+                results.append(result)
+                if on_result:
+                    on_result(result)
+
+    def submit(chunk):
+        nonlocal executor
+        if executor is None:  # 首个任务出现时才启动进程池（空文件夹不创建进程）
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers,
+                                                              initializer=_pool_worker_init)
+        if admission is None:
+            future_to_chunk[executor.submit(_process_file_chunk, chunk, keep_backup, opts)] = chunk
+            return
+        # 同一组文件在一个进程中依次处理，内存峰值取组内最大的文件
+        cost = max(estimate_file_memory(path) for path in chunk)
+        while True:
+            # 等待额度时也要回收已完成的结果，否则进度停滞
+            if admission.try_acquire(cost, timeout=PROGRESS_INTERVAL):
+                break
+            collect([future for future in future_to_chunk if future.done()])
+        future = executor.submit(_process_file_chunk, chunk, keep_backup, opts)
+        future_to_chunk[future] = chunk
+        # 额度在进程池的管理线程中释放，不依赖本线程回收结果
+        future.add_done_callback(lambda _, cost=cost: admission.release(cost))
+
+    try:
+        chunk = []
+        found = 0
+        for path in file_paths:
+            chunk.append(path)
+            found += 1
+            # 每个进程约分到4个任务：既摊薄进程间通信开销，又保证负载均衡（按已发现的文件数逐步放大）
+            if len(chunk) >= (chunk_size or max(1, min(32, found // (max_workers * 4)))):
+                submit(chunk)
+                chunk = []
+                # 边发现边回收已完成的结果，进度不必等遍历结束
+                collect([future for future in future_to_chunk if future.done()])
+        if chunk:
+            submit(chunk)
+        for future in concurrent.futures.as_completed(list(future_to_chunk)):
+            collect([future])
+    finally:
+        if own_executor and executor is not None:
+            executor.shutdown()
+    return results
+
+
+# ------------------------------
+# 批处理核心（界面与命令行共用，不依赖tkinter）
+# ------------------------------
+def run_process_batch(folder_path, file_paths, opts, on_result=None, on_total=None, executor=None, journal=True):
+    """
+    批量处理Word文件：增量缓存/续传过滤 → 线程池/进程池处理 → 保存缓存清单
+    文件边发现边过滤边提交，遍历目录和处理同时进行；每个文件完成即写入批处理日志，
+    opts['resume_batch']为真时跳过日志中已成功的文件，opts['dedupe']为真时内容相同的文件只处理一次
+    :param folder_path: 所选文件夹（增量缓存清单保存位置）
+    :param file_paths: 待处理文件路径（列表，或FileListing等边遍历边产出的可迭代对象）
+    :param opts: 普通字典形式的处理选项
+    :param on_result: 每个文件完成后的回调，参数为结果字典
+    :param on_total: 文件发现结束后的回调（此时处理可能已经开始），参数为实际待处理文件数
+    :param executor: 多进程模式下复用的进程池（可选，见process_files_in_pool）
+    :param journal: 是否写入批处理日志（监视模式的每一批都很小，不写日志）
+    :return: 汇总字典（total/processed/succeeded/changed/unchanged/failed/cache_skipped/resumed/deduplicated/stats/
+             errors/batch_errors/elapsed/admission/journal/results，启用阶段计时时另含timings汇总）
+    """
+    start = time.perf_counter()
+    keep_backup = bool(opts.get('keep_backup'))
+    batch_errors = []  # 与具体文件无关的错误
+
+    # 增量缓存：跳过已用相同选项处理过且未变化的文件
+    manifest = None
+    if opts.get('use_cache'):
+        manifest = load_manifest(folder_path, options_signature(opts), shard_file_name(MANIFEST_NAME, opts))
+    counts = {'pending': 0, 'cache_skipped': 0, 'resumed': 0}
+
+    # 批处理日志：记录每个文件的结果，续传时跳过之前已成功的文件
+    if journal:
+        try:
+            journal = BatchJournal(folder_path, options_signature(opts), bool(opts.get('resume_batch')),
+                                   shard_file_name(JOURNAL_NAME, opts))
+        except OSError as e:
+            journal = None
+            batch_errors.append(f"创建批处理日志失败（无法断点续传）：{str(e)}")
+    else:
+        journal = None
+
+    # 重复文件：内容相同的文件只提交第一个，其余等它处理完成后复制结果
+    duplicates = DuplicateIndex() if opts.get('dedupe') else None
+    sizes = file_paths.sizes if isinstance(file_paths, FileListing) else {}
+
+    def pending_files():
+        for path in file_paths:
+            if journal is not None and journal.is_done(path):
+                counts['resumed'] += 1
+                continue
+            if manifest is not None and is_file_up_to_date(manifest, path):
+                counts['cache_skipped'] += 1
+                continue
+            counts['pending'] += 1
+            if duplicates is not None and duplicates.add(path, sizes.get(path)) is not None:
+                continue
+            yield path
+        if on_total:
+            on_total(counts['pending'])
+
+    results = []
+    results_lock = threading.Lock()
+    worker_pids = set()
+
+    def handle_result(result):
+        nonlocal journal
+        with results_lock:
+            results.append(result)
+            if result['worker']:
+                worker_pids.add(result['worker'])
+            if manifest is not None:
+                update_manifest_entry(manifest, result)
+            if journal is not None:
+                try:
+                    journal.record(result)
+                except (OSError, ValueError) as e:
+                    journal.close()
+                    journal = None
+                    batch_errors.append(f"写入批处理日志失败（之后的文件不再记录）：{str(e)}")
+        if on_result:
+            on_result(result)
+
+    def total_rss():
+        """本进程与各工作进程的常驻内存之和"""
+        total = process_rss_bytes()
+        if total is None:
+            return None
+        for pid in list(worker_pids):
+            if pid != os.getpid():
+                total += process_rss_bytes(pid) or 0
+        return total
+
+    # 内存准入：按估算内存限制同时处理的文件，并发数随实测内存和吞吐量调整
+    budget = memory_budget_bytes(opts)
+    if opts.get('use_process_pool'):
+        # 多进程模式：CPU密集的解析/替换/保存分摊到多个进程，结果回传主进程统计
+        max_workers = max(1, opts.get('process_workers') or os.cpu_count() or 1)
+        admission = MemoryAdmission(budget, max_workers, rss_sampler=total_rss)
+        process_files_in_pool(
+            pending_files(), opts, keep_backup,
+            max_workers=max_workers,
+            on_result=handle_result,
+            admission=admission,
+            executor=executor
+        )
+    else:
+        # 线程池最多10个线程（线程按需创建），实际同时处理的文件数由内存准入控制
+        admission = MemoryAdmission(budget, THREAD_MAX_WORKERS)
+
+        def run_admitted(path, cost):
+            try:
+                handle_result(process_file_with_result(path, keep_backup, opts))
+            except Exception as e:
+                # 任务的future不再被读取，结果回调（进度显示、缓存清单等）的异常在这里记录，不能无声丢失
+                batch_errors.append(f"{os.path.basename(path)} - 记录处理结果失败：{str(e)}")
+            finally:
+                admission.release(cost)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=THREAD_MAX_WORKERS) as thread_pool:
+            # 边发现边提交任务（每个文件一个任务，额度不足时暂停提交）
+            for path in pending_files():
+                cost = estimate_file_memory(path)
+                admission.acquire(cost)
+                thread_pool.submit(run_admitted, path, cost)
+
+    if duplicates is not None and duplicates.groups:
+        by_path = {result['path']: result for result in results}
+        for first, dups in duplicates.groups.items():
+            for dup in dups:
+                handle_result(copy_duplicate_result(by_path[first], dup, keep_backup, opts))
+
+    if manifest is not None:
+        try:
+            save_manifest(manifest)
+        except OSError as e:
+            batch_errors.append(f"保存增量缓存清单失败：{str(e)}")
+
+    stats = {}
+    for result in results:
+        for key, value in result['stats'].items():
+            add_stat(stats, key, value)
+    failed = [r for r in results if not r['success']]
+    changed = sum(1 for r in results if r['changed'])
+    summary = {
+        'folder': folder_path,
+        'total': counts['pending'] + counts['cache_skipped'] + counts['resumed'],
+        'processed': len(results),
+        'succeeded': len(results) - len(failed),
+        'changed': changed,
+        'unchanged': len(results) - len(failed) - changed,
+        'failed': len(failed),
+        'cache_skipped': counts['cache_skipped'],
+        'resumed': counts['resumed'],
+        'deduplicated': duplicates.duplicate_count() if duplicates is not None else 0,
+        'stats': stats,
+        'errors': [r['message'] for r in failed],
+        'batch_errors': batch_errors,
+        'elapsed': time.perf_counter() - start,
+        'admission': admission.report(),
+        'journal': journal.path if journal is not None else None,
+        'results': results,
+    }
+    if opts.get('instrument'):
+        summary['timings'] = summarize_timings(results)
+    if journal is not None:
+        try:
+            journal.close(summary)
+        except OSError as e:
+            batch_errors.append(f"写入批处理日志失败：{str(e)}")
+    return summary
+
+
+def format_timings_summary(timing_summary, top=3):
+    """生成阶段耗时的简要说明：累计耗时最多的几个阶段及异常文件数"""
+    stages = sorted(timing_summary['stages'].items(), key=lambda item: item[1]['total_wall'], reverse=True)
+    parts = [f"{stage} {entry['total_wall']:.1f}秒(p90 {entry['p90'] * 1000:.0f}毫秒)" for stage, entry in stages[:top]]
+    return f"耗时最多的阶段：{'，'.join(parts)}；异常慢文件 {len(timing_summary['outliers'])} 个"
+
+
+def format_prescreen_summary(stats):
+    """生成预筛节省情况的说明文字"""
+    return (f"预筛跳过：文档 {stats.get('documents_skipped', 0)} 个，"
+            f"段落 {stats.get('paragraphs_skipped', 0)}/{stats.get('paragraphs', 0)} 个")
+
+
+def finish_process(keep_backup, summary):
+    """所有文件处理完成后，显示结果并恢复UI"""
+    result = f"并行处理完成！\n成功：{summary['succeeded']}/{summary['processed']}\n"
+    if keep_backup:
+        result += "已改写的文件原件已备份为.bak格式（硬链接，不额外占用空间），处理后的文件已替换原文件"
+    else:
+        result += "已直接替换原文件（未保留备份）"
+    result += f"\n已改写 {summary['changed']} 个，内容无变化未改写 {summary['unchanged']} 个"
+    result += "\n" + format_prescreen_summary(summary['stats'])
+    result += "\n" + format_admission_summary(summary['admission'])
+    if summary['cache_skipped']:
+        result += f"\n增量缓存跳过（未变化）：{summary['cache_skipped']} 个文件"
+    if summary['resumed']:
+        result += f"\n断点续传跳过（上次已完成）：{summary['resumed']} 个文件"
+    if summary['deduplicated']:
+        result += f"\n内容重复的副本：{summary['deduplicated']} 个（未重复处理，直接复制结果）"
+    if 'timings' in summary:
+        result += (f"\n{format_timings_summary(summary['timings'])}"
+                   f"\n各阶段耗时已导出到 {TIMINGS_REPORT_NAME}.json/.csv")
+
+    errors = summary['errors'] + summary['batch_errors']
+    if errors:
+        result += f"\n\n错误列表（前5条，共{len(errors)}条）：\n" + "\n".join(errors[:5])
+        if summary.get('errors_path'):
+            result += f"\n完整错误列表已导出到 {summary['errors_path']}"
+    messagebox.showinfo("并行处理结果", result)
+    # 恢复按钮和状态
+    process_btn.config(state=tk.NORMAL)
+    status_var.set("就绪")
+
+
+def start_parallel_process():
+    """启动线程池并行处理（子线程中执行，不阻塞UI）"""
+    folder_path = folder_var.get().replace("已选择：", "")
+    opts = snapshot_options()
+    keep_backup = opts['keep_backup']
+    word_files = FileListing(folder_path, ['.docx'])  # 边遍历边处理，整个流程只遍历一次目录
+
+    # 进度由汇总线程节流刷新，工作线程只投递事件（遍历结束前总数未知）
+    with ProgressReporter(gui_progress_display("并行处理")) as reporter:
+        summary = run_process_batch(folder_path, word_files, opts,
+                                    on_result=reporter.record_result, on_total=reporter.set_total)
+    if summary['total'] == 0:
+        root.after(0, lambda: [messagebox.showinfo("提示", "未找到任何.docx文件"),
+                               process_btn.config(state=tk.NORMAL), status_var.set("就绪")])
+        return
+
+    # 阶段计时：导出到所选文件夹，便于分析慢文件
+    if opts.get('instrument'):
+        try:
+            export_timings_json(os.path.join(folder_path, TIMINGS_REPORT_NAME + '.json'), summary['results'])
+            export_timings_csv(os.path.join(folder_path, TIMINGS_REPORT_NAME + '.csv'), summary['results'])
+        except OSError as e:
+            summary['batch_errors'].append(f"导出阶段耗时失败：{str(e)}")
+
+    # 完整错误列表导出到所选文件夹（结果窗口只显示前5条）
+    errors = summary['errors'] + summary['batch_errors']
+    if errors:
+        errors_path = os.path.join(folder_path, ERRORS_REPORT_NAME)
+        try:
+            export_errors(errors_path, errors)
+            summary['errors_path'] = errors_path
+        except OSError as e:
+            summary['batch_errors'].append(f"导出错误列表失败：{str(e)}")
+
+    # 所有任务完成后，调用收尾函数
+    root.after(0, lambda: finish_process(keep_backup, summary))
+
+
+def process_word_files_action():
+    """处理Word文件的入口函数（启动子线程，避免阻塞UI）"""
+    folder_path = folder_var.get().replace("已选择：", "")
+    if not folder_path or folder_path == "等待选择文件夹...":
+        messagebox.showwarning("警告", "请先选择文件夹")
+        return
+
+    # 检查是否选择了至少一个处理选项
+    if not any(options[key].get() for key in PROCESS_OPTION_KEYS):
+        if not messagebox.askyesno("提示", "未选择任何处理选项，是否继续？"):
+            return
+
+    # 禁用按钮+更新状态（文件在子线程中边查找边处理）
+    process_btn.config(state=tk.DISABLED)
+    status_var.set("正在查找并处理.docx文件...")
+    root.update_idletasks()
+
+    # 启动子线程执行并行处理（守护线程，避免程序退出残留）
+    thread = threading.Thread(target=start_parallel_process, daemon=True)
+    thread.start()
+
+
+# ------------------------------
+# 分片处理（多台机器各处理同一批文件的一部分，最后合并报告）
+# ------------------------------
+SHARD_REPORT_PREFIX = 'wordprocess_shard_'  # 分片结果报告文件名前缀（保存在所选文件夹根目录）
+SHARD_PLAN_PREFIX = 'wordprocess_shardplan_'  # 分片划分文件名前缀（后接分片总数）
+
+
+def parse_shard(text):
+    """
+    解析分片参数 i/N（i从1开始）
+    :return: (i, N)
+    """
+    import argparse
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"分片格式应为 i/N（如 1/4）：{text}")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"分片序号应在 1~{count} 之间：{text}")
+    return index, count
+
+
+def shard_file_name(name, opts):
+    """分片运行时缓存清单/批处理日志改用带分片序号的文件名（多台机器同时写同一文件夹时互不覆盖）"""
+    shard = opts.get('shard')
+    if not shard:
+        return name
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{shard[0]}of{shard[1]}{ext}"
+
+
+def shard_report_path(folder_path, shard):
+    return os.path.join(folder_path, f"{SHARD_REPORT_PREFIX}{shard[0]}of{shard[1]}.json")
+
+
+def plan_shards(file_paths, folder_path, count):
+    """
+    按大小均衡划分文件：所有文件按大小从大到小（大小相同按相对路径）依次分给当前总大小最小的分片
+    :param file_paths: 全部文件（FileListing时使用遍历时记录的大小）
+    :return: {相对路径: 分片序号（从1开始）}
+    """
+    sizes = file_paths.sizes if isinstance(file_paths, FileListing) else {}
+    entries = []
+    for path in file_paths:
+        size = sizes.get(path)
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+        entries.append((-size, journal_key(folder_path, path)))
+    entries.sort()
+    loads = [(0, n) for n in range(1, count + 1)]  # (已分配总大小, 分片序号)，总大小相同时小序号优先
+    plan = {}
+    for neg_size, key in entries:
+        load, n = heapq.heappop(loads)
+        plan[key] = n
+        heapq.heappush(loads, (load - neg_size, n))
+    return plan
+
+
+def load_shard_plan(file_paths, folder_path, count, rebuild=False):
+    """
+    读取（不存在时创建）所选文件夹下的分片划分文件：
+    文件大小在处理后会变化，各台机器开始时间不同，若各自按当时的大小重新划分，同一文件可能被分到不同分片；
+    因此第一台机器把划分写入共享文件夹（已存在时不覆盖），其他机器和之后的运行都使用同一划分
+    :param rebuild: 按当前文件重新划分（覆盖已有划分）
+    :return: {相对路径: 分片序号}
+    """
+    plan_path = os.path.join(folder_path, f"{SHARD_PLAN_PREFIX}{count}.json")
+    if not rebuild:
+        try:
+            with open(plan_path, 'r', encoding='utf-8') as f:
+                return json.load(f)['files']
+        except (OSError, ValueError, KeyError):
+            pass
+    data = {'version': 1, 'count': count, 'files': plan_shards(file_paths, folder_path, count)}
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', prefix='~wp', dir=folder_path)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        if rebuild:
+            os.replace(tmp_path, plan_path)
+        else:
+            try:
+                os.link(tmp_path, plan_path)  # 原子创建，已存在时失败（多台机器同时开始时只有一份生效）
+            except FileExistsError:
+                pass
+            except OSError:
+                try:
+                    os.rename(tmp_path, plan_path)  # 不支持硬链接时改用重命名（Windows上目标已存在时同样失败）
+                except FileExistsError:
+                    pass
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    with open(plan_path, 'r', encoding='utf-8') as f:
+        return json.load(f)['files']
+
+
+def select_shard(file_paths, folder_path, shard, rebuild=False):
+    """
+    确定性地选出第i片文件：按共享的分片划分选取，划分之后新增的文件按相对路径的CRC分配
+    :param shard: (i, N)
+    :return: 第i片的文件路径列表
+    """
+    index, count = shard
+    file_paths = list(file_paths) if not isinstance(file_paths, FileListing) else file_paths
+    plan = load_shard_plan(file_paths, folder_path, count, rebuild)
+    selected = []
+    for path in file_paths:
+        key = journal_key(folder_path, path)
+        n = plan.get(key)
+        if n is None:
+            n = zlib.crc32(key.encode('utf-8')) % count + 1
+        if n == index:
+            selected.append(path)
+    return selected
+
+
+def write_shard_report(path, summary, opts):
+    """写出本分片的结果报告（每个文件的结果及汇总，供merge子命令合并）"""
+    import socket  # 用于记录主机名（按需导入）
+
+    folder_path = summary['folder']
+    report = {
+        'version': 1,
+        'shard': list(opts['shard']),
+        'host': socket.gethostname(),
+        'signature': options_signature(opts),
+        'elapsed': summary['elapsed'],
+        'cache_skipped': summary['cache_skipped'],
+        'resumed': summary['resumed'],
+        'stats': summary['stats'],
+        'batch_errors': summary['batch_errors'],
+        'files': [{
+            'path': os.path.relpath(r['path'], folder_path).replace(os.sep, '/'),
+            'success': bool(r['success']),
+            'changed': bool(r['changed']),
+            'message': r['message'],
+            'elapsed': r['elapsed'],
+        } for r in summary['results']],
+    }
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', prefix='~wp', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def find_shard_reports(paths):
+    """展开报告参数：文件直接使用，文件夹则查找其中的分片报告"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.startswith(SHARD_REPORT_PREFIX) and name.endswith('.json')))
+        else:
+            found.append(path)
+    return found
+
+
+def merge_shard_reports(report_paths):
+    """
+    合并各分片的结果报告为一份批处理报告
+    :return: 汇总字典（total/succeeded/changed/unchanged/failed/cache_skipped/resumed/stats/errors/batch_errors/
+             shards/missing/duplicates/makespan），missing为缺少报告的分片序号，duplicates为出现在多个分片中的文件
+    """
+    shards = []
+    files = {}
+    duplicates = []
+    stats = {}
+    skipped = {'cache_skipped': 0, 'resumed': 0}
+    batch_errors = []
+    counts = set()
+    signatures = set()
+    for path in report_paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except (OSError, ValueError) as e:
+            batch_errors.append(f"读取分片报告失败：{path} - {str(e)}")
+            continue
+        index, count = report['shard']
+        counts.add(count)
+        signatures.add(report['signature'])
+        shards.append({'shard': index, 'host': report['host'], 'files': len(report['files']),
+                       'elapsed': report['elapsed'], 'report': path})
+        for key, value in report['stats'].items():
+            add_stat(stats, key, value)
+        batch_errors.extend(f"[{index}/{count}] {msg}" for msg in report['batch_errors'])
+        for entry in report['files']:
+            if entry['path'] in files:
+                duplicates.append(entry['path'])
+            files[entry['path']] = entry
+        for key in skipped:
+            skipped[key] += report[key]
+
+    if len(counts) > 1:
+        batch_errors.append(f"分片报告的分片总数不一致：{sorted(counts)}")
+    if len(signatures) > 1:
+        batch_errors.append("分片报告使用了不同的处理选项")
+    expected = max(counts) if counts else 0
+    present = {shard['shard'] for shard in shards}
+    failed = [entry for entry in files.values() if not entry['success']]
+    changed = sum(1 for entry in files.values() if entry['changed'])
+    return {
+        'total': len(files) + skipped['cache_skipped'] + skipped['resumed'],
+        'processed': len(files),
+        'succeeded': len(files) - len(failed),
+        'changed': changed,
+        'unchanged': len(files) - len(failed) - changed,
+        'failed': len(failed),
+        'cache_skipped': skipped['cache_skipped'],
+        'resumed': skipped['resumed'],
+        'stats': stats,
+        'errors': [entry['message'] for entry in failed],
+        'batch_errors': batch_errors,
+        'shards': sorted(shards, key=lambda shard: shard['shard']),
+        'missing': [n for n in range(1, expected + 1) if n not in present],
+        'duplicates': duplicates,
+        'makespan': max((shard['elapsed'] for shard in shards), default=0.0),
+    }
+
+
+# ------------------------------
+# 格式转换后端（Word COM / LibreOffice / 进程内假后端）
+# ------------------------------
+LIBREOFFICE_TIMEOUT = 300  # LibreOffice单个文档的转换超时（秒）
+LIBREOFFICE_WINDOWS_PATHS = [
+    r"C:\Program Files\LibreOffice\program\soffice.exe",
+    r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+]
+
+
+class ConverterBackend:
+    """
+    格式转换后端接口：一个实例对应一个转换程序，只在创建它的线程中使用
+    start/close 负责启动和关闭，save_as_docx/export_pdf 失败时抛出异常
+    """
+    name = ''
+
+    def start(self):
+        """启动转换程序（预热），失败时抛出异常"""
+
+    def save_as_docx(self, src_path, dst_path):
+        raise NotImplementedError
+
+    def export_pdf(self, src_path, dst_path):
+        raise NotImplementedError
+
+    def close(self):
+        """关闭转换程序并释放资源"""
+
+
+class WordComBackend(ConverterBackend):
+    """通过COM调用Word（仅Windows+Word环境可用）"""
+    name = 'word'
+
+    def __init__(self):
+        self.word = None
+        self._com_initialized = False
+
+    def start(self):
+        # COM按线程初始化：实例在哪个线程创建，就只能在哪个线程使用
+        import pythoncom
+        import win32com.client  # 用于格式转换（按需导入）
+        pythoncom.CoInitialize()
+        self._com_initialized = True
+        self.word = win32com.client.Dispatch("Word.Application")
+        self.word.Visible = False
+        self.word.DisplayAlerts = 0
+
+    def save_as_docx(self, src_path, dst_path):
+        doc = self.word.Documents.Open(os.path.abspath(src_path))
+        try:
+            doc.SaveAs2(os.path.abspath(dst_path), FileFormat=12)  # 12=docx格式，已存在自动覆盖
+        finally:
+            doc.Close(SaveChanges=0)
+
+    def export_pdf(self, src_path, dst_path):
+        doc = self.word.Documents.Open(os.path.abspath(src_path), ReadOnly=True)
+        try:
+            doc.ExportAsFixedFormat(
+                OutputFileName=os.path.abspath(dst_path),
+                ExportFormat=17,  # 17=PDF格式
+                IncludeDocProps=True,
+                CreateBookmarks=1,  # 保留大纲书签
+                DocStructureTags=True
+            )
+        finally:
+            doc.Close(SaveChanges=0)
+
+    def close(self):
+        try:
+            if self.word is not None:
+                # 必须关闭Word进程，释放资源
+                self.word.Quit()
+        finally:
+            self.word = None
+            if self._com_initialized:
+                import pythoncom
+                pythoncom.CoUninitialize()
+                self._com_initialized = False
+
+
+def find_soffice():
+    """查找LibreOffice可执行文件，找不到时返回None"""
+    for name in ('soffice', 'libreoffice'):
+        path = shutil.which(name)
+        if path:
+            return path
+    for path in LIBREOFFICE_WINDOWS_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class LibreOfficeBackend(ConverterBackend):
+    """
+    通过无界面LibreOffice（soffice --headless）转换，可在Linux批处理节点上运行
+    每个实例使用独立的用户配置目录，多个实例可同时运行互不冲突。
+    有LibreOffice的Python-UNO绑定（uno模块）时，start启动一个常驻的监听实例（--accept），
+    每个文档通过UNO在其中打开和保存，不再为每个文档启动一次soffice；实例在转换实例池中按
+    CONVERTER_RECYCLE_AFTER个文档或出错时关闭重建（close结束soffice进程）。
+    没有uno模块时退回每个文档调用一次soffice --convert-to（配置目录在start时初始化一次，之后复用）
+    """
+    name = 'libreoffice'
+
+    def __init__(self, soffice=None):
+        self.soffice = soffice or find_soffice()
+        self.profile_dir = None
+        self.out_dir = None
+        self.process = None  # 常驻的监听soffice进程（UNO模式）
+        self.desktop = None
+
+    def start(self):
+        if not self.soffice:
+            raise RuntimeError("未找到LibreOffice（soffice）")
+        self.profile_dir = tempfile.mkdtemp(prefix='wp_lo_profile_')
+        self.out_dir = tempfile.mkdtemp(prefix='wp_lo_out_')
+        try:
+            import uno  # LibreOffice自带的Python-UNO绑定（按需导入，可能不存在）
+        except ImportError:
+            self._run(['--terminate_after_init'])
+            return
+        self._start_listener(uno)
+
+    def _base_args(self):
+        import pathlib  # 用于生成LibreOffice配置目录的file URI（按需导入）
+        return [self.soffice, '--headless', '--norestore', '--nologo', '--nolockcheck',
+                f"-env:UserInstallation={pathlib.Path(self.profile_dir).as_uri()}"]
+
+    def _start_listener(self, uno):
+        """启动监听命名管道的soffice，并等待其可以通过UNO连接"""
+        import subprocess  # 用于启动LibreOffice（按需导入）
+        pipe_name = f"wp_lo_{os.getpid()}_{id(self)}"
+        self.process = subprocess.Popen(
+            self._base_args() + [f"--accept=pipe,name={pipe_name};urp;StarOffice.ComponentContext"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context)
+        deadline = time.monotonic() + LIBREOFFICE_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(f"uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"soffice启动失败，退出码 {self.process.returncode}")
+                if time.monotonic() > deadline:
+                    raise RuntimeError("等待soffice开始监听超时")
+                time.sleep(0.2)
+        self.desktop = context.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', context)
+
+    def _run(self, args):
+        import subprocess  # 用于调用LibreOffice转换（按需导入）
+        completed = subprocess.run(self._base_args() + args, capture_output=True, timeout=LIBREOFFICE_TIMEOUT)
+        if completed.returncode != 0:
+            raise RuntimeError(f"soffice退出码 {completed.returncode}："
+                               f"{completed.stderr.decode(errors='replace').strip()}")
+
+    def _convert(self, src_path, dst_path, filter_name, ext):
+        if self.desktop is not None:
+            self._convert_uno(src_path, dst_path, filter_name)
+            return
+        # soffice按源文件名输出到指定目录，先输出到实例自己的目录再移动到目标位置
+        convert_to = f"{ext[1:]}:{filter_name}"
+        self._run(['--convert-to', convert_to, '--outdir', self.out_dir, os.path.abspath(src_path)])
+        produced = os.path.join(self.out_dir, os.path.splitext(os.path.basename(src_path))[0] + ext)
+        if not os.path.exists(produced):
+            raise RuntimeError("LibreOffice未生成输出文件")
+        shutil.move(produced, dst_path)
+
+    def _convert_uno(self, src_path, dst_path, filter_name):
+        """在常驻实例中打开文档并按指定过滤器保存；超时时结束soffice进程（实例随后由转换实例池重建）"""
+        import uno
+
+        def properties(**values):
+            result = []
+            for name, value in values.items():
+                prop = uno.createUnoStruct('com.sun.star.beans.PropertyValue')
+                prop.Name, prop.Value = name, value
+                result.append(prop)
+            return tuple(result)
+
+        if self.process.poll() is not None:
+            raise RuntimeError(f"soffice已退出，退出码 {self.process.returncode}")
+        watchdog = threading.Timer(LIBREOFFICE_TIMEOUT, self.process.kill)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(src_path)), '_blank', 0,
+                properties(Hidden=True, ReadOnly=True))
+            if doc is None:
+                raise RuntimeError("LibreOffice无法打开文档")
+            try:
+                doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(dst_path)),
+                               properties(FilterName=filter_name, Overwrite=True))
+            finally:
+                doc.close(True)
+        finally:
+            watchdog.cancel()
+
+    def save_as_docx(self, src_path, dst_path):
+        self._convert(src_path, dst_path, 'MS Word 2007 XML', '.docx')
+
+    def export_pdf(self, src_path, dst_path):
+        self._convert(src_path, dst_path, 'writer_pdf_Export', '.pdf')
+
+    def close(self):
+        try:
+            if self.process is not None:
+                try:
+                    if self.desktop is not None:
+                        self.desktop.terminate()
+                except Exception:
+                    pass  # 进程可能已崩溃或被结束
+                try:
+                    self.process.wait(timeout=30)
+                except Exception:
+                    self.process.kill()
+                    self.process.wait()
+        finally:
+            self.process = self.desktop = None
+            for path in (self.profile_dir, self.out_dir):
+                if path:
+                    shutil.rmtree(path, ignore_errors=True)
+            self.profile_dir = self.out_dir = None
+
+
+class FakeBackend(ConverterBackend):
+    """
+    进程内假后端（测试和调度对比用）：docx直接复制源文件，pdf写入占位内容
+    文件名包含fail_marker时模拟转换失败
+    """
+    name = 'fake'
+
+    def __init__(self, delay=0.0, fail_marker='__fail__'):
+        self.delay = delay  # 每个文档的模拟耗时（秒）
+        self.fail_marker = fail_marker
+
+    def _check(self, src_path):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail_marker and self.fail_marker in os.path.basename(src_path):
+            raise RuntimeError("模拟转换失败")
+
+    def save_as_docx(self, src_path, dst_path):
+        self._check(src_path)
+        shutil.copyfile(src_path, dst_path)
+
+    def export_pdf(self, src_path, dst_path):
+        self._check(src_path)
+        with open(dst_path, 'wb') as f:
+            f.write(b"%PDF-1.4\n%%EOF\n")
+
+
+CONVERTER_BACKENDS = {
+    'word': WordComBackend,
+    'libreoffice': LibreOfficeBackend,
+    'fake': FakeBackend,
+}
+
+
+def default_converter_backend():
+    """默认转换后端：Windows使用Word，其他系统使用LibreOffice"""
+    return 'word' if sys.platform == 'win32' else 'libreoffice'
+
+
+# ------------------------------
+# 转换实例池（长期存在，跨批次复用已启动的转换程序）
+# ------------------------------
+CONVERT_MAX_WORKERS = 5  # 转换实例数上限（避免Word进程过多）
+CONVERTER_RECYCLE_AFTER = 200  # 每个实例转换多少个文档后重建（避免转换程序长时间运行后状态异常）
+CONVERTER_IDLE_TIMEOUT = 600  # 实例空闲多久（秒）后自动关闭
+# 转换任务调度方式：dynamic=共享队列、按文件大小从大到小动态领取；static=按数量预先均分（split_tasks，便于对比）
+CONVERT_SCHEDULE = 'dynamic'
+CONVERT_MANIFEST_NAME = '.wordprocess_convert_manifest.json'  # 格式转换记录（判断目标文件是否已是最新）
+CONVERT_RULES_VERSION = 1  # 转换参数变化时递增，使旧的转换记录失效
+
+
+def split_tasks(file_list, thread_count):
+    """均分任务到线程（新增函数）"""
+    batch_size = (len(file_list) + thread_count - 1) // thread_count  # 向上取整
+    return [file_list[i * batch_size: min((i + 1) * batch_size, len(file_list))] for i in range(thread_count)]
+
+
+def order_by_size_desc(file_paths, sizes=None):
+    """
+    按文件大小从大到小排序（大文件先开始，避免批次末尾只剩一个大文件拖长总耗时）
+    :param sizes: 已知的文件大小（如FileListing.sizes），缺少的再逐个获取
+    """
+    sizes = sizes or {}
+
+    def size(path):
+        if path in sizes:
+            return sizes[path]
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    return sorted(file_paths, key=size, reverse=True)
+
+
+def _drain_queue(task_queue):
+    """从共享队列中逐个领取任务，直到队列取空"""
+    while True:
+        try:
+            yield task_queue.get_nowait()
+        except queue.Empty:
+            return
+
+
+def default_convert_workers(total):
+    """默认转换实例数：不超过CPU核心数、上限和文件数"""
+    return max(1, min(CONVERT_MAX_WORKERS, os.cpu_count() or 2, total))
+
+
+class ConverterPool:
+    """
+    转换实例池：每个工作线程独占一个后端实例（COM对象不能跨线程使用），线程和实例跨批次复用，
+    实例在首次使用时启动，转换recycle_after个文档后或出错后关闭重建，空闲超时后自动关闭
+    :param backend_factory: 创建后端实例的函数（如后端类）
+    """
+
+    def __init__(self, backend_factory, recycle_after=CONVERTER_RECYCLE_AFTER, idle_timeout=CONVERTER_IDLE_TIMEOUT):
+        self.backend_factory = backend_factory
+        self.recycle_after = recycle_after
+        self.idle_timeout = idle_timeout
+        self.started = 0  # 累计启动的实例数（含回收重建）
+        self._inboxes = []
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _ensure_workers(self, count):
+        with self._lock:
+            while len(self._inboxes) < count:
+                inbox = queue.SimpleQueue()
+                thread = threading.Thread(target=self._worker_loop, args=(inbox,), daemon=True)
+                self._inboxes.append(inbox)
+                self._threads.append(thread)
+                thread.start()
+
+    def _create_backend(self):
+        backend = self.backend_factory()
+        try:
+            backend.start()
+        except Exception as e:
+            self._discard(backend)
+            raise RuntimeError(f"转换程序启动失败：{str(e)}") from e
+        with self._lock:
+            self.started += 1
+        return backend
+
+    @staticmethod
+    def _discard(backend):
+        if backend is not None:
+            try:
+                backend.close()
+            except Exception:
+                pass  # 实例可能已崩溃，关闭失败不影响后续重建
+
+    def _worker_loop(self, inbox):
+        backend = None
+        converted = 0
+        while True:
+            try:
+                job = inbox.get(timeout=self.idle_timeout if backend is not None else None)
+            except queue.Empty:
+                self._discard(backend)
+                backend = None
+                continue
+            if job is None:
+                break
+            tasks, convert_one, on_done, busy, index, finished, callback_errors = job
+            try:
+                for path in tasks:
+                    file_start = time.perf_counter()
+                    error = None
+                    try:
+                        if backend is None:
+                            backend = self._create_backend()
+                            converted = 0
+                        converted += 1
+                        convert_one(backend, path)
+                    except Exception as e:
+                        error = e
+                    # 出错或达到回收阈值时关闭实例，下一个文档使用新实例
+                    if error is not None or converted >= self.recycle_after:
+                        self._discard(backend)
+                        backend = None
+                    busy[index] += time.perf_counter() - file_start
+                    try:
+                        on_done(path, error)
+                    except Exception as e:
+                        # 回调异常不能结束工作线程，否则run会一直等待该实例完成
+                        callback_errors.append(f"{os.path.basename(path)} - 完成回调异常：{str(e)}")
+            except Exception as e:
+                callback_errors.append(f"领取任务异常：{str(e)}")
+            finally:
+                finished.put(index)
+        self._discard(backend)
+
+    def run(self, file_paths, convert_one, on_done, max_workers, schedule=CONVERT_SCHEDULE, sizes=None):
+        """
+        用max_workers个实例转换一批文件，阻塞直到全部完成
+        :param convert_one: 转换单个文件的函数，参数为 (后端实例, 文件路径)，失败时抛出异常
+        :param on_done: 单个文件完成后的回调，参数为 (文件路径, 异常或None)
+        :param schedule: dynamic（共享队列动态领取，大文件优先）或 static（按数量预先均分）
+        :param sizes: 已知的文件大小，用于按大小排序
+        :return: 调度统计字典（schedule/makespan/busy/callback_errors），busy为每个实例的忙碌秒数，
+                 callback_errors为on_done抛出的异常说明
+        """
+        max_workers = max(1, min(max_workers, len(file_paths)))
+        self._ensure_workers(max_workers)
+        if schedule == 'static':
+            task_lists = [iter(tasks) for tasks in split_tasks(file_paths, max_workers)]
+        else:
+            # 所有实例从同一队列领取任务，谁空闲谁取下一个
+            shared = queue.SimpleQueue()
+            for path in order_by_size_desc(file_paths, sizes):
+                shared.put(path)
+            task_lists = [_drain_queue(shared) for _ in range(max_workers)]
+        return dict(self._dispatch(task_lists, convert_one, on_done), schedule=schedule)
+
+    def run_stream(self, source, convert_one, on_done, max_workers):
+        """
+        用max_workers个实例持续转换source中陆续到达的文件，阻塞直到source结束（流水线阶段使用）
+        :param source: 每次iter()返回一个独立消费者的任务来源（如PipelineQueue），各实例共同领取
+        :return: 调度统计字典
+        """
+        max_workers = max(1, max_workers)
+        self._ensure_workers(max_workers)
+        return dict(self._dispatch([iter(source) for _ in range(max_workers)], convert_one, on_done),
+                    schedule='stream')
+
+    def _dispatch(self, task_lists, convert_one, on_done):
+        """
+        把每个任务序列交给一个实例线程，等待全部完成
+        :return: makespan、各实例忙碌时间和callback_errors（on_done或任务来源抛出的异常说明）
+        """
+        busy = [0.0] * len(task_lists)
+        finished = queue.SimpleQueue()
+        callback_errors = []
+        start = time.perf_counter()
+        for index, tasks in enumerate(task_lists):
+            self._inboxes[index].put((tasks, convert_one, on_done, busy, index, finished, callback_errors))
+        for _ in task_lists:
+            finished.get()
+        return {
+            'makespan': time.perf_counter() - start,
+            'busy': busy,
+            'callback_errors': callback_errors,
+        }
+
+    def shutdown(self):
+        """关闭所有实例并结束工作线程"""
+        with self._lock:
+            inboxes, threads = self._inboxes, self._threads
+            self._inboxes, self._threads = [], []
+        for inbox in inboxes:
+            inbox.put(None)
+        for thread in threads:
+            thread.join()
+
+
+_converter_pools = {}  # (后端名称, 用途) → 转换实例池（进程内长期复用）
+_converter_pools_lock = threading.Lock()
+
+
+def get_converter_pool(backend_name, purpose='batch'):
+    """
+    获取（首次使用时创建）指定后端的转换实例池
+    :param purpose: 用途，同时运行的转换阶段（如流水线中的转换和导出）各用一个池，互不占用实例
+    """
+    with _converter_pools_lock:
+        pool = _converter_pools.get((backend_name, purpose))
+        if pool is None:
+            pool = ConverterPool(CONVERTER_BACKENDS[backend_name])
+            _converter_pools[(backend_name, purpose)] = pool
+        return pool
+
+
+def shutdown_converter_pools():
+    """程序退出前关闭所有转换实例（否则后台Word进程会残留）"""
+    with _converter_pools_lock:
+        pools = list(_converter_pools.values())
+        _converter_pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+def format_schedule_summary(schedule_stats):
+    """生成调度统计说明：总耗时（makespan）及各转换实例忙碌时间"""
+    mode = "动态领取" if schedule_stats['schedule'] == 'dynamic' else "静态均分"
+    busy = "/".join(f"{seconds:.1f}" for seconds in schedule_stats['busy'])
+    return f"总耗时：{schedule_stats['makespan']:.1f} 秒（{mode}，各转换实例忙碌 {busy} 秒）"
+
+
+# ------------------------------
+# 辅助功能区：格式转换功能（并行优化版）
+# ------------------------------
+def docx_target_path(doc_path):
+    """doc转换后的docx路径（同目录同名）"""
+    return f"{os.path.splitext(doc_path)[0]}.docx"
+
+
+def pdf_target_path(docx_path, root_dir, use_separate_folder):
+    """docx导出的pdf路径：原位置同名，或 root_dir/docx2pdf 下保持相对目录结构"""
+    if use_separate_folder:
+        relative_path = os.path.relpath(docx_path, root_dir)
+        return os.path.join(root_dir, "docx2pdf", f"{os.path.splitext(relative_path)[0]}.pdf")
+    return f"{os.path.splitext(docx_path)[0]}.pdf"
+
+
+def convert_manifest_key(manifest, kind, src_path):
+    """转换记录键：转换类型 + 源文件相对路径"""
+    return f"{kind}:{manifest_key(manifest, src_path)}"
+
+
+def is_target_fresh(manifest, kind, src_path, dst_path):
+    """
+    make式新鲜度判断：目标文件存在，且修改时间不早于源文件，
+    或源文件内容与上次成功转换到同一目标时记录的哈希一致（如源文件被复制/touch过）
+    """
+    try:
+        if os.stat(dst_path).st_mtime_ns >= os.stat(src_path).st_mtime_ns:
+            return True
+    except OSError:
+        return False
+    key = convert_manifest_key(manifest, kind, src_path)
+    entry = manifest['files'].get(key)
+    if not entry or entry.get('target') != manifest_key(manifest, dst_path):
+        return False
+    return is_file_up_to_date(manifest, src_path, key)
+
+
+def split_fresh_files(manifest, kind, file_paths, target_for, reporter):
+    """
+    过滤掉目标已是最新的文件（直接记为跳过）
+    :param target_for: 由源文件路径得到目标路径的函数
+    :return: 需要转换的文件列表
+    """
+    pending = []
+    for path in file_paths:
+        if is_target_fresh(manifest, kind, path, target_for(path)):
+            reporter.file_done(os.path.basename(path), 'skipped')
+        else:
+            pending.append(path)
+    return pending
+
+
+def record_conversion(manifest, manifest_lock, kind, src_path, dst_path):
+    """记录成功转换时源文件的指纹和目标文件；源文件已不存在时删除记录"""
+    key = convert_manifest_key(manifest, kind, src_path)
+    try:
+        entry = dict(file_fingerprint(src_path), target=manifest_key(manifest, dst_path),
+                     signature=manifest['signature'])
+    except OSError:
+        entry = None
+    with manifest_lock:
+        if entry:
+            manifest['files'][key] = entry
+        else:
+            manifest['files'].pop(key, None)
+
+
+def forget_conversion(manifest, manifest_lock, kind, src_path):
+    with manifest_lock:
+        manifest['files'].pop(convert_manifest_key(manifest, kind, src_path), None)
+
+
+def run_converter_batch(kind, file_paths, root_dir, target_for, convert_one, on_done, reporter, backend,
+                        max_workers, schedule, force, dedupe=False):
+    """
+    转换批次的公共流程：读取转换记录 → 跳过已是最新的文件 → （去重）→ 实例池转换 → 保存转换记录
+    :param on_done: 单个文件完成后的回调，参数为 (文件路径, 异常或None, 转换记录更新函数)
+    :param dedupe: 内容相同的源文件只转换一次，目标文件复制给其余副本
+    :return: 调度统计字典（另含deduplicated：未重复转换的副本数）
+    """
+    manifest = load_manifest(root_dir, str(CONVERT_RULES_VERSION), CONVERT_MANIFEST_NAME)
+    manifest_lock = threading.Lock()
+    sizes = file_paths.sizes if isinstance(file_paths, FileListing) else None
+    pending = list(file_paths) if force else split_fresh_files(manifest, kind, file_paths, target_for, reporter)
+    groups = {}
+    if dedupe:
+        pending, index = group_duplicates(pending, sizes)
+        groups = index.groups
+
+    def remember(path, converted):
+        if converted:
+            record_conversion(manifest, manifest_lock, kind, path, target_for(path))
+        else:
+            forget_conversion(manifest, manifest_lock, kind, path)
+
+    def done(path, error):
+        # 先把目标文件复制给内容相同的副本（源文件可能在on_done中被删除），再逐个记录结果
+        dup_errors = {}
+        for dup in groups.get(path, ()):
+            dup_errors[dup] = error
+            if error is None:
+                try:
+                    dup_target = target_for(dup)
+                    os.makedirs(os.path.dirname(dup_target) or '.', exist_ok=True)
+                    shutil.copyfile(target_for(path), dup_target)
+                except OSError as e:
+                    dup_errors[dup] = e
+        on_done(path, error, remember)
+        for dup, dup_error in dup_errors.items():
+            on_done(dup, dup_error, remember)
+
+    pool = get_converter_pool(backend or default_converter_backend())
+    schedule_stats = pool.run(pending, convert_one, done,
+                              max_workers or default_convert_workers(len(pending)), schedule, sizes)
+    schedule_stats['deduplicated'] = sum(len(dups) for dups in groups.values())
+    for message in schedule_stats['callback_errors']:
+        reporter.add_error(message)
+    try:
+        save_manifest(manifest)
+    except OSError as e:
+        reporter.add_error(f"保存转换记录失败：{str(e)}")
+    return schedule_stats
+
+
+def convert_doc_files(doc_files, root_dir, keep_source, reporter, backend=None, max_workers=None,
+                      schedule=CONVERT_SCHEDULE, force=False, dedupe=False):
+    """
+    批量将doc文件转换为同目录下的docx文件（不依赖界面，界面和命令行共用）
+    :param reporter: 进度汇总器（ProgressReporter）
+    :param backend: 转换后端名称（默认见default_converter_backend）
+    :param force: 目标文件已是最新时也重新转换
+    :param dedupe: 内容相同的doc只转换一次
+    :return: 调度统计字典
+    """
+    def convert_one(converter, doc_path):
+        reporter.file_started(os.path.basename(doc_path))
+        converter.save_as_docx(doc_path, docx_target_path(doc_path))
+
+    def on_done(doc_path, error, remember):
+        filename = os.path.basename(doc_path)
+        if error is not None:
+            remember(doc_path, False)
+            reporter.file_done(filename, 'failed', f"{filename} - 转换失败：{str(error).split(',')[0]}")
+            return
+        reporter.file_done(filename)
+        # 不需要保留源文件则删除（源文件不存在后无需记录）
+        if not keep_source:
+            try:
+                if os.path.exists(doc_path):
+                    os.remove(doc_path)
+            except Exception as e:
+                reporter.add_error(f"{filename} - 删除源文件失败：{str(e)}")
+        remember(doc_path, os.path.exists(doc_path))
+
+    return run_converter_batch('doc2docx', doc_files, root_dir, docx_target_path, convert_one, on_done,
+                               reporter, backend, max_workers, schedule, force, dedupe)
+
+
+def convert_docx_files(docx_files, root_dir, use_separate_folder, reporter, backend=None, max_workers=None,
+                       schedule=CONVERT_SCHEDULE, force=False, dedupe=False):
+    """
+    批量将docx文件导出为pdf（不依赖界面，界面和命令行共用）
+    :param use_separate_folder: 是否保存到 root_dir/docx2pdf 下（保持相对目录结构）
+    :param force: 目标文件已是最新时也重新导出
+    :param dedupe: 内容相同的docx只导出一次，PDF复制给其余副本
+    :return: 调度统计字典
+    """
+    def target_for(docx_path):
+        return pdf_target_path(docx_path, root_dir, use_separate_folder)
+
+    def convert_one(converter, docx_path):
+        reporter.file_started(os.path.basename(docx_path))
+        pdf_path = target_for(docx_path)
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        converter.export_pdf(docx_path, pdf_path)
+
+    def on_done(docx_path, error, remember):
+        filename = os.path.basename(docx_path)
+        remember(docx_path, error is None)
+        if error is not None:
+            reporter.file_done(filename, 'failed', f"{filename} - 转换失败：{str(error)}")
+        else:
+            reporter.file_done(filename)
+
+    return run_converter_batch('docx2pdf', docx_files, root_dir, target_for, convert_one, on_done,
+                               reporter, backend, max_workers, schedule, force, dedupe)
 
 
 # ------------------------------
-# 通用工具函数
+# 流水线：每个文件依次经过 DOC→DOCX转换 → 处理 → PDF导出，各阶段同时运行
 # ------------------------------
-def select_folder():
-    """选择文件夹并返回路径，若取消选择则返回None"""
-    folder_path = filedialog.askdirectory(title="选择文件夹")
-    return folder_path if folder_path else None
+PIPELINE_QUEUE_SIZE = 16  # 阶段之间队列的容量：下游跟不上时上游暂停，避免中间文件大量积压
+PIPELINE_PUT_TIMEOUT = 0.5  # 队列已满时每次等待的秒数，超时后检查下游阶段是否已终止
+_PIPELINE_END = object()  # 队列结束标记
+PIPELINE_STAGE_NAMES = {'convert': 'DOC→DOCX', 'process': '处理', 'export': '导出PDF'}
 
 
-def get_all_files_by_ext(folder_path, exts):
+class PipelineQueue:
     """
-    获取指定文件夹下所有符合扩展名的文件路径（排除Word临时文件）
-    :param folder_path: 文件夹路径
-    :param exts: 扩展名列表（如['.docx', '.doc']）
-    :return: 符合条件的文件路径列表
+    流水线阶段之间的有界队列：所有上游生产者都调用producer_done后，消费者在取完剩余任务后结束
+    每次iter()得到一个独立的消费者，同一阶段的多个工作线程可同时消费
+    下游阶段异常终止时调用abort，此后的put不再阻塞，直接返回False
+    :param producers: 上游生产者数量
     """
-    exts = [ext.lower() for ext in exts]  # 统一转为小写便于匹配
-    files = []
-    # 遍历文件夹及其子文件夹
-    for root_dir, _, filenames in os.walk(folder_path):
-        for filename in filenames:
-            # 过滤Word临时文件（以~$开头的文件）
-            if filename.startswith('~$'):
+
+    def __init__(self, producers=1, maxsize=PIPELINE_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize)
+        self._producers = producers
+        self._lock = threading.Lock()
+        self._aborted = threading.Event()
+
+    def put(self, item):
+        """放入一个任务，队列满时等待；下游已终止时返回False（任务未放入）"""
+        while not self._aborted.is_set():
+            try:
+                self._queue.put(item, timeout=PIPELINE_PUT_TIMEOUT)
+                return True
+            except queue.Full:
                 continue
-            # 检查文件是否符合任一扩展名
-            if any(filename.lower().endswith(ext) for ext in exts):
-                files.append(os.path.join(root_dir, filename))
-    return files
+        return False
 
+    def abort(self):
+        """标记消费者已全部终止，唤醒并拒绝所有等待中的和之后的put"""
+        self._aborted.set()
 
-# ------------------------------
-# 主功能区：Word处理功能
-# ------------------------------
-def remove_header_footer(doc):
-    """删除文档中所有节的页眉页脚内容，并断开节链接"""
-    for section in doc.sections:
-        # 关键：断开当前节与前一节的页眉页脚链接
-        section.header.is_linked_to_previous = False
-        section.footer.is_linked_to_previous = False
-
-        # 原有删除页眉逻辑
-        header = section.header
-        for para in reversed(header.paragraphs):
-            p_element = para._element
-            parent = p_element.getparent()
-            if parent is not None:
-                parent.remove(p_element)
-            para._p = None
-            para._element = None
-
-        # 原有删除页脚逻辑
-        footer = section.footer
-        for para in reversed(footer.paragraphs):
-            p_element = para._element
-            parent = p_element.getparent()
-            if parent is not None:
-                parent.remove(p_element)
-            para._p = None
-            para._element = None
-
-
-def add_custom_header(doc):
-    """为文档所有节添加自定义页眉，距离顶端0.7cm，避免重复"""
-    for section in doc.sections:
-        # 1. 设置页眉距离顶端 0.7cm
-        section.header_distance = Cm(0.7)
-
-        # 2. 强制清空当前节页眉（去重逻辑）
-        header = section.header
-        for para in reversed(header.paragraphs):
-            p_element = para._element
-            parent = p_element.getparent()
-            if parent is not None:
-                parent.remove(p_element)
-            para._p = None
-            para._element = None
-
-        # 3. 添加新页眉内容
-        para = header.add_paragraph()
-        para.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        para.paragraph_format.left_indent = Cm(1.5) - section.left_margin
-        run = para.add_run("泉尚优学：学为人师，行为世范！")
-        run.font.name = "华文行楷"
-        run._element.rPr.rFonts.set(qn('w:eastAsia'), "华文行楷")
-        run.font.size = Pt(12)
-
-
-def add_centered_page_number(doc):
-    """为文档所有节添加居中页码（第X页/共Y页），距离底端1cm，避免重复"""
-    for section in doc.sections:
-        # 1. 设置页脚距离底端 1cm
-        section.footer_distance = Cm(1.0)
-
-        # 2. 强制清空当前节页脚（去重逻辑）
-        footer = section.footer
-        for para in reversed(footer.paragraphs):
-            p_element = para._element
-            parent = p_element.getparent()
-            if parent is not None:
-                parent.remove(p_element)
-            para._p = None
-            para._element = None
-
-        # 3. 添加页码内容
-        p = footer.add_paragraph()
-        para_format = p.paragraph_format
-        para_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-        run = p.add_run("第")
-        run.font.name = "宋体"
-        run._element.rPr.rFonts.set(qn('w:eastAsia'), "宋体")
-        run.font.size = Pt(12)
-
-        run = p.add_run()
-        fld_char_begin = OxmlElement('w:fldChar')
-        fld_char_begin.set(qn('w:fldCharType'), 'begin')
-        run._r.append(fld_char_begin)
-
-        instr_text = OxmlElement('w:instrText')
-        instr_text.text = "PAGE"
-        run._r.append(instr_text)
-
-        fld_char_sep = OxmlElement('w:fldChar')
-        fld_char_sep.set(qn('w:fldCharType'), 'separate')
-        run._r.append(fld_char_sep)
-
-        fld_char_end = OxmlElement('w:fldChar')
-        fld_char_end.set(qn('w:fldCharType'), 'end')
-        run._r.append(fld_char_end)
-
-        run = p.add_run("页/共")
-        run.font.name = "宋体"
-        run._element.rPr.rFonts.set(qn('w:eastAsia'), "宋体")
-        run.font.size = Pt(12)
-
-        run = p.add_run()
-        fld_char_begin = OxmlElement('w:fldChar')
-        fld_char_begin.set(qn('w:fldCharType'), 'begin')
-        run._r.append(fld_char_begin)
-
-        instr_text = OxmlElement('w:instrText')
-        instr_text.text = "NUMPAGES"
-        run._r.append(instr_text)
-
-        fld_char_sep = OxmlElement('w:fldChar')
-        fld_char_sep.set(qn('w:fldCharType'), 'separate')
-        run._r.append(fld_char_sep)
-
-        fld_char_end = OxmlElement('w:fldChar')
-        fld_char_end.set(qn('w:fldCharType'), 'end')
-        run._r.append(fld_char_end)
-
-        run = p.add_run("页")
-        run.font.name = "宋体"
-        run._element.rPr.rFonts.set(qn('w:eastAsia'), "宋体")
-        run.font.size = Pt(12)
+    def producer_done(self):
+        with self._lock:
+            self._producers -= 1
+            last = self._producers == 0
+        if last:
+            self.put(_PIPELINE_END)
 
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is _PIPELINE_END:
+                self._queue.put(item)  # 放回结束标记，让同一阶段的其他消费者也能结束
+                return
+            yield item
 
-def replace_patterns_in_paragraph(paragraph):
+
+def has_doc_source(docx_path, doc_stems):
     """
-    替换段落中符合特定模式的文本（复用全局编译的正则，提升速度）
-    :param paragraph: 需要处理的段落对象
+    docx旁边是否有同名doc（该docx将由流水线的转换阶段重新生成，不单独进入处理阶段）
+    与遍历时一样不区分扩展名和文件名的大小写（如"A.DOC"与"a.docx"）
+    :param doc_stems: 缓存字典 {目录: 该目录下doc文件小写主文件名的集合}，每个目录只列出一次
     """
-    text_runs = []  # 存储段落中所有文本片段（包含run对象、文本内容及位置）
-    char_pos = 0  # 字符位置计数器
+    dir_path, name = os.path.split(docx_path)
+    stems = doc_stems.get(dir_path)
+    if stems is None:
+        try:
+            names = os.listdir(dir_path or '.')
+        except OSError:
+            names = []
+        stems = {os.path.splitext(n)[0].lower() for n in names if n.lower().endswith('.doc')}
+        doc_stems[dir_path] = stems
+    return os.path.splitext(name)[0].lower() in stems
 
-    for run in paragraph.runs:
-        if not run.text:
-            continue  # 跳过空文本
-        text = run.text
-        start = char_pos
-        end = char_pos + len(text)
-        text_runs.append((run, text, start, end))
-        char_pos = end  # 更新位置
 
-    if not text_runs:
-        return  # 无文本则直接返回
+def run_pipeline(root_dir, opts, reporter, file_paths=None, backend=None, convert_workers=None,
+                 process_workers=None, force=False):
+    """
+    流水线模式：一次遍历目录，每个文件完成上一阶段后立即进入下一阶段，没有整批等待
+    转换（doc→docx）和导出（docx→pdf）各用一个转换实例池，处理阶段用独立的线程/进程，阶段之间为有界队列
+    :param root_dir: 工作文件夹
+    :param opts: 普通字典形式的处理选项（含keep_source_doc/docx2pdf_separate_folder/keep_backup/use_cache等）
+    :param reporter: 进度汇总器，每个文件离开流水线（导出完成、跳过或失败）时计数一次
+    :param file_paths: 待处理的.doc/.docx文件（默认遍历root_dir）
+    :param backend: 转换后端名称（默认见default_converter_backend）
+    :param convert_workers: 转换和导出阶段各自的实例数
+    :param process_workers: 处理阶段的工作线程/进程数
+    :param force: 转换和导出的目标已是最新时也重新生成
+    :return: 汇总字典（各阶段完成数、失败数、跳过数和忙碌时间，总耗时）
+    """
+    start = time.perf_counter()
+    root_dir = os.path.normpath(root_dir)
+    if file_paths is None:
+        file_paths = FileListing(root_dir, ['.doc', '.docx'])
+    backend = backend or default_converter_backend()
+    convert_workers = max(1, convert_workers or default_convert_workers(CONVERT_MAX_WORKERS))
+    process_workers = max(1, process_workers or opts.get('process_workers') or os.cpu_count() or 1)
+    keep_backup = bool(opts.get('keep_backup'))
+    keep_source = bool(opts.get('keep_source_doc'))
+    use_separate_folder = bool(opts.get('docx2pdf_separate_folder'))
 
-    # 合并所有文本用于匹配
-    all_text = ''.join([t[1] for t in text_runs])
-    replaced_ranges = []  # 存储需要替换的文本范围
-
-    # 标记需要替换的范围
-    def mark_replaced(match):
-        replaced_ranges.append((match.start(), match.end()))
-        return ""  # 替换为空
-
-    # 执行匹配并标记（复用全局正则，无需重复编译）
-    re.sub(chinese_pattern, mark_replaced, all_text)
-    re.sub(english_pattern, mark_replaced, all_text)
-    re.sub(k_pattern, mark_replaced, all_text)
-
-    # 创建保留标记（True表示保留，False表示删除）
-    keep_mask = [True] * len(all_text)
-    for start, end in replaced_ranges:
-        for i in range(start, end):
-            if i < len(keep_mask):
-                keep_mask[i] = False
-
-    # 根据保留标记更新每个run的文本
-    for run, original_text, start, end in text_runs:
-        kept_chars = []
-        for i in range(start, end):
-            if i < len(keep_mask) and keep_mask[i]:
-                original_idx = i - start  # 计算在原始文本中的索引
-                kept_chars.append(original_text[original_idx])
-        run.text = ''.join(kept_chars)  # 更新run的文本
-
-
-def set_outline_level(doc):
-    """
-    将文档中符合特定格式的段落大纲级别设置为1级
-    """
-    # 定义中文数字（扩展常用范围）
-    chinese_nums = r'(?:一|二|三|四|五|六|七|八|九|十|十一|十二|十三|十四|十五|十六|十七|十八|十九|二十)'
-
-    # 组合所有匹配模式
-    pattern = (
-            r'(题型|考点|考法)(?:\d+|' + chinese_nums + r').*'
-            r'|^\s*(?:A夯实基础|B能力提升|C综合素养)\s*$'
-            r'|第(?:\d+|' + chinese_nums + r')(章|单元).*'
-    )
+    def pdf_for(docx_path):
+        return pdf_target_path(docx_path, root_dir, use_separate_folder)
 
-    for para in doc.paragraphs:
-        clean_text = para.text.strip()
-        if re.search(pattern, clean_text):
-            # 获取或创建段落属性元素
-            p_pr = para._element.get_or_add_pPr()
-            # 移除已有的大纲级别设置（避免重复）
-            for elem in p_pr.findall(qn('w:outlineLvl')):
-                p_pr.remove(elem)
-            # 创建大纲级别元素并设置为1级（Word中0对应1级）
-            outline_level = OxmlElement('w:outlineLvl')
-            outline_level.set(qn('w:val'), '0')
-            p_pr.append(outline_level)
+    convert_manifest = load_manifest(root_dir, str(CONVERT_RULES_VERSION), CONVERT_MANIFEST_NAME)
+    convert_lock = threading.Lock()
+    process_manifest = load_manifest(root_dir, options_signature(opts)) if opts.get('use_cache') else None
+    process_lock = threading.Lock()
+    counts = {stage: {'done': 0, 'skipped': 0, 'failed': 0} for stage in ('convert', 'process', 'export')}
+    counts_lock = threading.Lock()
+    batch_errors = []
 
+    def count(stage, status):
+        with counts_lock:
+            counts[stage][status] += 1
 
-def process_word_file(file_path, keep_backup):
-    """
-    处理单个Word文件（根据选项执行相应操作）
-    :param file_path: 文件路径
-    :param keep_backup: 是否保留备份
-    :return: (处理结果, 消息)
-    """
+    def fail(stage, path, message):
+        count(stage, 'failed')
+        reporter.file_done(os.path.basename(path), 'failed', message)
+
+    def forward(target_queue, stage, path):
+        """把文件交给下一阶段；该阶段已异常终止时计为失败，不阻塞上游"""
+        if not target_queue.put(path):
+            fail(stage, path, f"{os.path.basename(path)} - {PIPELINE_STAGE_NAMES[stage]}阶段已终止，未处理")
+
+    doc_queue = PipelineQueue()  # 遍历 → 转换
+    process_queue = PipelineQueue(producers=2)  # 遍历、转换 → 处理
+    export_queue = PipelineQueue(producers=process_workers)  # 处理 → 导出
+
+    # 阶段1：doc→docx
+    def convert_one(converter, doc_path):
+        reporter.file_started(os.path.basename(doc_path))
+        converter.save_as_docx(doc_path, docx_target_path(doc_path))
+
+    def on_converted(doc_path, error):
+        filename = os.path.basename(doc_path)
+        if error is not None:
+            forget_conversion(convert_manifest, convert_lock, 'doc2docx', doc_path)
+            fail('convert', doc_path, f"{filename} - 转换失败：{str(error).split(',')[0]}")
+            return
+        count('convert', 'done')
+        if not keep_source:
+            try:
+                if os.path.exists(doc_path):
+                    os.remove(doc_path)
+            except Exception as e:
+                reporter.add_error(f"{filename} - 删除源文件失败：{str(e)}")
+        if os.path.exists(doc_path):
+            record_conversion(convert_manifest, convert_lock, 'doc2docx', doc_path, docx_target_path(doc_path))
+        else:
+            forget_conversion(convert_manifest, convert_lock, 'doc2docx', doc_path)
+        forward(process_queue, 'process', docx_target_path(doc_path))
+
+    def convert_stage():
+        try:
+            return get_converter_pool(backend, 'pipeline-convert').run_stream(
+                doc_queue, convert_one, on_converted, convert_workers)
+        finally:
+            process_queue.producer_done()
+
+    # 阶段2：处理docx（多进程模式下每个工作线程同时只向进程池提交一个文件），PDF已是最新的文件不再导出
+    executor = None
+    if opts.get('use_process_pool'):
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=process_workers, initializer=_pool_worker_init)
+    process_busy = [0.0] * process_workers
+    process_exited = [0]  # 异常退出的处理线程数，全部退出时不再向处理队列放入任务
+
+    def process_one(docx_path):
+        """处理单个docx，返回是否继续导出"""
+        if process_manifest is not None and is_file_up_to_date(process_manifest, docx_path):
+            count('process', 'skipped')
+        else:
+            reporter.file_started(os.path.basename(docx_path))
+            if executor is not None:
+                result = executor.submit(process_file_with_result, docx_path, keep_backup, opts).result()
+            else:
+                result = process_file_with_result(docx_path, keep_backup, opts)
+            if process_manifest is not None:
+                with process_lock:
+                    update_manifest_entry(process_manifest, result)
+            if not result['success']:
+                fail('process', docx_path, result['message'])
+                return False
+            count('process', 'done' if result['changed'] else 'skipped')
+        if not force and is_target_fresh(convert_manifest, 'docx2pdf', docx_path, pdf_for(docx_path)):
+            count('export', 'skipped')
+            reporter.file_done(os.path.basename(docx_path), 'skipped')
+            return False
+        return True
+
+    def process_worker(index):
+        try:
+            for docx_path in process_queue:
+                file_start = time.perf_counter()
+                try:
+                    export = process_one(docx_path)
+                except Exception as e:
+                    # 单个文件异常（如工作进程崩溃）不能让工作线程退出，否则上游会阻塞在已满的队列上
+                    fail('process', docx_path, f"{os.path.basename(docx_path)} - 处理失败：{str(e)}")
+                    export = False
+                process_busy[index] += time.perf_counter() - file_start
+                if export:
+                    forward(export_queue, 'export', docx_path)
+        except Exception:
+            with counts_lock:
+                process_exited[0] += 1
+                last = process_exited[0] == process_workers
+            if last:
+                process_queue.abort()
+            raise
+        finally:
+            export_queue.producer_done()
+
+    # 阶段3：docx→pdf
+    def export_one(converter, docx_path):
+        pdf_path = pdf_for(docx_path)
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        converter.export_pdf(docx_path, pdf_path)
+
+    def on_exported(docx_path, error):
+        filename = os.path.basename(docx_path)
+        if error is not None:
+            forget_conversion(convert_manifest, convert_lock, 'docx2pdf', docx_path)
+            fail('export', docx_path, f"{filename} - 导出PDF失败：{str(error)}")
+            return
+        record_conversion(convert_manifest, convert_lock, 'docx2pdf', docx_path, pdf_for(docx_path))
+        count('export', 'done')
+        reporter.file_done(filename)
+
+    def export_stage():
+        return get_converter_pool(backend, 'pipeline-export').run_stream(
+            export_queue, export_one, on_exported, convert_workers)
+
+    stage_stats = {}
+
+    def run_stage(name, target, *args, inbox=None):
+        """在后台线程中运行一个阶段；异常终止时中止其输入队列inbox，上游不会阻塞在已满的队列上"""
+        def runner():
+            try:
+                stage_stats[name] = target(*args)
+            except Exception as e:
+                batch_errors.append(f"{name}阶段异常终止：{str(e)}")
+                if inbox is not None:
+                    inbox.abort()
+        thread = threading.Thread(target=runner, daemon=True)
+        thread.start()
+        return thread
+
+    threads = [run_stage('convert', convert_stage, inbox=doc_queue)]
+    threads += [run_stage(f'process-{i}', process_worker, i) for i in range(process_workers)]
+    threads.append(run_stage('export', export_stage, inbox=export_queue))
+
+    # 遍历目录：doc进入转换阶段（docx已是最新时直接进入处理阶段），旁边没有同名doc的docx直接进入处理阶段
+    found = 0
+    doc_stems = {}
     try:
-        # 保留备份（若未存在备份）
-        if keep_backup and not os.path.exists(f"{file_path}.bak"):
-            shutil.copy2(file_path, f"{file_path}.bak")
+        for path in file_paths:
+            if path.lower().endswith('.doc'):
+                if not force and is_target_fresh(convert_manifest, 'doc2docx', path, docx_target_path(path)):
+                    count('convert', 'skipped')
+                    forward(process_queue, 'process', docx_target_path(path))
+                else:
+                    forward(doc_queue, 'convert', path)
+            elif has_doc_source(path, doc_stems):
+                continue  # 由同名doc转换而来，随doc计数
+            else:
+                forward(process_queue, 'process', path)
+            found += 1
+    finally:
+        doc_queue.producer_done()
+        process_queue.producer_done()
+        reporter.set_total(found)
+    for thread in threads:
+        thread.join()
+    if executor is not None:
+        executor.shutdown()
+    for name in ('convert', 'export'):
+        batch_errors.extend(stage_stats.get(name, {}).get('callback_errors', []))
+
+    for manifest in filter(None, (convert_manifest, process_manifest)):
+        try:
+            save_manifest(manifest)
+        except OSError as e:
+            batch_errors.append(f"保存记录失败：{str(e)}")
+    return {
+        'folder': root_dir,
+        'backend': backend,
+        'total': found,
+        'stages': counts,
+        'busy': {
+            'convert': stage_stats.get('convert', {}).get('busy', []),
+            'process': process_busy,
+            'export': stage_stats.get('export', {}).get('busy', []),
+        },
+        'batch_errors': batch_errors,
+        'elapsed': time.perf_counter() - start,
+    }
 
-        # 打开文档进行处理
-        doc = Document(file_path)
-
-        # 根据选项执行操作
-        if options['remove_header_footer'].get():
-            remove_header_footer(doc)
-        if options['add_page_number'].get():
-            add_centered_page_number(doc)
-        if options['add_custom_header'].get():
-            add_custom_header(doc)
-
-        if options['replace_patterns'].get():
-            # 处理普通段落
-            for para in doc.paragraphs:
-                replace_patterns_in_paragraph(para)
-            # 处理表格中的段落
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for para in cell.paragraphs:
-                            replace_patterns_in_paragraph(para)
-
-        # 设置题型段落的大纲级别为1级
-        if options['set_question_outline'].get():
-            set_outline_level(doc)
-
-        # 保存修改
-        doc.save(file_path)
-        return True, f"成功：{os.path.basename(file_path)}"
-    except Exception as e:
-        return False, f"失败：{os.path.basename(file_path)} - {str(e)}"
+
+def format_pipeline_summary(summary):
+    """生成流水线各阶段的说明文字"""
+    lines = []
+    for stage, name in PIPELINE_STAGE_NAMES.items():
+        c = summary['stages'][stage]
+        busy = sum(summary['busy'][stage])
+        lines.append(f"{name}：完成 {c['done']}，跳过 {c['skipped']}，失败 {c['failed']}（累计忙碌 {busy:.1f} 秒）")
+    lines.append(f"总耗时：{summary['elapsed']:.1f} 秒")
+    return "\n".join(lines)
 
 
 # ------------------------------
-# 并行处理核心逻辑（原有Word处理）
+# 监视文件夹：持续发现新增/修改的文件并增量处理（可选导出PDF）
 # ------------------------------
-def process_single_file(file_path, keep_backup):
-    """单个文件的处理逻辑（线程池执行单元，线程安全）"""
-    global processed_count, success_count, error_list
-    filename = os.path.basename(file_path)
-    try:
-        # 执行文件处理
-        res, msg = process_word_file(file_path, keep_backup)
-        # 线程安全更新统计数据（用锁避免并发冲突）
-        with progress_lock:
-            processed_count += 1
-            if res:
-                success_count += 1
-            else:
-                error_list.append(msg)
-        # 实时更新UI进度（通过主线程after方法，确保UI安全）
-        root.after(0, lambda: status_var.set(
-            f"并行处理中 ({processed_count}/{total_files})：当前处理 {filename}"
-        ))
-    except Exception as e:
-        # 捕获未知错误
-        with progress_lock:
-            processed_count += 1
-            error_list.append(f"失败：{filename} - 未知错误：{str(e)}")
-        root.after(0, lambda: status_var.set(
-            f"并行处理中 ({processed_count}/{total_files})：{filename} 处理失败"
-        ))
+WATCH_POLL_INTERVAL = 2.0  # 轮询方式两次扫描目录的间隔（秒）
+WATCH_SETTLE_TIME = 2.0  # 文件大小和修改时间保持不变多久（秒）后才认为已写入完成
+WATCH_CHECK_INTERVAL = 0.5  # 有文件等待写入完成时的检查间隔（秒）
+WATCH_RESCAN_INTERVAL = 300  # 使用文件系统通知时，仍定期完整扫描一次（补上可能丢失的通知）
+WATCH_EXTS = ['.docx', '.doc']
+WATCH_POOL_MIN_FILES = 4  # 多进程模式下，一批文件少于此数时在本进程的线程中处理，不动用进程池
 
 
-def finish_process(keep_backup):
-    """所有文件处理完成后，显示结果并恢复UI"""
-    global processed_count, success_count, error_list
-    result = f"并行处理完成！\n成功：{success_count}/{processed_count}\n"
-    if keep_backup:
-        result += "原文件已备份为.bak格式，处理后的文件已替换原文件"
-    else:
-        result += "已直接替换原文件（未保留备份）"
+def word_lock_file_exists(file_path):
+    """Word打开文件时会在同目录创建~$开头的锁文件（长文件名时替换前1~2个字符），存在即说明文件仍在编辑"""
+    folder, name = os.path.split(file_path)
+    return any(os.path.exists(os.path.join(folder, '~$' + name[cut:])) for cut in (0, 1, 2))
 
-    if error_list:
-        result += f"\n\n错误列表（前5条）：\n" + "\n".join(error_list[:5])
-    messagebox.showinfo("并行处理结果", result)
-    # 恢复按钮和状态
-    process_btn.config(state=tk.NORMAL)
-    status_var.set("就绪")
-    # 重置全局进度统计
-    with progress_lock:
-        processed_count = 0
-        success_count = 0
-        error_list = []
 
+def is_file_complete(file_path):
+    """文件已可读取：docx需有完整的zip目录（复制到一半的文件没有），且未被Word打开"""
+    if word_lock_file_exists(file_path):
+        return False
+    if file_path.lower().endswith('.docx'):
+        return zipfile.is_zipfile(file_path)
+    return True
 
-def start_parallel_process():
-    """启动线程池并行处理（子线程中执行，不阻塞UI）"""
-    global total_files
-    folder_path = folder_var.get().replace("已选择：", "")
-    keep_backup = options['keep_backup'].get()
-    word_files = get_all_files_by_ext(folder_path, ['.docx'])
-    total_files = len(word_files)
-
-    # 配置线程池大小：IO密集型任务最优为 CPU核心数*2，最多10个线程避免资源占用过高
-    max_workers = min(10, total_files)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 批量提交任务（每个文件一个任务）
-        executor.map(
-            process_single_file,  # 任务执行函数
-            word_files,  # 第一个参数：文件路径列表
-            [keep_backup] * total_files  # 第二个参数：是否保留备份（每个任务相同）
-        )
 
-    # 所有任务完成后，调用收尾函数
-    root.after(0, lambda: finish_process(keep_backup))
+class FolderWatcher:
+    """
+    发现文件夹中新增或修改的文件：有watchdog时使用系统文件通知（Linux为inotify，Windows为ReadDirectoryChangesW），
+    否则定期扫描目录（scandir直接给出大小和修改时间，不逐个打开文件）；
+    文件需在settle_time内大小和修改时间都不变、且内容完整时才交出，避免处理写了一半的文件
+    :param folder_path: 监视的文件夹
+    :param scan_args: 传给scan_file_stats的 (include, exclude, max_depth, follow_symlinks)
+    """
 
+    def __init__(self, folder_path, exts=None, scan_args=(None, None, None, False), settle_time=WATCH_SETTLE_TIME,
+                 poll_interval=WATCH_POLL_INTERVAL):
+        self.folder_path = folder_path
+        self.exts = tuple(ext.lower() for ext in (exts or WATCH_EXTS))
+        self.include, self.exclude, self.max_depth, self.follow_symlinks = scan_args
+        self.settle_time = settle_time
+        self.poll_interval = poll_interval
+        self.mode = 'poll'
+        self.known = {}  # 文件路径 → 最近一次处理（或开始监视）时的 (大小, 修改时间)
+        self._pending = {}  # 文件路径 → ((大小, 修改时间), 开始保持不变的时刻)
+        self._events = set()  # 文件通知报告的路径（None表示需要完整扫描）
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._observer = None
+        self._last_scan = 0.0
 
-def process_word_files_action():
-    """处理Word文件的入口函数（启动子线程，避免阻塞UI）"""
-    global processed_count, success_count, error_list
-    # 重置全局进度统计
-    with progress_lock:
-        processed_count = 0
-        success_count = 0
-        error_list = []
+    def _matches(self, path):
+        name = os.path.basename(path)
+        if name.startswith('~$') or not name.lower().endswith(self.exts):
+            return False
+        rel_path = os.path.relpath(path, self.folder_path)
+        if rel_path.startswith('..'):
+            return False
+        if self.max_depth is not None and rel_path.count(os.sep) > self.max_depth:
+            return False
+        if self.include and not match_globs(path, self.folder_path, self.include):
+            return False
+        return not (self.exclude and match_globs(path, self.folder_path, self.exclude))
 
-    folder_path = folder_var.get().replace("已选择：", "")
-    if not folder_path or folder_path == "等待选择文件夹...":
-        messagebox.showwarning("警告", "请先选择文件夹")
-        return
+    def _scan(self):
+        self._last_scan = time.perf_counter()
+        return {path: (st.st_size, st.st_mtime_ns)
+                for path, st in scan_file_stats(self.folder_path, self.exts, self.include, self.exclude,
+                                                self.max_depth, self.follow_symlinks)}
 
-    # 检查是否选择了至少一个处理选项
-    if not any([
-        options['remove_header_footer'].get(),
-        options['add_custom_header'].get(),
-        options['add_page_number'].get(),
-        options['replace_patterns'].get(),
-        options['set_question_outline'].get()
-    ]):
-        if not messagebox.askyesno("提示", "未选择任何处理选项，是否继续？"):
-            return
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
 
-    word_files = get_all_files_by_ext(folder_path, ['.docx'])
-    total = len(word_files)
-    if total == 0:
-        messagebox.showinfo("提示", "未找到任何.docx文件")
-        return
+    def start(self, include_existing=False):
+        """
+        记录当前文件状态并开始监视
+        :param include_existing: 已有文件也作为待处理文件交出（否则只处理开始监视后新增/修改的文件）
+        """
+        current = self._scan()
+        if include_existing:
+            now = time.perf_counter()
+            self._pending = {path: (state, now - self.settle_time) for path, state in current.items()}
+        else:
+            self.known = current
+        try:
+            from watchdog.events import FileSystemEventHandler  # 可选依赖：系统文件通知
+            from watchdog.observers import Observer
+        except ImportError:
+            return self
+        watcher = self
 
-    # 禁用按钮+更新状态
-    process_btn.config(state=tk.DISABLED)
-    status_var.set(f"准备并行处理 {total} 个文件...")
-    root.update_idletasks()
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    watcher._notify(None)  # 目录被移入/改名时其中的文件不一定逐个通知，改为完整扫描
+                    return
+                for path in (event.src_path, getattr(event, 'dest_path', None)):
+                    if path and watcher._matches(os.fsdecode(path)):
+                        watcher._notify(os.fsdecode(path))
 
-    # 启动子线程执行并行处理（守护线程，避免程序退出残留）
-    thread = threading.Thread(target=start_parallel_process, daemon=True)
-    thread.start()
+        try:
+            observer = Observer()
+            observer.schedule(Handler(), self.folder_path, recursive=True)
+            observer.start()
+        except Exception:
+            return self  # 无法使用系统通知（如网络共享不支持）时退回轮询
+        self._observer = observer
+        self.mode = 'notify'
+        return self
 
+    def _notify(self, path):
+        with self._lock:
+            self._events.add(path)
+        self._wakeup.set()
 
-# ------------------------------
-# 辅助功能区：格式转换功能（并行优化版）
-# ------------------------------
-def split_tasks(file_list, thread_count):
-    """均分任务到线程（新增函数）"""
-    batch_size = (len(file_list) + thread_count - 1) // thread_count  # 向上取整
-    return [file_list[i * batch_size: min((i + 1) * batch_size, len(file_list))] for i in range(thread_count)]
+    def stop(self):
+        self._wakeup.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def wait(self, stop_event):
+        """
+        等待到有文件写入完成（或stop_event被设置），返回这批文件路径（stop时返回空列表）
+        """
+        while not stop_event.is_set():
+            timeout = WATCH_CHECK_INTERVAL if self._pending else (
+                WATCH_RESCAN_INTERVAL if self.mode == 'notify' else self.poll_interval)
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            ready = self._collect()
+            if ready:
+                return ready
+        return []
+
+    def _collect(self):
+        """更新待处理文件的状态，返回已稳定且完整的文件"""
+        with self._lock:
+            events, self._events = self._events, set()
+        full_scan = (self.mode == 'poll' and time.perf_counter() - self._last_scan >= self.poll_interval) or \
+            None in events or time.perf_counter() - self._last_scan >= WATCH_RESCAN_INTERVAL
+        if full_scan:
+            current = self._scan()
+            for path in list(self.known):
+                if path not in current:
+                    del self.known[path]  # 已删除（或被移走）的文件
+        else:
+            current = {path: self._stat(path) for path in events}
+        for path in self._pending:
+            if path not in current:
+                current[path] = self._stat(path)
+
+        now = time.perf_counter()
+        ready = []
+        for path, state in current.items():
+            if state is None:
+                self._pending.pop(path, None)
+                self.known.pop(path, None)
+                continue
+            if self.known.get(path) == state:
+                self._pending.pop(path, None)  # 未变化（或只是本程序处理后写回）
+                continue
+            previous = self._pending.get(path)
+            if previous is None or previous[0] != state:
+                self._pending[path] = (state, now)  # 新出现或仍在变化，重新开始计时
+            elif now - previous[1] >= self.settle_time and is_file_complete(path):
+                del self._pending[path]
+                ready.append(path)
+        return ready
+
+    def mark_handled(self, paths):
+        """记录文件处理后的状态（处理写回引起的修改不会再次触发）"""
+        for path in paths:
+            state = self._stat(path)
+            if state is None:
+                self.known.pop(path, None)
+            else:
+                self.known[path] = state
+
+
+def process_watch_batch(folder_path, ready, opts, backend=None, export_pdf=False, executor=None):
+    """
+    处理监视到的一批文件：doc先转换为docx，再处理docx，可选导出PDF
+    已处理过的文件由FolderWatcher记录的状态过滤，这里不写批处理日志
+    :param executor: 多进程模式下整个监视期间复用的进程池（可选）
+    :return: (汇总字典, 涉及的全部文件路径)
+    """
+    start = time.perf_counter()
+    docs = [path for path in ready if path.lower().endswith('.doc')]
+    docx_files = [path for path in ready if not path.lower().endswith('.doc')]
+    errors = []
+
+    def convert(run, *args):
+        """执行一次转换，返回成功数（进度汇总器只用于收集结果和错误，不显示）"""
+        reporter = ProgressReporter(lambda snapshot: None).start()
+        try:
+            run(*args, reporter, backend, dedupe=bool(opts.get('dedupe')))
+        finally:
+            progress = reporter.close()
+        errors.extend(progress['errors'])
+        return progress['succeeded']
+
+    converted = 0
+    if docs:
+        converted = convert(convert_doc_files, docs, folder_path, opts.get('keep_source_doc'))
+        docx_files += [docx_target_path(path) for path in docs
+                       if os.path.exists(docx_target_path(path)) and docx_target_path(path) not in docx_files]
+    summary = None
+    if docx_files:
+        summary = run_process_batch(folder_path, docx_files, opts, executor=executor, journal=False)
+    exported = 0
+    if summary is not None:
+        errors.extend(summary['errors'] + summary['batch_errors'])
+        succeeded = [r['path'] for r in summary['results'] if r['success']]
+        if export_pdf and succeeded:
+            exported = convert(convert_docx_files, succeeded, folder_path, opts.get('docx2pdf_separate_folder'))
+    batch = {
+        'files': ready,
+        'converted': converted,
+        'processed': summary['processed'] if summary else 0,
+        'succeeded': summary['succeeded'] if summary else 0,
+        'exported': exported,
+        'errors': errors,
+        'elapsed': time.perf_counter() - start,
+    }
+    return batch, docs + docx_files
+
+
+def run_watch(folder_path, opts, stop_event, on_batch=None, backend=None, export_pdf=False, scan_args=None,
+              include_existing=False, poll_interval=WATCH_POLL_INTERVAL, settle_time=WATCH_SETTLE_TIME):
+    """
+    持续监视文件夹，新增或修改的.docx/.doc写入完成后立即处理（可选导出PDF），直到stop_event被设置
+    :param on_batch: 每批处理完成后的回调，参数为批次汇总字典
+    :param backend: 转换后端名称（有doc文件或需要导出PDF时使用）
+    :param include_existing: 开始时先处理已有文件（增量缓存会跳过已处理过的）
+    :return: 监视方式（notify/poll）
+    """
+    watcher = FolderWatcher(os.path.normpath(folder_path), WATCH_EXTS, scan_args or (None, None, None, False),
+                            settle_time, poll_interval).start(include_existing)
+    backend = backend or default_converter_backend()
+    executor = None  # 多进程模式的进程池：第一批足够大的文件出现时启动，整个监视期间复用
+
+    def new_executor():
+        max_workers = max(1, opts.get('process_workers') or os.cpu_count() or 1)
+        return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=_pool_worker_init)
 
+    try:
+        while not stop_event.is_set():
+            ready = watcher.wait(stop_event)
+            if not ready:
+                continue
+            batch_opts = opts
+            if opts.get('use_process_pool') and len(ready) < WATCH_POOL_MIN_FILES:
+                batch_opts = dict(opts, use_process_pool=False)  # 零星文件用线程处理，省去进程间传递
+            elif opts.get('use_process_pool') and executor is None:
+                executor = new_executor()
+            try:
+                batch, touched = process_watch_batch(watcher.folder_path, ready, batch_opts, backend, export_pdf,
+                                                     executor)
+            except concurrent.futures.BrokenExecutor:
+                if executor is None:
+                    raise
+                # 工作进程崩溃后进程池不可再用，换一个新的进程池重做这一批（已处理的文件再处理时不会改动）
+                executor.shutdown(wait=False)
+                executor = new_executor()
+                batch, touched = process_watch_batch(watcher.folder_path, ready, batch_opts, backend, export_pdf,
+                                                     executor)
+            watcher.mark_handled(touched)
+            batch['mode'] = watcher.mode
+            if on_batch:
+                on_batch(batch)
+    finally:
+        watcher.stop()
+        if executor is not None:
+            executor.shutdown()
+    return watcher.mode
+
+
+def format_watch_batch(batch):
+    """生成单批监视处理结果的说明文字"""
+    text = (f"{time.strftime('%H:%M:%S')} 处理 {batch['succeeded']}/{batch['processed']} 个文件"
+            f"（转换DOC {batch['converted']} 个，导出PDF {batch['exported']} 个，耗时 {batch['elapsed']:.1f} 秒）")
+    names = "、".join(os.path.basename(path) for path in batch['files'][:3])
+    return f"{text}：{names}{' 等' if len(batch['files']) > 3 else ''}"
 
-def show_convert_result(convert_type, total, extra_params):
-    """显示转换结果（新增函数，适配并行统计）"""
-    global processed_count, success_count, error_list
-    result_msg = f"{convert_type} 并行处理完成！\n总文件：{total}\n成功转换：{success_count}\n"
 
-    # 统计跳过数（排除真正的错误）
-    skipped_count = len([e for e in error_list if "跳过" in e])
-    result_msg += f"跳过（已存在/无需处理）：{skipped_count}\n"
+def show_convert_result(convert_type, total, extra_params, progress, schedule_stats):
+    """显示转换结果（progress为ProgressReporter.close返回的最终统计，schedule_stats为调度统计）"""
+    result_msg = f"{convert_type} 并行处理完成！\n总文件：{total}\n成功转换：{progress['succeeded']}\n"
+    result_msg += f"跳过（目标已是最新）：{progress['skipped']}\n"
+    result_msg += format_schedule_summary(schedule_stats) + "\n"
+    if schedule_stats.get('deduplicated'):
+        result_msg += f"内容重复的副本：{schedule_stats['deduplicated']} 个（未重复转换，直接复制结果）\n"
 
     # 根据转换类型补充信息
     if convert_type == "DOC→DOCX":
@@ -461,8 +4219,8 @@ def show_convert_result(convert_type, total, extra_params):
         result_msg += f"PDF保存位置：{save_path}\n"
 
     # 追加错误信息
-    if error_list:
-        result_msg += "\n错误详情（前5条）：\n" + "\n".join(error_list[:5])
+    if progress['errors']:
+        result_msg += "\n错误详情（前5条）：\n" + "\n".join(progress['errors'][:5])
     root.after(0, lambda: messagebox.showinfo(f"{convert_type} 结果", result_msg))
 
     # 恢复UI状态
@@ -473,178 +4231,92 @@ def show_convert_result(convert_type, total, extra_params):
         root.after(0, lambda: convert_pdf_btn.config(state=tk.NORMAL))
 
 
-def parallel_convert_doc_to_docx(root_dir, keep_source, status_var):
-    """并行批量将doc文件转换为docx文件"""
-    global processed_count, success_count, error_list
-    # 重置统计变量（线程安全）
-    with progress_lock:
-        processed_count = 0
-        success_count = 0
-        error_list = []
-
+def parallel_convert_doc_to_docx(root_dir, keep_source, status_var, force=False, dedupe=False):
+    """并行批量将doc文件转换为docx文件（force为真时不跳过已是最新的目标）"""
     root_dir = os.path.normpath(root_dir)
     # 1. 收集所有待转换的doc文件（排除docx、临时文件）
-    doc_files = []
-    for foldername, _, filenames in os.walk(root_dir):
-        for filename in filenames:
-            lower_name = filename.lower()
-            if lower_name.endswith(".doc") and not lower_name.endswith(".docx") and not filename.startswith("~$"):
-                doc_files.append(os.path.join(foldername, filename))
+    doc_files = FileListing(root_dir, ['.doc'])
     total = len(doc_files)
     if total == 0:
         root.after(0,
                    lambda: [messagebox.showinfo("提示", "未找到任何.doc文件"), convert_doc_btn.config(state=tk.NORMAL)])
         return
 
-    # 2. 配置线程数（最多5个，避免Word进程过多）
-    cpu_count = os.cpu_count() or 2
-    max_threads = min(5, cpu_count * 1, total)
-    task_queues = split_tasks(doc_files, max_threads)  # 均分任务
-
-    # 3. 单个线程的工作逻辑（每个线程独占一个Word实例）
-    def worker(task_queue):
-        nonlocal keep_source
-        # 线程内创建独立的Word进程
-        word = win32com.client.Dispatch("Word.Application")
-        word.Visible = False
-        word.DisplayAlerts = 0
-
-        try:
-            for doc_path in task_queue:
-                filename = os.path.basename(doc_path)
-                # 异步更新UI进度
-                root.after(0, lambda f=filename: status_var.set(
-                    f"并行转换DOC→DOCX（{processed_count + 1}/{total}）：{f}"
-                ))
-
-                # 构建目标docx路径
-                docx_name = f"{os.path.splitext(filename)[0]}.docx"
-                docx_path = os.path.join(os.path.dirname(doc_path), docx_name)
-
-                success_flag = False
-                error_msg = ""
-                # 无论目标文件是否存在，都执行转换（已存在则覆盖）
-                try:
-                    doc = word.Documents.Open(os.path.abspath(doc_path))
-                    doc.SaveAs2(os.path.abspath(docx_path), FileFormat=12)  # 12=docx格式，已存在自动覆盖
-                    doc.Close()
-                    success_flag = True
-                    error_msg = "转换成功（已覆盖现有文件）"
-                except Exception as e:
-                    error_msg = f"转换失败：{str(e).split(',')[0]}"
-
-                # 线程安全更新统计数据
-                with progress_lock:
-                    global processed_count, success_count, error_list
-                    processed_count += 1
-                    if success_flag:
-                        success_count += 1
-                    if error_msg:
-                        error_list.append(f"{filename} - {error_msg}")
-
-                # 不需要保留源文件则删除
-                if success_flag and not keep_source:
-                    try:
-                        if os.path.exists(doc_path):
-                            os.remove(doc_path)
-                    except Exception as e:
-                        with progress_lock:
-                            error_list.append(f"{filename} - 删除源文件失败：{str(e)}")
-        finally:
-            # 必须关闭Word进程，释放资源
-            word.Quit()
-
-    # 4. 启动线程池执行任务
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
-        executor.map(worker, task_queues)
+    # 2. 由长期存在的转换实例池执行（共享队列，大文件优先；实例跨批次复用）
+    reporter = ProgressReporter(gui_progress_display("并行转换DOC→DOCX"), total).start()
+    schedule_stats = convert_doc_files(doc_files, root_dir, keep_source, reporter, force=force, dedupe=dedupe)
+    progress = reporter.close()
 
-    # 5. 任务完成后显示结果
-    root.after(0, lambda: show_convert_result("DOC→DOCX", total, keep_source))
+    # 3. 任务完成后显示结果
+    root.after(0, lambda: show_convert_result("DOC→DOCX", total, keep_source, progress, schedule_stats))
 
 
-def parallel_convert_docx_to_pdf(root_dir, use_separate_folder, status_var):
+def parallel_convert_docx_to_pdf(root_dir, use_separate_folder, status_var, force=False, dedupe=False):
     """并行批量将docx文件转换为pdf文件（替换原 batch_convert_docx_to_pdf 函数）"""
-    global processed_count, success_count, error_list
-    # 重置统计变量（线程安全）
-    with progress_lock:
-        processed_count = 0
-        success_count = 0
-        error_list = []
-
     root_dir = os.path.normpath(root_dir)
     # 1. 收集所有待转换的docx文件（排除临时文件）
-    docx_files = get_all_files_by_ext(root_dir, ['.docx'])
+    docx_files = FileListing(root_dir, ['.docx'])
     total = len(docx_files)
     if total == 0:
         root.after(0, lambda: [messagebox.showinfo("提示", "未找到任何.docx文件"),
                                convert_pdf_btn.config(state=tk.NORMAL)])
         return
 
-    # 2. 配置线程数（最多5个，避免Word进程过多）
-    cpu_count = os.cpu_count() or 2
-    max_threads = min(5, cpu_count * 1, total)
-    task_queues = split_tasks(docx_files, max_threads)  # 均分任务
-
-    # 3. 单个线程的工作逻辑（每个线程独占一个Word实例）
-    def worker(task_queue):
-        nonlocal use_separate_folder
-        # 线程内创建独立的Word进程
-        word = win32com.client.Dispatch("Word.Application")
-        word.Visible = False
-        word.DisplayAlerts = 0
-
-        try:
-            for docx_path in task_queue:
-                filename = os.path.basename(docx_path)
-                # 异步更新UI进度
-                root.after(0, lambda f=filename: status_var.set(
-                    f"并行转换DOCX→PDF（{processed_count + 1}/{total}）：{f}"
-                ))
-
-                # 构建目标PDF路径
-                if use_separate_folder:
-                    relative_path = os.path.relpath(docx_path, root_dir)
-                    pdf_path = os.path.join(root_dir, "docx2pdf", f"{os.path.splitext(relative_path)[0]}.pdf")
-                    os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
-                else:
-                    pdf_path = f"{os.path.splitext(docx_path)[0]}.pdf"
+    # 2. 由长期存在的转换实例池执行（共享队列，大文件优先；实例跨批次复用）
+    reporter = ProgressReporter(gui_progress_display("并行转换DOCX→PDF"), total).start()
+    schedule_stats = convert_docx_files(docx_files, root_dir, use_separate_folder, reporter, force=force,
+                                        dedupe=dedupe)
+    progress = reporter.close()
+
+    # 3. 任务完成后显示结果
+    root.after(0, lambda: show_convert_result("DOCX→PDF", total, use_separate_folder, progress, schedule_stats))
+
+
+def pipeline_convert_process_export(root_dir, opts):
+    """流水线：DOC→DOCX、处理、导出PDF（每个文件完成上一步后立即进入下一步）"""
+    reporter = ProgressReporter(gui_progress_display("流水线")).start()
+    try:
+        summary = run_pipeline(root_dir, opts, reporter, force=opts['force_convert'])
+    except Exception as e:
+        summary = None
+        reporter.add_error(f"流水线异常终止：{str(e)}")
+    progress = reporter.close()
+
+    if summary is None:
+        result_msg = "\n".join(progress['errors'])
+    elif not summary['total']:
+        result_msg = "未找到任何.doc/.docx文件"
+    else:
+        result_msg = (f"流水线完成！\n总文件：{summary['total']}\n导出PDF：{progress['succeeded']}\n"
+                      f"跳过（已是最新）：{progress['skipped']}\n失败：{progress['failed']}\n")
+        result_msg += format_pipeline_summary(summary) + "\n"
+        errors = progress['errors'] + summary['batch_errors']
+        if errors:
+            result_msg += "\n错误详情（前5条）：\n" + "\n".join(errors[:5])
+    root.after(0, lambda: messagebox.showinfo("流水线结果", result_msg))
+    root.after(0, lambda: status_var.set("就绪"))
+    root.after(0, lambda: pipeline_btn.config(state=tk.NORMAL))
 
-                success_flag = False
-                error_msg = ""
-                # 无论目标文件是否存在，都执行转换（已存在则覆盖）
-                try:
-                    doc = word.Documents.Open(os.path.abspath(docx_path), ReadOnly=True)
-                    doc.ExportAsFixedFormat(
-                        OutputFileName=os.path.abspath(pdf_path),
-                        ExportFormat=17,  # 17=PDF格式
-                        IncludeDocProps=True,
-                        CreateBookmarks=1,  # 保留大纲书签
-                        DocStructureTags=True
-                    )
-                    doc.Close(SaveChanges=0)
-                    success_flag = True
-                    error_msg = "转换成功（已覆盖现有文件）"
-                except Exception as e:
-                    error_msg = f"转换失败：{str(e)}"
-
-                # 线程安全更新统计数据
-                with progress_lock:
-                    global processed_count, success_count, error_list
-                    processed_count += 1
-                    if success_flag:
-                        success_count += 1
-                    if error_msg:
-                        error_list.append(f"{filename} - {error_msg}")
-        finally:
-            # 必须关闭Word进程，释放资源
-            word.Quit()
 
-    # 4. 启动线程池执行任务
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
-        executor.map(worker, task_queues)
+def watch_folder(folder_path, opts, stop_event):
+    """监视文件夹（子线程中执行），每批处理完成后更新状态栏"""
+    totals = {'files': 0, 'errors': []}
 
-    # 5. 任务完成后显示结果
-    root.after(0, lambda: show_convert_result("DOCX→PDF", total, use_separate_folder))
+    def on_batch(batch):
+        totals['files'] += len(batch['files'])
+        totals['errors'].extend(batch['errors'])
+        text = f"监视中（已处理 {totals['files']} 个文件，失败 {len(totals['errors'])} 条）：{format_watch_batch(batch)}"
+        root.after(0, status_var.set, text)
+
+    try:
+        mode = run_watch(folder_path, opts, stop_event, on_batch, export_pdf=opts['watch_export_pdf'])
+        message = f"已停止监视（{'系统文件通知' if mode == 'notify' else '定期扫描'}），共处理 {totals['files']} 个文件"
+    except Exception as e:
+        message = f"监视异常终止：{str(e)}"
+    if totals['errors']:
+        message += "\n\n错误详情（前5条）：\n" + "\n".join(totals['errors'][:5])
+    root.after(0, lambda: [messagebox.showinfo("监视文件夹", message), status_var.set("就绪"),
+                           watch_btn.config(text="开始监视文件夹", state=tk.NORMAL)])
 
 
 # ------------------------------
@@ -662,7 +4334,8 @@ def convert_doc_action():
     # 启动子线程执行并行转换（守护线程，避免程序退出残留）
     threading.Thread(
         target=parallel_convert_doc_to_docx,
-        args=(folder, options['keep_source_doc'].get(), status_var),
+        args=(folder, options['keep_source_doc'].get(), status_var, options['force_convert'].get(),
+              options['dedupe'].get()),
         daemon=True
     ).start()
 
@@ -679,16 +4352,58 @@ def convert_pdf_action():
     # 启动子线程执行并行转换（守护线程，避免程序退出残留）
     threading.Thread(
         target=parallel_convert_docx_to_pdf,
-        args=(folder, options['docx2pdf_separate_folder'].get(), status_var),
+        args=(folder, options['docx2pdf_separate_folder'].get(), status_var, options['force_convert'].get(),
+              options['dedupe'].get()),
         daemon=True
     ).start()
 
 
+def pipeline_action():
+    """触发流水线功能（使用主功能区的处理选项和转换区的转换选项）"""
+    folder = folder_var.get().replace("已选择：", "")
+    if not folder or folder == "等待选择文件夹...":
+        messagebox.showwarning("警告", "请先选择文件夹")
+        return
+    opts = snapshot_options()
+    pipeline_btn.config(state=tk.DISABLED)
+    status_var.set("准备流水线处理...")
+    threading.Thread(target=pipeline_convert_process_export, args=(folder, opts), daemon=True).start()
+
+
+def watch_action():
+    """开始/停止监视文件夹（新增或修改的文件写入完成后自动处理）"""
+    global watch_stop_event
+    if watch_stop_event is not None and not watch_stop_event.is_set():
+        watch_stop_event.set()
+        watch_btn.config(state=tk.DISABLED)
+        status_var.set("正在停止监视...")
+        return
+    folder = folder_var.get().replace("已选择：", "")
+    if not folder or folder == "等待选择文件夹...":
+        messagebox.showwarning("警告", "请先选择文件夹")
+        return
+    watch_stop_event = threading.Event()
+    watch_btn.config(text="停止监视文件夹")
+    status_var.set("监视中：等待新增或修改的文件...")
+    threading.Thread(target=watch_folder, args=(folder, snapshot_options(), watch_stop_event), daemon=True).start()
+
+
 # ------------------------------
 # 主界面
 # ------------------------------
+# 启动耗时测量（benchmark.py --startup）：设置该环境变量为文件路径时，窗口首次显示后写入时间戳并退出
+STARTUP_PROBE_ENV = 'WORDPROCESS_STARTUP_PROBE'
+
+
+def report_first_window(probe_path):
+    """界面空闲（窗口已完成首次绘制）时写出当前时间戳并关闭窗口"""
+    with open(probe_path, 'w', encoding='utf-8') as f:
+        f.write(repr(time.time()))
+    root.destroy()
+
+
 def main():
-    global options, root, process_btn, status_var, folder_var, convert_doc_btn, convert_pdf_btn
+    global options, root, process_btn, status_var, folder_var, convert_doc_btn, convert_pdf_btn, pipeline_btn, watch_btn
     root = tk.Tk()
     root.title("Word文件处理工具（全功能并行版）")
     root.geometry("700x800")
@@ -696,17 +4411,10 @@ def main():
 
     # 变量定义
     folder_var = tk.StringVar(value="等待选择文件夹...")
+    # 根据默认选项创建界面变量（整数选项用IntVar，其余用BooleanVar）
     options = {
-        # 主功能选项
-        'remove_header_footer': tk.BooleanVar(value=True),
-        'add_custom_header': tk.BooleanVar(value=True),
-        'add_page_number': tk.BooleanVar(value=True),
-        'replace_patterns': tk.BooleanVar(value=True),
-        'set_question_outline': tk.BooleanVar(value=True),
-        'keep_backup': tk.BooleanVar(value=False),
-        # 辅助功能选项
-        'keep_source_doc': tk.BooleanVar(value=False),
-        'docx2pdf_separate_folder': tk.BooleanVar(value=False)
+        key: tk.IntVar(value=value) if type(value) is int else tk.BooleanVar(value=value)
+        for key, value in DEFAULT_OPTIONS.items()
     }
     status_var = tk.StringVar(value="就绪")
 
@@ -769,7 +4477,69 @@ def main():
         main_frame,
         text="保留原文件为.bak备份（不勾选则直接替换源文件）",
         variable=options['keep_backup']
-    ).pack(anchor=tk.W, pady=(0, 15))
+    ).pack(anchor=tk.W, pady=(0, 5))
+
+    compress_frame = ttk.Frame(main_frame)
+    compress_frame.pack(anchor=tk.W, pady=(0, 5))
+    ttk.Label(compress_frame, text="压缩级别（0~9）：").pack(side=tk.LEFT)
+    ttk.Spinbox(compress_frame, from_=0, to=9, width=3, textvariable=options['compress_level']).pack(side=tk.LEFT)
+    ttk.Checkbutton(
+        compress_frame,
+        text="未修改的部件直接复制（不重新压缩）",
+        variable=options['reuse_unmodified_parts']
+    ).pack(side=tk.LEFT, padx=(10, 0))
+
+    ttk.Checkbutton(
+        main_frame,
+        text="跳过已用相同选项处理过且未修改的文件（增量缓存）",
+        variable=options['use_cache']
+    ).pack(anchor=tk.W, pady=(0, 5))
+    ttk.Checkbutton(
+        main_frame,
+        text="从上次中断处继续（跳过批处理日志中已成功的文件）",
+        variable=options['resume_batch']
+    ).pack(anchor=tk.W, pady=(0, 5))
+    ttk.Checkbutton(
+        main_frame,
+        text="内容相同的文件只处理/转换一次（结果复制到其余副本）",
+        variable=options['dedupe']
+    ).pack(anchor=tk.W, pady=(0, 5))
+
+    ttk.Checkbutton(
+        main_frame,
+        text="记录各阶段耗时（完成后导出到所选文件夹）",
+        variable=options['instrument']
+    ).pack(anchor=tk.W, pady=(0, 5))
+
+    # 执行方式选项
+    ttk.Checkbutton(
+        main_frame,
+        text="流式XML引擎（仅替换文本/设置大纲时生效，大文档内存占用更低）",
+        variable=options['streaming_engine']
+    ).pack(anchor=tk.W, pady=(0, 5))
+    pool_frame = ttk.Frame(main_frame)
+    pool_frame.pack(anchor=tk.W, pady=(0, 15))
+    ttk.Checkbutton(
+        pool_frame,
+        text="多进程模式（充分利用多核CPU），进程数：",
+        variable=options['use_process_pool']
+    ).pack(side=tk.LEFT)
+    ttk.Spinbox(
+        pool_frame,
+        from_=1,
+        to=max(1, (os.cpu_count() or 1) * 2),
+        width=5,
+        textvariable=options['process_workers']
+    ).pack(side=tk.LEFT)
+    ttk.Label(pool_frame, text="  内存预算（MB，0为自动）：").pack(side=tk.LEFT)
+    ttk.Spinbox(
+        pool_frame,
+        from_=0,
+        to=1024 * 1024,
+        increment=256,
+        width=7,
+        textvariable=options['memory_budget_mb']
+    ).pack(side=tk.LEFT)
 
     # 状态显示区
     ttk.Label(main_frame, textvariable=status_var, wraplength=650).pack(anchor=tk.W, pady=(0, 10))
@@ -784,6 +4554,11 @@ def main():
     ttk.Separator(main_frame, orient="horizontal").pack(fill=tk.X, pady=10)
     ttk.Label(main_frame, text="【辅助功能区：格式转换（并行版）】", font=("Arial", 11, "bold")).pack(anchor=tk.W,
                                                                                                  pady=(0, 10))
+    ttk.Checkbutton(
+        main_frame,
+        text="强制重新转换（不勾选则跳过已是最新的目标文件）",
+        variable=options['force_convert']
+    ).pack(anchor=tk.W, pady=(0, 5))
 
     # DOC转DOCX
     ttk.Label(main_frame, text="DOC转DOCX选项:", font=("Arial", 10, "bold")).pack(anchor=tk.W, pady=(0, 5))
@@ -807,11 +4582,459 @@ def main():
     convert_pdf_btn = ttk.Button(main_frame, text="并行批量转换DOCX→PDF", command=convert_pdf_action)
     convert_pdf_btn.pack(pady=(0, 10))
 
+    # 流水线：每个文件依次完成转换、处理和导出，不等待整批完成
+    pipeline_btn = ttk.Button(main_frame, text="流水线：DOC→DOCX→处理→PDF", command=pipeline_action)
+    pipeline_btn.pack(pady=(0, 10))
+
+    # 监视文件夹：新放入或修改的文件自动处理，不需要每次重新处理整个文件夹
+    watch_frame = ttk.Frame(main_frame)
+    watch_frame.pack(pady=(0, 10))
+    watch_btn = ttk.Button(watch_frame, text="开始监视文件夹", command=watch_action)
+    watch_btn.pack(side=tk.LEFT)
+    ttk.Checkbutton(
+        watch_frame,
+        text="处理后同时导出PDF",
+        variable=options['watch_export_pdf']
+    ).pack(side=tk.LEFT, padx=(10, 0))
+
     # 退出按钮
-    ttk.Button(main_frame, text="退出", command=lambda: [root.destroy(), os._exit(0)]).pack(pady=15)
+    ttk.Button(main_frame, text="退出",
+               command=lambda: [root.destroy(), shutdown_converter_pools(), os._exit(0)]).pack(pady=15)
 
+    # 窗口显示后再在后台加载python-docx：用户选择文件夹期间即可完成，不拖慢窗口出现
+    root.after_idle(lambda: threading.Thread(target=load_docx, daemon=True).start())
+    probe_path = os.environ.get(STARTUP_PROBE_ENV)
+    if probe_path:
+        root.after_idle(report_first_window, probe_path)
     root.mainloop()
+    # 关闭窗口后结束后台转换实例（Word/LibreOffice进程）
+    shutdown_converter_pools()
+
+
+# ------------------------------
+# 命令行入口（无界面批处理，可用于计划任务/服务器）
+# ------------------------------
+def add_discovery_arguments(parser):
+    """文件查找相关参数（各子命令共用）"""
+    parser.add_argument('--include', action='append', metavar='GLOB', help='只处理匹配的文件（可多次指定）')
+    parser.add_argument('--exclude', action='append', metavar='GLOB', help='排除匹配的文件（可多次指定）')
+    parser.add_argument('--max-depth', type=int, metavar='N', help='最多查找N层子文件夹（0表示只查找所选文件夹）')
+    parser.add_argument('--follow-symlinks', action='store_true', help='进入符号链接/联接指向的文件夹')
+
+
+def listing_from_args(args, folder_path, exts):
+    """按命令行参数创建本次运行的文件清单"""
+    return FileListing(folder_path, exts, args.include, args.exclude, args.max_depth, args.follow_symlinks)
+
+
+def add_process_option_arguments(parser):
+    """处理选项相关参数（process和pipeline子命令共用）"""
+    import argparse
+    flag = argparse.BooleanOptionalAction
+    parser.add_argument('--remove-header-footer', action=flag, default=DEFAULT_OPTIONS['remove_header_footer'],
+                        help='删除页眉页脚')
+    parser.add_argument('--add-custom-header', action=flag, default=DEFAULT_OPTIONS['add_custom_header'],
+                        help='添加自定义页眉')
+    parser.add_argument('--add-page-number', action=flag, default=DEFAULT_OPTIONS['add_page_number'],
+                        help='添加居中页码（第X页/共Y页）')
+    parser.add_argument('--replace-patterns', action=flag, default=DEFAULT_OPTIONS['replace_patterns'],
+                        help='替换指定文本模式（中英文括号/中括号）')
+    parser.add_argument('--set-question-outline', action=flag, default=DEFAULT_OPTIONS['set_question_outline'],
+                        help='按大纲规则设置题型、章节等段落的大纲级别')
+    parser.add_argument('--outline-rules', metavar='PATH', help='额外大纲规则配置文件（JSON）')
+    parser.add_argument('--section-templates', metavar='PATH', help='页眉页脚模板配置文件（JSON）')
+    parser.add_argument('--keep-backup', action=flag, default=DEFAULT_OPTIONS['keep_backup'],
+                        help='保留原文件为.bak备份')
+    parser.add_argument('--compress-level', type=int, choices=range(10), metavar='0-9',
+                        default=DEFAULT_OPTIONS['compress_level'], help='保存时的zip压缩级别（默认6，0为不压缩）')
+    parser.add_argument('--reuse-parts', action=flag, default=DEFAULT_OPTIONS['reuse_unmodified_parts'],
+                        help='未修改的部件直接复制原压缩数据，不重新压缩')
+    parser.add_argument('--cache', action=flag, default=DEFAULT_OPTIONS['use_cache'],
+                        help='跳过已用相同选项处理过且未修改的文件（增量缓存）')
+    parser.add_argument('--streaming', action=flag, default=DEFAULT_OPTIONS['streaming_engine'],
+                        help='流式XML引擎（仅替换文本/设置大纲时生效）')
+    parser.add_argument('--mode', choices=['process', 'thread'], default='process',
+                        help='并行方式：多进程（默认）或线程池')
+    parser.add_argument('--workers', type=int, default=DEFAULT_OPTIONS['process_workers'],
+                        help='多进程模式的进程数（默认CPU核心数）')
+    parser.add_argument('--memory-budget', type=int, metavar='MB', default=DEFAULT_OPTIONS['memory_budget_mb'],
+                        help='同时处理的文件总内存预算（MB，默认0为物理内存的一半）')
+
+
+def build_arg_parser():
+    """构建命令行参数解析器"""
+    import argparse  # 命令行参数解析只在命令行模式下需要（按需导入）
+    parser = argparse.ArgumentParser(
+        prog='python -m main',
+        description='Word文件批量处理工具（命令行模式）。不带参数运行时启动图形界面。'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    process = subparsers.add_parser('process', help='批量处理文件夹下的.docx文件')
+    process.add_argument('folder', help='工作文件夹')
+    add_discovery_arguments(process)
+    add_process_option_arguments(process)
+    flag = argparse.BooleanOptionalAction
+    process.add_argument('--resume', action='store_true',
+                         help=f'从上次中断的批次继续：跳过批处理日志（{JOURNAL_NAME}）中已成功的文件')
+    process.add_argument('--dedupe', action=flag, default=DEFAULT_OPTIONS['dedupe'],
+                         help='内容完全相同的文件只处理一次，处理结果复制到其余副本')
+    process.add_argument('--shard', type=parse_shard, metavar='i/N',
+                         help='只处理第i片（共N片，按文件大小均衡划分；各台机器对同一文件夹得到相同划分）')
+    process.add_argument('--reshard', action='store_true',
+                         help=f'按当前文件重新划分分片（默认沿用文件夹下已有的{SHARD_PLAN_PREFIX}N.json）')
+    process.add_argument('--shard-report', metavar='PATH',
+                         help=f'分片结果报告路径（默认为所选文件夹下的{SHARD_REPORT_PREFIX}iofN.json）')
+    process.add_argument('--dry-run', action='store_true', help='只列出将要处理的文件，不做修改')
+    process.add_argument('--timings', action='store_true', help='记录各阶段耗时并在汇总中输出分位数和异常文件')
+    process.add_argument('--timings-json', metavar='PATH', help='导出每个文件的阶段耗时（JSON，隐含--timings）')
+    process.add_argument('--timings-csv', metavar='PATH', help='导出每个文件的阶段耗时（CSV，隐含--timings）')
+    process.add_argument('--profile-dir', metavar='DIR', help='为每个文件导出cProfile剖析结果到该目录')
+    process.add_argument('--json', action='store_true', help='以JSON格式向标准输出打印汇总结果')
+
+    flag = argparse.BooleanOptionalAction
+    doc2docx = subparsers.add_parser('doc2docx', help='批量将.doc转换为.docx')
+    doc2docx.add_argument('--keep-source', action=flag, default=DEFAULT_OPTIONS['keep_source_doc'],
+                          help='转换后保留源.doc文件')
+    docx2pdf = subparsers.add_parser('docx2pdf', help='批量将.docx导出为.pdf')
+    docx2pdf.add_argument('--separate-folder', action=flag, default=DEFAULT_OPTIONS['docx2pdf_separate_folder'],
+                          help='PDF保存到独立的docx2pdf文件夹（保持目录结构）')
+    for convert in (doc2docx, docx2pdf):
+        convert.add_argument('folder', help='工作文件夹')
+        add_discovery_arguments(convert)
+        convert.add_argument('--backend', choices=sorted(CONVERTER_BACKENDS), default=default_converter_backend(),
+                             help='转换后端（默认：Windows为word，其他系统为libreoffice）')
+        convert.add_argument('--workers', type=int, help=f'转换实例数（默认不超过{CONVERT_MAX_WORKERS}和CPU核心数）')
+        convert.add_argument('--schedule', choices=['dynamic', 'static'], default=CONVERT_SCHEDULE,
+                             help='任务调度：dynamic=共享队列大文件优先（默认），static=按数量均分')
+        convert.add_argument('--force', action='store_true', help='目标文件已是最新时也重新转换')
+        convert.add_argument('--dedupe', action=flag, default=DEFAULT_OPTIONS['dedupe'],
+                             help='内容完全相同的文件只转换一次，结果复制到其余副本')
+        convert.add_argument('--json', action='store_true', help='以JSON格式向标准输出打印汇总结果')
+
+    pipeline = subparsers.add_parser('pipeline', help='流水线：每个文件依次完成DOC→DOCX、处理、导出PDF，各阶段同时运行')
+    pipeline.add_argument('folder', help='工作文件夹')
+    add_discovery_arguments(pipeline)
+    add_process_option_arguments(pipeline)
+    pipeline.add_argument('--keep-source', action=flag, default=DEFAULT_OPTIONS['keep_source_doc'],
+                          help='转换后保留源.doc文件')
+    pipeline.add_argument('--separate-folder', action=flag, default=DEFAULT_OPTIONS['docx2pdf_separate_folder'],
+                          help='PDF保存到独立的docx2pdf文件夹（保持目录结构）')
+    pipeline.add_argument('--backend', choices=sorted(CONVERTER_BACKENDS), default=default_converter_backend(),
+                          help='转换后端（默认：Windows为word，其他系统为libreoffice）')
+    pipeline.add_argument('--convert-workers', type=int,
+                          help=f'转换和导出阶段各自的实例数（默认不超过{CONVERT_MAX_WORKERS}和CPU核心数）')
+    pipeline.add_argument('--force', action='store_true', help='转换和导出的目标文件已是最新时也重新生成')
+    pipeline.add_argument('--json', action='store_true', help='以JSON格式向标准输出打印汇总结果')
+
+    merge = subparsers.add_parser('merge', help='合并各分片（process --shard）的结果报告')
+    merge.add_argument('reports', nargs='+', help='分片报告文件，或包含分片报告的文件夹')
+    merge.add_argument('--output', metavar='PATH', help='合并后的报告写入该文件（JSON）')
+    merge.add_argument('--json', action='store_true', help='以JSON格式向标准输出打印合并结果')
+
+    watch = subparsers.add_parser('watch', help='持续监视文件夹，新增或修改的.docx/.doc写入完成后自动处理')
+    watch.add_argument('folder', help='工作文件夹')
+    add_discovery_arguments(watch)
+    add_process_option_arguments(watch)
+    watch.add_argument('--export-pdf', action='store_true', help='处理完成后同时导出PDF')
+    watch.add_argument('--keep-source', action=flag, default=DEFAULT_OPTIONS['keep_source_doc'],
+                       help='.doc转换后保留源文件')
+    watch.add_argument('--separate-folder', action=flag, default=DEFAULT_OPTIONS['docx2pdf_separate_folder'],
+                       help='PDF保存到独立的docx2pdf文件夹（保持目录结构）')
+    watch.add_argument('--backend', choices=sorted(CONVERTER_BACKENDS), default=default_converter_backend(),
+                       help='转换后端（默认：Windows为word，其他系统为libreoffice）')
+    watch.add_argument('--dedupe', action=flag, default=DEFAULT_OPTIONS['dedupe'],
+                       help='同一批中内容完全相同的文件只处理/转换一次')
+    watch.add_argument('--existing', action='store_true', help='开始监视前先处理已有文件（增量缓存会跳过已处理过的）')
+    watch.add_argument('--poll-interval', type=float, default=WATCH_POLL_INTERVAL,
+                       help=f'未安装watchdog时扫描目录的间隔（秒，默认{WATCH_POLL_INTERVAL}）')
+    watch.add_argument('--settle', type=float, default=WATCH_SETTLE_TIME,
+                       help=f'文件保持不变多久（秒）后才处理，避免处理写了一半的文件（默认{WATCH_SETTLE_TIME}）')
+    watch.add_argument('--json', action='store_true', help='每批处理完成后向标准输出打印一行JSON')
+    return parser
+
+
+def options_from_args(args):
+    """将命令行参数转换为普通字典形式的处理选项"""
+    opts = dict(DEFAULT_OPTIONS)
+    opts.update({
+        'remove_header_footer': args.remove_header_footer,
+        'add_custom_header': args.add_custom_header,
+        'add_page_number': args.add_page_number,
+        'replace_patterns': args.replace_patterns,
+        'set_question_outline': args.set_question_outline,
+        'outline_rules_path': os.path.abspath(args.outline_rules) if args.outline_rules else None,
+        'section_templates_path': os.path.abspath(args.section_templates) if args.section_templates else None,
+        'keep_backup': args.keep_backup,
+        'compress_level': args.compress_level,
+        'reuse_unmodified_parts': args.reuse_parts,
+        'use_cache': args.cache,
+        'streaming_engine': args.streaming,
+        'use_process_pool': args.mode == 'process',
+        'process_workers': max(1, args.workers),
+        'memory_budget_mb': max(0, args.memory_budget),
+    })
+    if args.command == 'process':
+        opts.update({
+            'instrument': bool(args.timings or args.timings_json or args.timings_csv),
+            'profile_dir': os.path.abspath(args.profile_dir) if args.profile_dir else None,
+            'resume_batch': args.resume,
+            'shard': args.shard,
+            'dedupe': args.dedupe,
+        })
+    else:
+        opts.update({
+            'keep_source_doc': args.keep_source,
+            'docx2pdf_separate_folder': args.separate_folder,
+            'dedupe': getattr(args, 'dedupe', False),  # 流水线逐个文件流转，不做去重
+        })
+    return opts
+
+
+def cli_process(args):
+    """命令行process子命令：批量处理Word文件，返回退出码"""
+    folder_path = os.path.abspath(args.folder)
+    if not os.path.isdir(folder_path):
+        print(f"文件夹不存在：{folder_path}", file=sys.stderr)
+        return 2
+    opts = options_from_args(args)
+    word_files = listing_from_args(args, folder_path, ['.docx'])
+    if args.shard:
+        # 分片需要完整文件列表才能确定划分，先遍历完再处理本片
+        word_files = select_shard(word_files, folder_path, args.shard, args.reshard)
+
+    if args.dry_run:
+        word_files = list(word_files)
+        cache_skipped = resumed = 0
+        if args.resume:
+            # 只读取日志，不创建新批次
+            entries = read_journal(folder_path, options_signature(opts), shard_file_name(JOURNAL_NAME, opts))
+            pending = [path for path in word_files
+                       if not journal_entry_done(entries.get(journal_key(folder_path, path)), path)]
+            resumed = len(word_files) - len(pending)
+            word_files = pending
+        if opts['use_cache']:
+            manifest = load_manifest(folder_path, options_signature(opts), shard_file_name(MANIFEST_NAME, opts))
+            word_files, cache_skipped = filter_up_to_date_files(manifest, word_files)
+        summary = {'folder': folder_path, 'dry_run': True, 'total': len(word_files) + cache_skipped + resumed,
+                   'cache_skipped': cache_skipped, 'resumed': resumed, 'files': word_files}
+        if not args.json:
+            for path in word_files:
+                print(path)
+            print(f"共 {len(word_files)} 个文件待处理，增量缓存跳过 {cache_skipped} 个，断点续传跳过 {resumed} 个",
+                  file=sys.stderr)
+    else:
+        # 进度输出到stderr：交互终端原地刷新，重定向时按较长间隔逐行输出
+        interactive = sys.stderr.isatty()
+        reporter = ProgressReporter(console_progress_display("处理"),
+                                    interval=PROGRESS_INTERVAL if interactive else PROGRESS_LOG_INTERVAL)
+        with reporter:
+            summary = run_process_batch(folder_path, word_files, opts,
+                                        on_result=reporter.record_result, on_total=reporter.set_total)
+        if interactive:
+            print(file=sys.stderr)
+        if args.shard:
+            report_path = args.shard_report or shard_report_path(folder_path, args.shard)
+            try:
+                write_shard_report(report_path, summary, opts)
+                summary['shard_report'] = report_path
+            except OSError as e:
+                summary['batch_errors'].append(f"写入分片报告失败：{str(e)}")
+        if args.timings_json:
+            export_timings_json(args.timings_json, summary['results'])
+        if args.timings_csv:
+            export_timings_csv(args.timings_csv, summary['results'])
+        if not args.json:
+            print(f"处理完成：成功 {summary['succeeded']}/{summary['processed']}"
+                  f"（改写 {summary['changed']}，无变化 {summary['unchanged']}），"
+                  f"增量缓存跳过 {summary['cache_skipped']}，断点续传跳过 {summary['resumed']}，"
+                  f"耗时 {summary['elapsed']:.1f} 秒", file=sys.stderr)
+            print(format_prescreen_summary(summary['stats']), file=sys.stderr)
+            print(format_admission_summary(summary['admission']), file=sys.stderr)
+            if summary['deduplicated']:
+                print(f"内容重复的副本：{summary['deduplicated']} 个（未重复处理，直接复制结果）", file=sys.stderr)
+            if 'timings' in summary:
+                print(format_timings_summary(summary['timings']), file=sys.stderr)
+            for msg in summary['errors'] + summary['batch_errors']:
+                print(msg, file=sys.stderr)
+
+    if args.json:
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    return 1 if summary.get('failed') or summary.get('batch_errors') else 0
+
+
+def cli_convert(args):
+    """命令行doc2docx/docx2pdf子命令：批量格式转换，返回退出码"""
+    folder_path = os.path.abspath(args.folder)
+    if not os.path.isdir(folder_path):
+        print(f"文件夹不存在：{folder_path}", file=sys.stderr)
+        return 2
+    if args.command == 'doc2docx':
+        file_paths = listing_from_args(args, folder_path, ['.doc'])
+        label = "转换DOC→DOCX"
+    else:
+        file_paths = listing_from_args(args, folder_path, ['.docx'])
+        label = "转换DOCX→PDF"
+
+    interactive = sys.stderr.isatty()
+    reporter = ProgressReporter(console_progress_display(label), len(file_paths),
+                                interval=PROGRESS_INTERVAL if interactive else PROGRESS_LOG_INTERVAL).start()
+    try:
+        if args.command == 'doc2docx':
+            schedule_stats = convert_doc_files(file_paths, folder_path, args.keep_source, reporter, args.backend,
+                                               args.workers, args.schedule, args.force, args.dedupe)
+        else:
+            schedule_stats = convert_docx_files(file_paths, folder_path, args.separate_folder, reporter,
+                                                args.backend, args.workers, args.schedule, args.force, args.dedupe)
+    finally:
+        progress = reporter.close()
+        shutdown_converter_pools()
+    if interactive:
+        print(file=sys.stderr)
+
+    summary = {
+        'folder': folder_path,
+        'command': args.command,
+        'backend': args.backend,
+        'total': len(file_paths),
+        'succeeded': progress['succeeded'],
+        'failed': progress['failed'],
+        'skipped': progress['skipped'],
+        'errors': progress['errors'],
+        'makespan': schedule_stats['makespan'],
+        'busy': schedule_stats['busy'],
+        'schedule': schedule_stats['schedule'],
+        'deduplicated': schedule_stats['deduplicated'],
+    }
+    if args.json:
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(f"{label}完成：转换 {progress['succeeded']}，跳过（已是最新） {progress['skipped']}，"
+              f"失败 {progress['failed']}", file=sys.stderr)
+        print(format_schedule_summary(schedule_stats), file=sys.stderr)
+        if schedule_stats['deduplicated']:
+            print(f"内容重复的副本：{schedule_stats['deduplicated']} 个（未重复转换）", file=sys.stderr)
+        for msg in progress['errors']:
+            print(msg, file=sys.stderr)
+    return 1 if progress['failed'] or progress['errors'] else 0
+
+
+def cli_pipeline(args):
+    """命令行pipeline子命令：DOC→DOCX、处理、导出PDF流水线，返回退出码"""
+    folder_path = os.path.abspath(args.folder)
+    if not os.path.isdir(folder_path):
+        print(f"文件夹不存在：{folder_path}", file=sys.stderr)
+        return 2
+    opts = options_from_args(args)
+    file_paths = listing_from_args(args, folder_path, ['.doc', '.docx'])
+
+    interactive = sys.stderr.isatty()
+    reporter = ProgressReporter(console_progress_display("流水线"),
+                                interval=PROGRESS_INTERVAL if interactive else PROGRESS_LOG_INTERVAL).start()
+    try:
+        summary = run_pipeline(folder_path, opts, reporter, file_paths, args.backend, args.convert_workers,
+                               opts['process_workers'], args.force)
+    finally:
+        progress = reporter.close()
+        shutdown_converter_pools()
+    if interactive:
+        print(file=sys.stderr)
+
+    summary.update(succeeded=progress['succeeded'], failed=progress['failed'], skipped=progress['skipped'],
+                   errors=progress['errors'])
+    if args.json:
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(f"流水线完成：导出 {progress['succeeded']}，跳过（已是最新） {progress['skipped']}，"
+              f"失败 {progress['failed']}", file=sys.stderr)
+        print(format_pipeline_summary(summary), file=sys.stderr)
+        for msg in progress['errors'] + summary['batch_errors']:
+            print(msg, file=sys.stderr)
+    return 1 if progress['failed'] or progress['errors'] or summary['batch_errors'] else 0
+
+
+def cli_watch(args):
+    """命令行watch子命令：持续监视文件夹，按Ctrl+C停止，返回退出码"""
+    folder_path = os.path.abspath(args.folder)
+    if not os.path.isdir(folder_path):
+        print(f"文件夹不存在：{folder_path}", file=sys.stderr)
+        return 2
+    opts = options_from_args(args)
+    scan_args = (args.include, args.exclude, args.max_depth, args.follow_symlinks)
+    stop_event = threading.Event()
+
+    def on_batch(batch):
+        if args.json:
+            print(json.dumps(batch, ensure_ascii=False), flush=True)
+        else:
+            print(format_watch_batch(batch), file=sys.stderr)
+            for msg in batch['errors']:
+                print(msg, file=sys.stderr)
+
+    print(f"开始监视 {folder_path}（按Ctrl+C停止）", file=sys.stderr)
+    try:
+        run_watch(folder_path, opts, stop_event, on_batch, args.backend, args.export_pdf, scan_args,
+                  args.existing, args.poll_interval, args.settle)
+    except KeyboardInterrupt:
+        stop_event.set()
+    finally:
+        shutdown_converter_pools()
+    print("已停止监视", file=sys.stderr)
+    return 0
+
+
+def cli_merge(args):
+    """命令行merge子命令：合并分片报告，返回退出码（有失败、缺少分片或重复文件时为1）"""
+    report_paths = find_shard_reports(args.reports)
+    if not report_paths:
+        print("未找到任何分片报告", file=sys.stderr)
+        return 2
+    summary = merge_shard_reports(report_paths)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    if args.json:
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(f"合并 {len(summary['shards'])} 个分片：成功 {summary['succeeded']}/{summary['processed']}"
+              f"（改写 {summary['changed']}，无变化 {summary['unchanged']}），增量缓存跳过 {summary['cache_skipped']}，"
+              f"断点续传跳过 {summary['resumed']}，最慢分片耗时 {summary['makespan']:.1f} 秒", file=sys.stderr)
+        for shard in summary['shards']:
+            print(f"  分片 {shard['shard']}（{shard['host']}）：{shard['files']} 个文件，耗时 {shard['elapsed']:.1f} 秒",
+                  file=sys.stderr)
+        if summary['missing']:
+            print(f"缺少分片：{', '.join(map(str, summary['missing']))}", file=sys.stderr)
+        if summary['duplicates']:
+            print(f"重复处理的文件：{len(summary['duplicates'])} 个", file=sys.stderr)
+        for msg in summary['errors'] + summary['batch_errors']:
+            print(msg, file=sys.stderr)
+    problems = summary['failed'] or summary['batch_errors'] or summary['missing'] or summary['duplicates']
+    return 1 if problems else 0
+
+
+def cli_main(argv):
+    """命令行入口，返回进程退出码"""
+    args = build_arg_parser().parse_args(argv)
+    if args.command == 'process':
+        return cli_process(args)
+    if args.command in ('doc2docx', 'docx2pdf'):
+        return cli_convert(args)
+    if args.command == 'pipeline':
+        return cli_pipeline(args)
+    if args.command == 'watch':
+        return cli_watch(args)
+    if args.command == 'merge':
+        return cli_merge(args)
+    return 2
 
 
 if __name__ == "__main__":
+    # 打包为exe后，多进程模式的子进程需要通过freeze_support正确启动
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        sys.exit(cli_main(sys.argv[1:]))
     main()
\ No newline at end of file
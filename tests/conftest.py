@@ -0,0 +1,46 @@
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402  被测模块
+
+
+def make_docx(path, body_texts=(), header_text=None, member_first=None):
+    """
+    生成测试用docx
+    :param path: 输出路径
+    :param body_texts: 正文段落文本
+    :param header_text: 页眉文本（为None时不添加页眉）
+    :param member_first: 需要排在word/document.xml之前的成员名前缀（如'word/header'）
+    :return: path
+    """
+    main.load_docx()
+    doc = main.Document()
+    for text in body_texts:
+        doc.add_paragraph(text)
+    if header_text is not None:
+        doc.sections[0].header.paragraphs[0].text = header_text
+    doc.save(path)
+    if member_first:
+        reorder_members(path, lambda name: not name.startswith(member_first))
+    return path
+
+
+def reorder_members(path, key):
+    """按key重新排列zip成员顺序（key相同的保持原顺序）"""
+    with zipfile.ZipFile(path) as zf:
+        members = [(info, zf.read(info)) for info in zf.infolist()]
+    members.sort(key=lambda item: key(item[0].filename))
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for info, data in members:
+            zf.writestr(info, data)
+
+
+def stream_opts(**overrides):
+    """流式引擎的处理选项（默认只开启括号替换）"""
+    opts = dict(main.DEFAULT_OPTIONS, remove_header_footer=False, add_custom_header=False,
+                add_page_number=False, set_question_outline=False, streaming_engine=True)
+    opts.update(overrides)
+    return opts
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import main
+
+
+def finish(admission, cost, seconds=1.0):
+    """结束一个任务，并让本次调整窗口恰好持续seconds秒（吞吐量即cost/seconds）"""
+    admission._window_start = time.perf_counter() - seconds
+    admission.release(cost)
+
+
+def test_budget_and_limit_block_new_tasks():
+    admission = main.MemoryAdmission(100, 4, rss_sampler=lambda: None, initial_workers=2)
+    admission.acquire(80)
+    assert not admission.try_acquire(30, timeout=0.05)  # 超出内存预算
+    assert admission.try_acquire(20, timeout=0.05)
+    assert not admission.try_acquire(0, timeout=0.05)  # 达到并发上限
+    admission.release(20)
+    admission.release(80)
+    assert (admission.active, admission.in_use, admission.peak_active) == (0, 0, 2)
+
+
+def test_oversized_task_runs_alone():
+    admission = main.MemoryAdmission(100, 4, rss_sampler=lambda: None)
+    assert admission.try_acquire(1000, timeout=0)
+    assert not admission.try_acquire(1, timeout=0.05)
+    admission.release(1000)
+
+
+def test_release_wakes_waiting_task():
+    admission = main.MemoryAdmission(100, 4, rss_sampler=lambda: None)
+    admission.acquire(80)
+    admitted = threading.Event()
+
+    def worker():
+        admission.acquire(50)
+        admitted.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert not admitted.wait(0.05)
+    admission.release(80)
+    assert admitted.wait(5)
+    thread.join()
+    admission.release(50)
+
+
+def test_adapt_grows_then_backs_off_without_throughput_gain():
+    admission = main.MemoryAdmission(10 ** 9, 8, rss_sampler=lambda: None, initial_workers=2)
+    for _ in range(2):
+        admission.acquire(100)
+    finish(admission, 100)
+    assert admission.limit == 4  # 任务排满、内存充裕：成倍增加
+
+    for _ in range(3):
+        admission.acquire(100)
+    finish(admission, 300)
+    assert admission.limit == 8  # 吞吐量提升，继续增加（不超过max_workers）
+
+    finish(admission, 100)
+    assert admission.limit == 7  # 吞吐量没有提升：撤回一个并暂停增加
+    for _ in range(2):
+        admission.release(100)
+
+
+def test_adapt_halves_limit_when_rss_near_budget():
+    samples = iter([0, 950])
+    admission = main.MemoryAdmission(1000, 8, rss_sampler=lambda: next(samples), initial_workers=4)
+    admission.acquire(10)
+    admission.acquire(10)
+    finish(admission, 10)
+    assert admission.limit == 2
+    assert admission.report()['final_limit'] == 2
+    admission.release(10)
@@ -0,0 +1,21 @@
+import main
+from conftest import make_docx
+
+
+def batch_opts(**overrides):
+    opts = dict(main.DEFAULT_OPTIONS, use_cache=False, use_process_pool=False)
+    opts.update(overrides)
+    return opts
+
+
+def test_on_result_error_is_reported_in_thread_mode(tmp_path):
+    paths = [make_docx(str(tmp_path / f'{i}.docx'), ['(01中文说明)正文']) for i in range(3)]
+
+    def on_result(result):
+        if result['path'] == paths[1]:
+            raise RuntimeError('显示失败')
+
+    summary = main.run_process_batch(str(tmp_path), paths, batch_opts(), on_result=on_result)
+    assert summary['processed'] == 3
+    assert summary['succeeded'] == 3
+    assert summary['batch_errors'] == ['1.docx - 记录处理结果失败：显示失败']
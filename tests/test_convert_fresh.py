@@ -0,0 +1,66 @@
+import os
+import threading
+
+import main
+
+
+def write(path, data=b'data'):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def set_mtime(path, seconds):
+    os.utime(path, ns=(seconds * 10 ** 9, seconds * 10 ** 9))
+
+
+def convert_manifest(folder):
+    return main.load_manifest(str(folder), str(main.CONVERT_RULES_VERSION), main.CONVERT_MANIFEST_NAME)
+
+
+def test_missing_or_older_target_is_stale(tmp_path):
+    src = write(tmp_path / 'a.doc')
+    dst = str(tmp_path / 'a.docx')
+    manifest = convert_manifest(tmp_path)
+    assert not main.is_target_fresh(manifest, 'doc2docx', src, dst)
+    write(dst)
+    set_mtime(src, 2000)
+    set_mtime(dst, 1000)
+    assert not main.is_target_fresh(manifest, 'doc2docx', src, dst)
+
+
+def test_target_not_older_than_source_is_fresh(tmp_path):
+    src, dst = write(tmp_path / 'a.doc'), write(tmp_path / 'a.docx')
+    set_mtime(src, 1000)
+    set_mtime(dst, 1000)
+    assert main.is_target_fresh(convert_manifest(tmp_path), 'doc2docx', src, dst)
+
+
+def test_touched_source_with_recorded_hash_is_fresh(tmp_path):
+    src, dst = write(tmp_path / 'a.doc'), write(tmp_path / 'a.docx')
+    set_mtime(src, 1000)
+    set_mtime(dst, 1000)
+    manifest = convert_manifest(tmp_path)
+    main.record_conversion(manifest, threading.Lock(), 'doc2docx', src, dst)
+
+    set_mtime(src, 2000)  # 内容未变，只是被touch或复制
+    assert main.is_target_fresh(manifest, 'doc2docx', src, dst)
+    # 记录属于另一种转换或另一个目标时不能借用
+    assert not main.is_target_fresh(manifest, 'docx2pdf', src, dst)
+    other = write(tmp_path / 'b.docx')
+    set_mtime(other, 1000)
+    assert not main.is_target_fresh(manifest, 'doc2docx', src, other)
+
+    write(src, b'DATA')  # 内容变化
+    set_mtime(src, 3000)
+    assert not main.is_target_fresh(manifest, 'doc2docx', src, dst)
+
+
+def test_forget_conversion_drops_record(tmp_path):
+    src, dst = write(tmp_path / 'a.doc'), write(tmp_path / 'a.docx')
+    set_mtime(dst, 1000)
+    manifest = convert_manifest(tmp_path)
+    main.record_conversion(manifest, threading.Lock(), 'doc2docx', src, dst)
+    main.forget_conversion(manifest, threading.Lock(), 'doc2docx', src)
+    set_mtime(src, 2000)
+    assert not main.is_target_fresh(manifest, 'doc2docx', src, dst)
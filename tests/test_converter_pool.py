@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+
+import main
+
+
+class CountingBackend(main.FakeBackend):
+    """记录启动和关闭次数的假后端"""
+    lock = threading.Lock()
+    closed = 0
+
+    def close(self):
+        with CountingBackend.lock:
+            CountingBackend.closed += 1
+
+
+def make_sources(tmp_path, names):
+    paths = []
+    for name in names:
+        path = tmp_path / name
+        path.write_bytes(b'doc')
+        paths.append(str(path))
+    return paths
+
+
+def convert_one(converter, path):
+    converter.save_as_docx(path, f"{path}.docx")
+
+
+def run_pool(pool, paths, on_done=None, max_workers=1):
+    done = []
+
+    def record(path, error):
+        done.append((os.path.basename(path), error))
+        if on_done:
+            on_done(path, error)
+
+    stats = pool.run(paths, convert_one, record, max_workers)
+    return stats, done
+
+
+def test_backend_recycled_after_n_documents(tmp_path):
+    pool = main.ConverterPool(CountingBackend, recycle_after=2, idle_timeout=60)
+    try:
+        stats, done = run_pool(pool, make_sources(tmp_path, [f'{i}.doc' for i in range(5)]))
+        assert [error for _, error in done] == [None] * 5
+        assert pool.started == 3
+        assert stats['callback_errors'] == []
+    finally:
+        pool.shutdown()
+
+
+def test_conversion_error_reaches_on_done_and_recycles(tmp_path):
+    pool = main.ConverterPool(CountingBackend, recycle_after=100, idle_timeout=60)
+    try:
+        paths = make_sources(tmp_path, ['a.doc', 'b__fail__.doc', 'c.doc'])
+        _, done = run_pool(pool, paths)
+        errors = dict(done)
+        assert errors['a.doc'] is None and errors['c.doc'] is None
+        assert isinstance(errors['b__fail__.doc'], RuntimeError)
+        assert pool.started == 2  # 出错后关闭实例，下一个文档使用新实例
+        assert os.path.exists(paths[2] + '.docx')
+    finally:
+        pool.shutdown()
+
+
+def test_on_done_exception_does_not_hang_the_pool(tmp_path):
+    pool = main.ConverterPool(CountingBackend, recycle_after=100, idle_timeout=60)
+
+    def on_done(path, error):
+        if path.endswith('b.doc'):
+            raise ValueError('回调出错')
+
+    try:
+        paths = make_sources(tmp_path, ['a.doc', 'b.doc', 'c.doc'])
+        stats, done = run_pool(pool, paths, on_done)
+        assert len(done) == 3
+        assert stats['callback_errors'] == ['b.doc - 完成回调异常：回调出错']
+        # 工作线程仍然存活，下一批可以继续使用
+        _, done = run_pool(pool, make_sources(tmp_path, ['d.doc']))
+        assert done == [('d.doc', None)]
+    finally:
+        pool.shutdown()
+
+
+def test_idle_backend_is_closed(tmp_path):
+    CountingBackend.closed = 0
+    pool = main.ConverterPool(CountingBackend, recycle_after=100, idle_timeout=0.05)
+    try:
+        run_pool(pool, make_sources(tmp_path, ['a.doc']))
+        deadline = time.monotonic() + 5
+        while CountingBackend.closed == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert CountingBackend.closed == 1
+        assert pool.started == 1
+        run_pool(pool, make_sources(tmp_path, ['b.doc']))
+        assert pool.started == 2  # 空闲关闭后按需重新启动
+    finally:
+        pool.shutdown()
@@ -0,0 +1,57 @@
+import main
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def count_hashes(monkeypatch):
+    hashed = []
+    original = main.file_sha256
+
+    def file_sha256(path):
+        hashed.append(path)
+        return original(path)
+
+    monkeypatch.setattr(main, 'file_sha256', file_sha256)
+    return hashed
+
+
+def test_unique_sizes_are_never_hashed(monkeypatch):
+    hashed = count_hashes(monkeypatch)
+    index = main.DuplicateIndex()
+    for i in range(5):
+        assert index.add(f'f{i}.docx', size=100 + i) is None
+    assert hashed == []
+    assert index.duplicate_count() == 0
+
+
+def test_first_file_is_hashed_when_a_same_size_file_appears(tmp_path, monkeypatch):
+    hashed = count_hashes(monkeypatch)
+    a = write(tmp_path / 'a.docx', b'same')
+    b = write(tmp_path / 'b.docx', b'diff')
+    c = write(tmp_path / 'c.docx', b'same')
+    other = write(tmp_path / 'other.docx', b'longer content')
+
+    index = main.DuplicateIndex()
+    assert index.add(a) is None
+    assert index.add(other) is None
+    assert hashed == []
+    assert index.add(b) is None
+    assert sorted(hashed) == [a, b]
+    assert index.add(c) == a
+    assert index.groups == {a: [c]}
+    assert other not in hashed
+
+
+def test_group_duplicates(tmp_path):
+    a = write(tmp_path / 'a.docx', b'same')
+    b = write(tmp_path / 'b.docx', b'same')
+    c = write(tmp_path / 'c.docx', b'unique')
+    missing = str(tmp_path / 'missing.docx')
+
+    unique, index = main.group_duplicates([a, b, c, missing])
+    assert unique == [a, c, missing]
+    assert index.groups == {a: [b]}
@@ -0,0 +1,78 @@
+import json
+import os
+
+import main
+from conftest import make_docx
+
+
+def result(path, success=True):
+    return {'path': path, 'success': success, 'changed': success, 'message': '' if success else '失败'}
+
+
+def write(path, data=b'data'):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_resume_after_crash_skips_only_completed_files(tmp_path):
+    done, failed, modified = (write(tmp_path / name) for name in ('done.docx', 'failed.docx', 'modified.docx'))
+    journal = main.BatchJournal(str(tmp_path), 'sig')
+    journal.record(result(done))
+    journal.record(result(failed, success=False))
+    journal.record(result(modified))
+    # 模拟崩溃：没有汇总记录，最后一行只写了一半
+    journal._file.write('{"type": "file", "path": "pending.do')
+    journal._file.close()
+    write(tmp_path / 'modified.docx', b'changed after the crash')
+
+    resumed = main.BatchJournal(str(tmp_path), 'sig', resume=True)
+    try:
+        assert resumed.is_done(done)
+        assert not resumed.is_done(failed)
+        assert not resumed.is_done(modified)
+        assert not resumed.is_done(str(tmp_path / 'pending.docx'))
+    finally:
+        resumed.close()
+    # 续传时追加写入，旧记录仍在
+    with open(tmp_path / main.JOURNAL_NAME, encoding='utf-8') as f:
+        assert sum('"batch"' in line for line in f) == 2
+
+
+def test_signature_change_or_fresh_run_ignores_old_records(tmp_path):
+    path = write(tmp_path / 'a.docx')
+    journal = main.BatchJournal(str(tmp_path), 'sig')
+    journal.record(result(path))
+    journal.close({'processed': 1, 'succeeded': 1, 'failed': 0, 'resumed': 0})
+
+    other = main.BatchJournal(str(tmp_path), 'other', resume=True)
+    assert not other.is_done(path)
+    other.close()
+    # 选项不同的批次之后，原选项的记录仍可用于续传
+    again = main.BatchJournal(str(tmp_path), 'sig', resume=True)
+    assert again.is_done(path)
+    again.close()
+    # 不续传时覆盖旧日志
+    fresh = main.BatchJournal(str(tmp_path), 'sig')
+    fresh.close()
+    assert main.read_journal(str(tmp_path), 'sig') == {}
+
+
+def test_batch_resume_after_interrupted_run(tmp_path):
+    paths = [make_docx(str(tmp_path / f'{i}.docx'), ['(01中文说明)正文']) for i in range(4)]
+    opts = dict(main.DEFAULT_OPTIONS, use_cache=False, use_process_pool=False)
+    summary = main.run_process_batch(str(tmp_path), paths, opts)
+    assert summary['succeeded'] == 4
+
+    # 只保留批次记录和前两个文件的结果，模拟处理到一半时崩溃
+    journal_path = tmp_path / main.JOURNAL_NAME
+    with open(journal_path, encoding='utf-8') as f:
+        lines = [line for line in f if json.loads(line)['type'] != 'end']
+    kept = {json.loads(line).get('path') for line in lines[1:3]}
+    with open(journal_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:3])
+
+    summary = main.run_process_batch(str(tmp_path), paths, dict(opts, resume_batch=True))
+    assert summary['resumed'] == 2
+    assert summary['processed'] == 2
+    assert {os.path.basename(r['path']) for r in summary['results']}.isdisjoint(kept)
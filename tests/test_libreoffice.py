@@ -0,0 +1,120 @@
+import os
+import pathlib
+import stat
+import sys
+import types
+
+import main
+
+# 假soffice：记录每次启动的参数；--convert-to时按参数生成输出文件，--accept时一直运行到出现停止标记
+FAKE_SOFFICE = '''#!{python}
+import os, sys, time
+args = sys.argv[1:]
+with open({log!r}, 'a') as f:
+    f.write(' '.join(args) + '\\n')
+if '--convert-to' in args:
+    ext = args[args.index('--convert-to') + 1].split(':')[0]
+    out_dir = args[args.index('--outdir') + 1]
+    stem = os.path.splitext(os.path.basename(args[-1]))[0]
+    with open(os.path.join(out_dir, stem + '.' + ext), 'wb') as f:
+        f.write(b'converted')
+elif any(arg.startswith('--accept=') for arg in args):
+    while not os.path.exists({stop!r}):
+        time.sleep(0.02)
+'''
+
+
+def make_soffice(tmp_path):
+    log, stop = str(tmp_path / 'soffice.log'), str(tmp_path / 'stop')
+    path = tmp_path / 'soffice'
+    path.write_text(FAKE_SOFFICE.format(python=sys.executable, log=log, stop=stop))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path), log, stop
+
+
+def launches(log):
+    with open(log) as f:
+        return f.read().splitlines()
+
+
+def make_sources(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'{i}.doc'
+        path.write_bytes(b'doc')
+        paths.append(str(path))
+    return paths
+
+
+def fake_uno(stop):
+    """最小的uno模块替身：连接第二次尝试时成功，文档保存时写出目标文件，terminate时让假soffice退出"""
+    attempts = []
+
+    class Doc:
+        def storeToURL(self, url, props):
+            assert dict((p.Name, p.Value) for p in props)['FilterName'] == 'MS Word 2007 XML'
+            with open(url[len('file://'):], 'wb') as f:
+                f.write(b'converted')
+
+        def close(self, deliver):
+            pass
+
+    class Desktop:
+        def loadComponentFromURL(self, url, frame, flags, props):
+            return Doc()
+
+        def terminate(self):
+            open(stop, 'w').close()
+
+    class Resolver:
+        def resolve(self, url):
+            attempts.append(url)
+            if len(attempts) == 1:
+                raise RuntimeError('NoConnectException')
+            return types.SimpleNamespace(ServiceManager=ServiceManager(Desktop()))
+
+    class ServiceManager:
+        def __init__(self, instance):
+            self.instance = instance
+
+        def createInstanceWithContext(self, name, context):
+            return self.instance
+
+    module = types.ModuleType('uno')
+    module.getComponentContext = lambda: types.SimpleNamespace(ServiceManager=ServiceManager(Resolver()))
+    module.systemPathToFileUrl = lambda path: pathlib.Path(path).as_uri()
+    module.createUnoStruct = lambda name: types.SimpleNamespace()
+    return module
+
+
+def test_without_uno_runs_soffice_per_document(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'uno', None)  # 模拟没有Python-UNO绑定
+    soffice, log, _ = make_soffice(tmp_path)
+    backend = main.LibreOfficeBackend(soffice)
+    backend.start()
+    try:
+        for path in make_sources(tmp_path, 2):
+            backend.save_as_docx(path, f"{path}x")
+            assert os.path.exists(f"{path}x")
+    finally:
+        backend.close()
+    lines = launches(log)
+    assert len(lines) == 3 and '--terminate_after_init' in lines[0]
+    assert backend.profile_dir is None
+
+
+def test_uno_keeps_one_listening_instance(tmp_path, monkeypatch):
+    soffice, log, stop = make_soffice(tmp_path)
+    monkeypatch.setitem(sys.modules, 'uno', fake_uno(stop))
+    backend = main.LibreOfficeBackend(soffice)
+    backend.start()
+    try:
+        for path in make_sources(tmp_path, 3):
+            backend.save_as_docx(path, f"{path}x")
+            assert os.path.exists(f"{path}x")
+        process = backend.process
+    finally:
+        backend.close()
+    lines = launches(log)
+    assert len(lines) == 1 and '--accept=pipe' in lines[0]
+    assert process.returncode == 0  # terminate后进程自行退出
@@ -0,0 +1,83 @@
+import json
+import os
+
+import main
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def record(manifest, path):
+    main.update_manifest_entry(manifest, {'path': path, 'success': True, 'fingerprint': main.file_fingerprint(path)})
+
+
+def test_load_manifest_missing_or_corrupt_is_empty(tmp_path):
+    manifest = main.load_manifest(str(tmp_path), 'sig')
+    assert manifest == {'folder': str(tmp_path), 'signature': 'sig', 'name': main.MANIFEST_NAME, 'files': {}}
+    (tmp_path / main.MANIFEST_NAME).write_text('{"files": [', encoding='utf-8')
+    assert main.load_manifest(str(tmp_path), 'sig')['files'] == {}
+    (tmp_path / main.MANIFEST_NAME).write_text('{"files": []}', encoding='utf-8')
+    assert main.load_manifest(str(tmp_path), 'sig')['files'] == {}
+
+
+def test_manifest_round_trip_uses_relative_keys(tmp_path):
+    os.makedirs(tmp_path / 'sub')
+    path = write(tmp_path / 'sub' / 'a.docx', b'content')
+    manifest = main.load_manifest(str(tmp_path), 'sig')
+    record(manifest, path)
+    main.save_manifest(manifest)
+    with open(tmp_path / main.MANIFEST_NAME, encoding='utf-8') as f:
+        assert list(json.load(f)['files']) == ['sub/a.docx']
+    assert main.is_file_up_to_date(main.load_manifest(str(tmp_path), 'sig'), path)
+    # 选项签名变化后旧记录全部失效
+    assert not main.is_file_up_to_date(main.load_manifest(str(tmp_path), 'other'), path)
+
+
+def test_is_file_up_to_date_detects_changes(tmp_path):
+    path = write(tmp_path / 'a.docx', b'content')
+    manifest = main.load_manifest(str(tmp_path), 'sig')
+    assert not main.is_file_up_to_date(manifest, path)
+    record(manifest, path)
+    assert main.is_file_up_to_date(manifest, path)
+
+    # 只有修改时间变化（touch/复制）：比较哈希后仍判定为最新，并更新记录的时间戳
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert main.is_file_up_to_date(manifest, path)
+    assert manifest['files']['a.docx']['mtime_ns'] == st.st_mtime_ns + 10 ** 9
+
+    # 大小相同、内容不同
+    write(tmp_path / 'a.docx', b'CONTENT')
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10 ** 9))
+    assert not main.is_file_up_to_date(manifest, path)
+    # 大小变化
+    write(tmp_path / 'a.docx', b'longer content')
+    assert not main.is_file_up_to_date(manifest, path)
+    # 文件已删除
+    os.remove(path)
+    assert not main.is_file_up_to_date(manifest, path)
+
+
+def test_failed_result_drops_entry(tmp_path):
+    path = write(tmp_path / 'a.docx', b'content')
+    manifest = main.load_manifest(str(tmp_path), 'sig')
+    record(manifest, path)
+    main.update_manifest_entry(manifest, {'path': path, 'success': False})
+    assert manifest['files'] == {}
+
+
+def test_options_signature_tracks_selected_options_and_rules(tmp_path):
+    opts = dict(main.DEFAULT_OPTIONS)
+    signature = main.options_signature(opts)
+    assert signature == main.options_signature(dict(opts))
+    # 与处理结果无关的选项不影响签名
+    assert signature == main.options_signature(dict(opts, use_cache=not opts.get('use_cache')))
+    for key in main.PROCESS_OPTION_KEYS:
+        assert main.options_signature(dict(opts, **{key: not opts.get(key)})) != signature, key
+
+    rules_path = tmp_path / 'rules.json'
+    rules_path.write_text('[{"pattern": "专题{num}.*", "level": 1}]', encoding='utf-8')
+    assert main.options_signature(dict(opts, outline_rules_path=str(rules_path))) != signature
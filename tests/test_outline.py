@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize('text, value', [
+    ('12', 12), ('一', 1), ('十', 10), ('十五', 15), ('二十一', 21), ('一百零五', 105),
+    ('两千', 2000), ('一万零三', 10003), ('三亿二千万', 320000000), ('二〇二四', 2024), ('一二三', 123),
+])
+def test_parse_chinese_number_valid(text, value):
+    assert main.parse_chinese_number(text) == value
+
+
+@pytest.mark.parametrize('text', ['', '十十', '二三十', '百', '一十百', '一百十', '万', '一万二万', '十a'])
+def test_parse_chinese_number_invalid(text):
+    assert main.parse_chinese_number(text) is None
+
+
+def ruleset(*patterns):
+    return main.compile_outline_rules([{'name': p, 'pattern': p, 'level': 2} for p in patterns])
+
+
+def test_compile_outline_rules_triggers_and_signature():
+    rules = [dict(rule) for rule in main.DEFAULT_OUTLINE_RULES]
+    assert main.compile_outline_rules(rules)['signature'] == main.DEFAULT_OUTLINE_RULESET['signature']
+    # 任一规则没有触发字符时，不能用触发字符预筛
+    assert ruleset('专题{num}.*')['triggers'] is None
+    assert ruleset('专题{num}.*')['signature'] != ruleset('专项{num}.*')['signature']
+    assert main.compile_outline_rules([])['regex'] is None
+
+
+def test_compile_outline_rules_rejects_bad_level():
+    with pytest.raises(ValueError):
+        main.compile_outline_rules([{'pattern': '专题{num}', 'level': 10}])
+
+
+@pytest.mark.parametrize('text', [
+    '题型一', '题型十十分重要', '考点一二十', '考点一二三', '考法12', '第二十一章 几何', '第十一单元', 'A夯实基础',
+])
+def test_match_outline_rule_hits(text):
+    assert main.match_outline_rule(text, main.DEFAULT_OUTLINE_RULESET) is not None
+
+
+@pytest.mark.parametrize('text', ['第十十章', '题型', '第章', '普通段落', 'A夯实基础练习'])
+def test_match_outline_rule_misses(text):
+    assert main.match_outline_rule(text, main.DEFAULT_OUTLINE_RULESET) is None
+
+
+def test_match_outline_rule_shorter_prefix_must_fit_rest_of_pattern():
+    rules = ruleset('第{num}节')
+    # "十十"退到"十"后，剩下的"十节"不符合"节"，不算命中；后面的合法编号仍能被找到
+    assert main.match_outline_rule('第十十节', rules) is None
+    assert main.match_outline_rule('第十十节 第三节', rules) is not None
+
+
+def test_load_outline_rules_merges_or_replaces(tmp_path):
+    extra = {'name': '专题', 'pattern': '专题{num}.*', 'level': 1}
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps([extra], ensure_ascii=False), encoding='utf-8')
+    assert main.load_outline_rules(str(path)) == main.DEFAULT_OUTLINE_RULES + [extra]
+
+    path.write_text(json.dumps({'replace_defaults': True, 'rules': [extra]}, ensure_ascii=False), encoding='utf-8')
+    assert main.load_outline_rules(str(path)) == [extra]
+
+    path.write_text(json.dumps([{'name': '缺少pattern'}], ensure_ascii=False), encoding='utf-8')
+    with pytest.raises(ValueError):
+        main.load_outline_rules(str(path))
+
+
+def test_get_outline_ruleset_reports_config_errors(tmp_path):
+    path = tmp_path / 'broken.json'
+    path.write_text('[{"pattern": "专题(", "level": 1}]', encoding='utf-8')
+    with pytest.raises(ValueError, match='大纲规则配置错误'):
+        main.get_outline_ruleset(str(path))
@@ -0,0 +1,57 @@
+import threading
+
+import main
+
+
+def test_put_returns_false_after_abort():
+    pipe = main.PipelineQueue(maxsize=1)
+    assert pipe.put('a')
+    results = []
+    thread = threading.Thread(target=lambda: results.append(pipe.put('b')))
+    thread.start()
+    thread.join(0.2)
+    assert thread.is_alive()  # 队列已满，等待消费者
+    pipe.abort()
+    thread.join(5)
+    assert results == [False]
+    pipe.producer_done()  # 已中止时放入结束标记也不阻塞
+
+
+def test_pipeline_does_not_hang_when_convert_stage_dies(tmp_path, monkeypatch):
+    for i in range(main.PIPELINE_QUEUE_SIZE * 3):
+        (tmp_path / f'{i}.doc').write_bytes(b'doc')
+    original = main.get_converter_pool
+
+    def get_converter_pool(backend_name, purpose='batch'):
+        if purpose == 'pipeline-convert':
+            raise RuntimeError('转换程序不可用')
+        return original(backend_name, purpose)
+
+    monkeypatch.setattr(main, 'get_converter_pool', get_converter_pool)
+    opts = dict(main.DEFAULT_OPTIONS, use_process_pool=False, use_cache=False)
+    reporter = main.ProgressReporter(lambda snapshot: None)
+    summaries = []
+    thread = threading.Thread(
+        target=lambda: summaries.append(main.run_pipeline(str(tmp_path), opts, reporter, backend='fake',
+                                                          convert_workers=1, process_workers=1)),
+        daemon=True)
+    thread.start()
+    thread.join(30)
+    main.shutdown_converter_pools()
+    assert not thread.is_alive()
+
+    summary = summaries[0]
+    assert any('convert阶段异常终止' in message for message in summary['batch_errors'])
+    # 转换阶段终止前没能放入队列的文件计为失败，不会无声丢失
+    assert summary['stages']['convert']['failed'] > 0
+
+
+def test_has_doc_source_ignores_case(tmp_path):
+    (tmp_path / 'A.DOC').write_bytes(b'doc')
+    (tmp_path / 'b.Doc').write_bytes(b'doc')
+    (tmp_path / 'c.docx').write_bytes(b'docx')
+    doc_stems = {}
+    assert main.has_doc_source(str(tmp_path / 'a.docx'), doc_stems)
+    assert main.has_doc_source(str(tmp_path / 'B.DOCX'), doc_stems)
+    assert not main.has_doc_source(str(tmp_path / 'c.docx'), doc_stems)
+    assert list(doc_stems) == [str(tmp_path)]  # 同一目录只列出一次
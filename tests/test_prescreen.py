@@ -0,0 +1,75 @@
+import random
+import zipfile
+
+import pytest
+
+import main
+from conftest import make_docx
+
+# 触发字符、规则关键字和普通汉字混排，保证随机文本中经常出现命中和“只有触发字符但不命中”的情况
+ALPHABET = list('()（）[]') + list('0123') + list('题型考点第章夯实基础普通文字') + list('ab &<>"')
+FRAGMENTS = ['(01中文说明)', '（12知识点）', '[21考查目标]', '题型一', '考点十十', '第二章', 'A夯实基础', '&#40;']
+
+
+def random_text(rng):
+    parts = []
+    for _ in range(rng.randint(0, 4)):
+        if rng.random() < 0.2:
+            parts.append(rng.choice(FRAGMENTS))
+        else:
+            parts.append(''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 6))))
+    return ''.join(parts)
+
+
+def needs_replace(texts):
+    return any(main.collect_replace_spans(text) for text in texts)
+
+
+def needs_outline(texts):
+    return any(main.match_outline_rule(text.strip(), main.DEFAULT_OUTLINE_RULESET) for text in texts)
+
+
+def test_plain_document_is_screened_out(tmp_path):
+    path = make_docx(str(tmp_path / 'plain.docx'), ['普通段落', '没有括号的文字'], header_text='页眉')
+    assert main.prescreen_docx(path) == (False, False)
+
+
+def test_header_only_match_is_detected(tmp_path):
+    path = make_docx(str(tmp_path / 'header.docx'), ['普通段落'], header_text='页眉(01中文说明)')
+    may_replace, _ = main.prescreen_docx(path)
+    assert may_replace
+
+
+def test_rules_without_triggers_disable_prescreen(tmp_path):
+    path = make_docx(str(tmp_path / 'plain.docx'), ['普通段落'])
+    ruleset = main.compile_outline_rules([{'pattern': '专题{num}.*', 'level': 1}])
+    assert main.prescreen_docx(path, ruleset) == (True, True)
+
+
+def test_character_reference_is_treated_as_possible_hit(tmp_path):
+    path = str(tmp_path / 'ref.docx')
+    make_docx(path, ['普通段落'])
+    with zipfile.ZipFile(path) as zf:
+        members = [(info, zf.read(info)) for info in zf.infolist()]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for info, data in members:
+            if info.filename == main.DOCUMENT_XML:
+                data = data.replace('普通段落'.encode('utf-8'), b'&#40;01&#20013;)')
+            zf.writestr(info, data)
+    assert main.prescreen_docx(path) == (True, True)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 64 * 1024])
+def test_no_false_negatives(tmp_path, monkeypatch, chunk_size):
+    """处理会改动的文档预筛必须放行；小数据块保证多字节触发字符经常被切断在块边界"""
+    monkeypatch.setattr(main, 'STREAM_CHUNK_SIZE', chunk_size)
+    rng = random.Random(chunk_size)
+    for i in range(40 if chunk_size > 3 else 10):
+        body = [random_text(rng) for _ in range(rng.randint(0, 4))]
+        header = random_text(rng) if rng.random() < 0.5 else None
+        path = make_docx(str(tmp_path / f'{i}.docx'), body, header_text=header)
+        may_replace, may_outline = main.prescreen_docx(path)
+        if needs_replace(body + ([header] if header else [])):
+            assert may_replace, (body, header)
+        if needs_outline(body):
+            assert may_outline, body
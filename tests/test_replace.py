@@ -0,0 +1,104 @@
+import random
+import re
+
+import main
+
+
+class FakeRun:
+    """只有text属性的run替身"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def legacy_replace_patterns_in_runs(runs):
+    """区间实现之前的逐字符保留标记实现（原样保留，作为对照）"""
+    text_runs = []
+    char_pos = 0
+    for run in runs:
+        if not run.text:
+            continue
+        text = run.text
+        start = char_pos
+        end = char_pos + len(text)
+        text_runs.append((run, text, start, end))
+        char_pos = end
+    if not text_runs:
+        return
+
+    all_text = ''.join([t[1] for t in text_runs])
+    replaced_ranges = []
+
+    def mark_replaced(match):
+        replaced_ranges.append((match.start(), match.end()))
+        return ""
+
+    re.sub(main.chinese_pattern, mark_replaced, all_text)
+    re.sub(main.english_pattern, mark_replaced, all_text)
+    re.sub(main.k_pattern, mark_replaced, all_text)
+
+    keep_mask = [True] * len(all_text)
+    for start, end in replaced_ranges:
+        for i in range(start, end):
+            if i < len(keep_mask):
+                keep_mask[i] = False
+
+    for run, original_text, start, end in text_runs:
+        kept_chars = []
+        for i in range(start, end):
+            if i < len(keep_mask) and keep_mask[i]:
+                kept_chars.append(original_text[i - start])
+        run.text = ''.join(kept_chars)
+
+
+# 括号、数字和汉字占比较高，保证随机文本中经常出现匹配、重叠和嵌套
+ALPHABET = list('()（）[]') * 3 + list('0120123') * 2 + list('中文知识点考查') * 2 + list('ab ,.')
+FRAGMENTS = ['(01中文说明)', '（12知识点）', '[21考查目标]', '(05易错题)', '(0', '1中)', '([01中]1文)']
+
+
+def random_text(rng):
+    parts = []
+    for _ in range(rng.randint(0, 6)):
+        if rng.random() < 0.4:
+            parts.append(rng.choice(FRAGMENTS))
+        else:
+            parts.append(''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 8))))
+    return ''.join(parts)
+
+
+def random_split(text, rng):
+    """把文本切成若干run，允许空run"""
+    cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 6)))
+    pieces = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+    for _ in range(rng.randint(0, 2)):
+        pieces.insert(rng.randint(0, len(pieces)), '')
+    return pieces
+
+
+def compare(pieces):
+    new_runs = [FakeRun(text) for text in pieces]
+    old_runs = [FakeRun(text) for text in pieces]
+    modified = main.replace_patterns_in_runs(new_runs)
+    legacy_replace_patterns_in_runs(old_runs)
+    assert [run.text for run in new_runs] == [run.text for run in old_runs], pieces
+    # 与删除区间相交的run至少会删掉一个字符，所以修改数等于文本变化的run数
+    assert modified == sum(run.text != text for run, text in zip(new_runs, pieces))
+    return new_runs, modified
+
+
+def test_match_spanning_run_boundaries():
+    runs, modified = compare(['前(0', '1中', '文)后', '', '[21考', '查]尾'])
+    assert ''.join(run.text for run in runs) == '前后尾'
+    assert modified == 5
+
+
+def test_overlapping_patterns_and_empty_runs():
+    compare(['', '([01中]1文)', '', '（12知识点）（3'])
+    compare(['', '', ''])
+    compare([])
+
+
+def test_differential_against_legacy_implementation():
+    rng = random.Random(20261016)
+    for _ in range(5000):
+        compare(random_split(random_text(rng), rng))
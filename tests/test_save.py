@@ -0,0 +1,122 @@
+import zipfile
+import zlib
+
+import pytest
+
+import main
+from conftest import make_docx, stream_opts
+
+
+def assert_valid_zip(path):
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        for info in zf.infolist():
+            data = zf.read(info)
+            assert len(data) == info.file_size
+            assert zlib.crc32(data) == info.CRC, info.filename
+
+
+def read_members(path):
+    with zipfile.ZipFile(path) as zf:
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def raw_members(path):
+    """各成员的压缩方式和压缩后的原始字节（按中央目录定位）"""
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        result = {}
+        for info in zf.infolist():
+            f.seek(info.header_offset)
+            header = main.ZIP_LOCAL_HEADER.unpack(f.read(main.ZIP_LOCAL_HEADER.size))
+            assert (header[3], header[6], header[8]) == (info.compress_type, info.CRC, info.file_size)
+            f.seek(header[9] + header[10], 1)
+            result[info.filename] = (info.compress_type, f.read(info.compress_size))
+        return result
+
+
+def disable_raw_copy(monkeypatch):
+    monkeypatch.setattr(main, 'ZIP_RAW_COPY_PYTHON', (99,))
+
+
+def test_raw_copier_copies_compressed_bytes(tmp_path):
+    src = make_docx(str(tmp_path / 'src.docx'), ['正文'] * 20, header_text='页眉')
+    dst = str(tmp_path / 'dst.docx')
+    copier = main.ZipRawCopier(src)
+    try:
+        with zipfile.ZipFile(src) as zin, main.open_output_zip(dst, 9) as zout:
+            for info in zin.infolist():
+                assert copier.can_copy(info)
+                copier.copy(info, zout)
+        copier.finish(dst)
+    finally:
+        copier.close()
+    assert_valid_zip(dst)
+    assert read_members(dst) == read_members(src)
+    assert raw_members(dst) == raw_members(src)
+
+
+def test_raw_copier_gated_on_python_version(tmp_path, monkeypatch):
+    src = make_docx(str(tmp_path / 'src.docx'), ['正文'])
+    disable_raw_copy(monkeypatch)
+    with zipfile.ZipFile(src) as zin:
+        assert not any(main.ZipRawCopier.can_copy(info) for info in zin.infolist())
+
+
+@pytest.mark.parametrize('raw_copy', [True, False])
+def test_save_document_round_trip(tmp_path, monkeypatch, raw_copy):
+    if not raw_copy:
+        disable_raw_copy(monkeypatch)
+    path = make_docx(str(tmp_path / 'a.docx'), ['(01中文说明)正文', '第二段'], header_text='页眉')
+    opts = dict(main.DEFAULT_OPTIONS, use_process_pool=False)
+    stats = {}
+    ok, message = main.process_word_file(path, False, opts, stats)
+    assert ok, message
+    assert_valid_zip(path)
+    raw_members(path)
+    assert (stats.get('parts_reused', 0) > 0) == raw_copy
+    main.load_docx()
+    texts = [p.text for p in main.Document(path).paragraphs]
+    assert texts[:2] == ['正文', '第二段']
+
+
+@pytest.mark.parametrize('reuse', [True, False])
+def test_save_document_matches_python_docx(tmp_path, reuse):
+    """写出的成员与Document.save相同（包括[Content_Types].xml）"""
+    path = make_docx(str(tmp_path / 'a.docx'), ['正文'], header_text='页眉')
+    main.load_docx()
+    doc = main.Document(path)
+    doc.add_section()
+    doc.sections[-1].header.is_linked_to_previous = False
+    expected = str(tmp_path / 'expected.docx')
+    doc.save(expected)
+    main.save_document(doc, path, False, dict(main.DEFAULT_OPTIONS, reuse_unmodified_parts=reuse))
+    assert read_members(path) == read_members(expected)
+
+
+@pytest.mark.parametrize('level, compress_type', [(0, zipfile.ZIP_STORED), (9, zipfile.ZIP_DEFLATED)])
+def test_compress_level_applies_to_rewritten_members(tmp_path, level, compress_type):
+    path = make_docx(str(tmp_path / 'a.docx'), ['(01中文说明)正文'] * 50, header_text='(02页眉说明)')
+    opts = dict(main.DEFAULT_OPTIONS, use_process_pool=False, compress_level=level, reuse_unmodified_parts=False)
+    ok, message = main.process_word_file(path, False, opts)
+    assert ok, message
+    assert_valid_zip(path)
+    with zipfile.ZipFile(path) as zf:
+        assert {info.compress_type for info in zf.infolist()} == {compress_type}
+
+    path = make_docx(str(tmp_path / 'b.docx'), ['(01中文说明)正文'] * 50, header_text='(02页眉说明)')
+    ok, message = main.process_word_file_streaming(path, False, stream_opts(compress_level=level,
+                                                                             reuse_unmodified_parts=False))
+    assert ok, message
+    assert_valid_zip(path)
+    with zipfile.ZipFile(path) as zf:
+        assert {info.compress_type for info in zf.infolist()} == {compress_type}
+
+
+def test_streaming_round_trip(tmp_path):
+    path = make_docx(str(tmp_path / 'a.docx'), ['(01中文说明)正文'] + ['普通'] * 50, header_text='(02页眉说明)')
+    stats = {}
+    ok, message = main.process_word_file_streaming(path, False, stream_opts(), stats)
+    assert ok, message
+    assert stats.get('parts_reused', 0) > 0
+    assert_valid_zip(path)
+    raw_members(path)
@@ -0,0 +1,23 @@
+import main
+from conftest import make_docx
+
+
+def test_rewrite_sections_unlinks_every_section(tmp_path):
+    main.load_docx()
+    path = make_docx(str(tmp_path / 'a.docx'), ['正文'], header_text='旧页眉')
+    doc = main.Document(path)
+    for _ in range(3):
+        doc.add_section()
+    opts = dict(main.DEFAULT_OPTIONS, remove_header_footer=True, add_page_number=True, add_custom_header=True)
+
+    assert main.rewrite_sections(doc, opts, main.get_section_templates())
+    headers = [section.header for section in doc.sections]
+    assert not any(header.is_linked_to_previous for header in headers)
+    assert not any(section.footer.is_linked_to_previous for section in doc.sections)
+    # 每节都有独立的页眉部件，只含一个自定义页眉段落
+    assert len({id(header.part) for header in headers}) == len(headers)
+    assert all(len(header.paragraphs) == 1 and '旧页眉' not in header.paragraphs[0].text for header in headers)
+    assert all(len(section.footer.paragraphs) == 1 for section in doc.sections)
+
+    # 已处理过的文档再次改写没有变化
+    assert not main.rewrite_sections(doc, opts, main.get_section_templates())
@@ -0,0 +1,96 @@
+import json
+import os
+import random
+
+import main
+
+
+def make_files(folder, count, rng):
+    paths = []
+    for i in range(count):
+        sub = folder / f'd{i % 3}'
+        sub.mkdir(exist_ok=True)
+        path = sub / f'{i}.docx'
+        path.write_bytes(b'x' * rng.choice([0, 10, 100, 1000, 5000]))
+        paths.append(str(path))
+    return paths
+
+
+def shards_of(paths, folder, count):
+    return [main.select_shard(paths, str(folder), (i, count)) for i in range(1, count + 1)]
+
+
+def test_plan_shards_is_complete_and_balanced(tmp_path):
+    rng = random.Random(23)
+    paths = make_files(tmp_path, 50, rng)
+    for count in (1, 2, 3, 7, 60):
+        plan = main.plan_shards(paths, str(tmp_path), count)
+        assert sorted(plan) == sorted(main.journal_key(str(tmp_path), p) for p in paths)
+        assert set(plan.values()) <= set(range(1, count + 1))
+        loads = [0] * count
+        for path in paths:
+            loads[plan[main.journal_key(str(tmp_path), path)] - 1] += os.path.getsize(path)
+        assert max(loads) - min(loads) <= 5000
+        assert plan == main.plan_shards(list(reversed(paths)), str(tmp_path), count)
+
+
+def test_select_shard_partitions_all_files(tmp_path):
+    rng = random.Random(4)
+    paths = make_files(tmp_path, 30, rng)
+    shards = shards_of(paths, tmp_path, 4)
+    selected = [path for shard in shards for path in shard]
+    assert sorted(selected) == sorted(paths)  # 每个文件恰好属于一个分片
+
+
+def test_select_shard_is_stable_after_files_change(tmp_path):
+    rng = random.Random(5)
+    paths = make_files(tmp_path, 20, rng)
+    before = shards_of(paths, tmp_path, 3)
+    # 处理后文件大小变化、又新增了文件：已划分的文件分片不变，新文件也只属于一个分片
+    for path in paths:
+        with open(path, 'ab') as f:
+            f.write(b'y' * rng.randint(0, 10000))
+    new_path = tmp_path / 'new.docx'
+    new_path.write_bytes(b'new')
+    after = shards_of(paths + [str(new_path)], tmp_path, 3)
+    assert [[p for p in shard if p != str(new_path)] for shard in after] == before
+    assert sum(str(new_path) in shard for shard in after) == 1
+
+    rebuilt = [main.select_shard(paths, str(tmp_path), (i, 3), rebuild=True) for i in range(1, 4)]
+    assert sorted(p for shard in rebuilt for p in shard) == sorted(paths)
+
+
+def write_report(folder, shard, files, **extra):
+    report = {'version': 1, 'shard': list(shard), 'host': f'host{shard[0]}', 'signature': 'sig', 'elapsed': shard[0],
+              'cache_skipped': 1, 'resumed': 0, 'stats': {'paragraphs': 10}, 'batch_errors': [],
+              'files': [{'path': path, 'success': ok, 'changed': ok, 'message': 'ok' if ok else f'{path} 失败',
+                         'elapsed': 0.1} for path, ok in files]}
+    report.update(extra)
+    path = main.shard_report_path(str(folder), shard)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False)
+    return path
+
+
+def test_merge_shard_reports(tmp_path):
+    write_report(tmp_path, (1, 3), [('a.docx', True), ('b.docx', False)])
+    write_report(tmp_path, (2, 3), [('c.docx', True)])
+    merged = main.merge_shard_reports(main.find_shard_reports([str(tmp_path)]))
+    assert (merged['total'], merged['processed'], merged['succeeded'], merged['failed']) == (5, 3, 2, 1)
+    assert merged['errors'] == ['b.docx 失败']
+    assert merged['stats'] == {'paragraphs': 20}
+    assert merged['missing'] == [3]
+    assert merged['duplicates'] == []
+    assert merged['makespan'] == 2
+    assert [shard['shard'] for shard in merged['shards']] == [1, 2]
+
+
+def test_merge_shard_reports_flags_inconsistent_reports(tmp_path):
+    first = write_report(tmp_path, (1, 2), [('a.docx', True)])
+    second = write_report(tmp_path, (2, 3), [('a.docx', True)], signature='other')
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{', encoding='utf-8')
+    merged = main.merge_shard_reports([first, second, str(broken)])
+    assert merged['duplicates'] == ['a.docx']
+    assert merged['processed'] == 1
+    assert len(merged['batch_errors']) == 3
@@ -0,0 +1,41 @@
+import zipfile
+
+import main
+from conftest import make_docx, stream_opts
+
+
+def member_text(path, name):
+    with zipfile.ZipFile(path) as zf:
+        return zf.read(name).decode('utf-8')
+
+
+def test_story_part_before_document_xml_is_saved(tmp_path):
+    """页眉成员排在document.xml之前且正文无需修改时，页眉的修改不能被正文结果覆盖"""
+    path = make_docx(str(tmp_path / 'a.docx'), ['普通正文'], header_text='(01中文内容)页眉',
+                     member_first='word/header')
+    with zipfile.ZipFile(path) as zf:
+        names = zf.namelist()
+    header = next(name for name in names if main.STORY_MEMBER_PATTERN.match(name))
+    assert names.index(header) < names.index(main.DOCUMENT_XML)
+
+    stats = {}
+    ok, message = main.process_word_file_streaming(path, False, stream_opts(), stats)
+    assert ok, message
+    assert '无需修改' not in message
+    assert stats.get('documents_unchanged', 0) == 0
+    assert '(01中文内容)' not in member_text(path, header)
+    assert '页眉' in member_text(path, header)
+    assert '普通正文' in member_text(path, main.DOCUMENT_XML)
+
+
+def test_unmodified_document_is_left_alone(tmp_path):
+    path = make_docx(str(tmp_path / 'b.docx'), ['普通正文'], header_text='页眉', member_first='word/header')
+    with open(path, 'rb') as f:
+        before = f.read()
+
+    stats = {}
+    ok, message = main.process_word_file_streaming(path, False, stream_opts(), stats)
+    assert ok, message
+    assert stats.get('documents_unchanged') == 1
+    with open(path, 'rb') as f:
+        assert f.read() == before
@@ -0,0 +1,63 @@
+import concurrent.futures
+import os
+import threading
+
+import main
+from conftest import make_docx
+
+
+class CountingExecutor(concurrent.futures.ThreadPoolExecutor):
+    """代替进程池（测试中不启动子进程），记录创建和关闭次数"""
+    created = 0
+    shutdowns = 0
+
+    def __init__(self, max_workers=None, initializer=None):
+        CountingExecutor.created += 1
+        super().__init__(max_workers=max_workers)
+
+    def shutdown(self, wait=True, **kwargs):
+        CountingExecutor.shutdowns += 1
+        super().shutdown(wait, **kwargs)
+
+
+def watch(tmp_path, monkeypatch, first_batch, later_batches):
+    """开始监视（先处理已有的first_batch个文件），每批完成后写入下一批文件，全部处理完后停止"""
+    CountingExecutor.created = CountingExecutor.shutdowns = 0
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', CountingExecutor)
+    for i in range(first_batch):
+        make_docx(str(tmp_path / f'first{i}.docx'), [f'({i:02d}中文说明)正文'])
+    pending = list(later_batches)
+    batches = []
+    stop_event = threading.Event()
+
+    def on_batch(batch):
+        batches.append(batch)
+        if not pending:
+            stop_event.set()
+            return
+        for i in range(pending.pop(0)):
+            make_docx(str(tmp_path / f'next{len(batches)}_{i}.docx'), ['(01中文说明)正文'])
+
+    opts = dict(main.DEFAULT_OPTIONS, use_process_pool=True, process_workers=2, use_cache=False)
+    thread = threading.Thread(target=main.run_watch, args=(str(tmp_path), opts, stop_event, on_batch),
+                              kwargs=dict(include_existing=True, poll_interval=0.1, settle_time=0.0), daemon=True)
+    thread.start()
+    thread.join(60)
+    stop_event.set()
+    assert not thread.is_alive()
+    return batches
+
+
+def test_process_pool_is_shared_across_watch_batches(tmp_path, monkeypatch):
+    batches = watch(tmp_path, monkeypatch, main.WATCH_POOL_MIN_FILES, [main.WATCH_POOL_MIN_FILES])
+    assert [batch['succeeded'] for batch in batches] == [main.WATCH_POOL_MIN_FILES] * 2
+    assert CountingExecutor.created == 1
+    assert CountingExecutor.shutdowns == 1
+    assert not os.path.exists(tmp_path / main.JOURNAL_NAME)
+
+
+def test_small_watch_batches_use_threads(tmp_path, monkeypatch):
+    batches = watch(tmp_path, monkeypatch, 1, [1])
+    assert [batch['succeeded'] for batch in batches] == [1, 1]
+    assert CountingExecutor.created == 0
+    assert not os.path.exists(tmp_path / main.JOURNAL_NAME)